@@ -1,614 +1,566 @@
-from flask import Flask, render_template_string
-
-app = Flask(__name__)
+import concurrent.futures
+import contextlib
+import hashlib
+import math
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+from flask import Flask, Response, abort, g, jsonify, request
+
+from garden.archive import (CHUNK_ROWS, ArchiveError, check_positions, export_chunks, flower_records, layout,
+                            open_archive)
+from garden.delivery import AssetBundle, Precompressed
+from garden.simulation import format_color, parse_color
+from garden.ingest import RETRY_AFTER, Ingest, QueueFull
+from garden.lod import LodPyramid
+from garden.metrics import Histogram, QuantileSketch, RateCounter, exposition
+from garden.shared import SharedGardens
+from garden.spatial import SpatialIndex
+from garden.storage import (CLEAR, EVENT, FLOWER, POSITION_LIMIT, STROKE, GardenStore, clear_event, flower_event,
+                            quantize, replay)
+from garden.strokes import MAX_BYTES, StrokeError, decode_strokes, stroke_records
+from garden.sync import Hub
+from garden.tiles import MAX_ZOOM, TileCache, render_tile, tile_bounds, tile_span
+from garden.timelapse import MAX_FRAMES, Timelapse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get('GARDEN_DATA', os.path.join(BASE_DIR, 'data'))
+# Set when several worker processes serve the same data directory (gunicorn -w N)
+SHARED = os.environ.get('GARDEN_SHARED') == '1'
+HEX_COLOR = re.compile(r'#[0-9a-fA-F]{6}')
+
+# Static files are served from the precompressed bundle below instead of Flask's default handler
+app = Flask(__name__, static_folder=None)
+
+assets = AssetBundle(os.path.join(BASE_DIR, 'static'))
+gardens = GardenStore(os.path.join(DATA_DIR, 'gardens'), shared=SHARED)
+# Live flowers of every garden in shared memory, so worker processes don't each load them
+shared_gardens = SharedGardens(os.path.abspath(DATA_DIR)) if SHARED else None
+hub = Hub()
+tiles = TileCache(os.path.join(DATA_DIR, 'tiles'))
+EMPTY_TILE = render_tile(np.zeros(0, dtype=EVENT), 0, 0, 0)
+# Time-lapse frames are rendered here; processes start on the first request that needs them
+renderers = concurrent.futures.ProcessPoolExecutor()
+MAX_TIMELAPSE_PIXELS = 1024 * 1024
+# Pixels times frames of one time-lapse, and time-lapses streaming at once in this process
+MAX_TIMELAPSE_WORK = 256 * MAX_TIMELAPSE_PIXELS
+timelapse_slots = threading.BoundedSemaphore(2)
+# In-memory views derived from a garden's events, built on first use and kept
+# current by record_events(); keyed by (kind, garden id)
+VIEW_TYPES = {'index': SpatialIndex, 'lod': LodPyramid}
+views = {}
+# Garden version the views, channel and tile cache of this process reflect, by garden id
+applied = {}
+
+# Metrics of this process, served by /metrics: request latency by route, appended
+# events by kind, and what clients report about their animation (POST /metrics/client)
+request_latency = {}
+event_rates = {'flower': RateCounter(), 'clear': RateCounter(), 'stroke': RateCounter()}
+client_sketches = {
+    'frame_ms': QuantileSketch(),
+    'stall_ms': QuantileSketch(),
+    'particles': QuantileSketch(minimum=1, maximum=1e9),
+}
+CLIENT_HELP = {
+    'frame_ms': 'Time between animation frames reported by clients, in ms.',
+    'stall_ms': 'Frames longer than 50 ms reported by clients, in ms.',
+    'particles': 'Live particles per frame reported by clients.',
+}
+MAX_CLIENT_SAMPLES = 4096
+MAX_CLIENT_BYTES = 1 << 16
+# Event streams of gardens nothing was written to yet end at once and the browser
+# reconnects after this long, by which time the garden may exist
+MISSING_RETRY_MS = 5000
+
+# The page never changes between deploys, so compile and render it exactly once
+index_template = app.jinja_env.get_template('index.html')
+index_page = Precompressed(index_template.render(asset_url=assets.url_for), 'text/html')
+
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+
+@app.after_request
+def record_latency(response):
+    # Time to build the response; the body of a streamed response is not included
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    histogram = request_latency.get(route)
+    if histogram is None:
+        histogram = request_latency.setdefault(route, Histogram())
+    histogram.observe(time.perf_counter() - g.started)
+    return response
+
+
+class EmptyGarden:
+    # Read side of a garden nothing was written to yet, so reads don't create one
+    version = 0
+    lock = contextlib.nullcontext()
+
+
+def get_garden(garden_id, create=False):
+    # The garden's log; None for a garden that doesn't exist yet, unless ``create``
+    try:
+        log = gardens.get(garden_id, create)
+    except KeyError:
+        abort(404)
+    if SHARED and log is not None:
+        catch_up(garden_id, log)
+    return log
+
+
+def load_garden(garden_id, log):
+    # (version, live FLOWER records), copied out of shared memory rather than read from disk if possible
+    if SHARED:
+        return shared_gardens.get(garden_id, log).flowers()
+    return log.load()
+
+
+def get_view(garden_id, kind):
+    log = get_garden(garden_id)
+    if log is None:
+        return EmptyGarden, VIEW_TYPES[kind]()
+    view = views.get((kind, garden_id))
+    if view is not None:
+        return log, view
+    # Built from a copy of the flowers without holding the garden, so writes carry on,
+    # then brought up to date with what they appended meanwhile
+    version, flowers = load_garden(garden_id, log)
+    built = VIEW_TYPES[kind]()
+    built.apply(flowers)
+    with log.exclusive():
+        view = views.get((kind, garden_id))
+        if view is None:
+            if SHARED:
+                catch_up(garden_id, log)
+            delta = log.events_since(version)
+            if delta is None:
+                # Compacted past the copy in the meantime
+                built = VIEW_TYPES[kind]()
+                built.apply(load_garden(garden_id, log)[1])
+            else:
+                built.apply(delta[1])
+            view = views[kind, garden_id] = built
+    return log, view
+
+
+def rect_args():
+    # The x, y, width, height query arguments as a rectangle x0, y0, x1, y1
+    x, y = float_arg('x'), float_arg('y')
+    width, height = float_arg('width'), float_arg('height')
+    if width < 0 or height < 0 or not (math.isfinite(x + width) and math.isfinite(y + height)):
+        abort(400)
+    return x, y, x + width, y + height
+
+
+def float_arg(name):
+    try:
+        value = float(request.args[name])
+    except (KeyError, ValueError):
+        abort(400)
+    if not math.isfinite(value):
+        abort(400)
+    return value
+
+
+def version_arg(value):
+    # A garden version sent by the client; isdigit() alone also accepts digits like '²'
+    if not (value.isascii() and value.isdigit()):
+        abort(400)
+    return int(value)
+
+
+def flowers_json(version, flowers, **fields):
+    return jsonify(version=version, **fields, flowers=[
+        {'x': float(f['x']), 'y': float(f['y']), 'color': format_color(f['color']), 'seed': int(f['seed'])}
+        for f in flowers
+    ])
+
+
+def archive_response(version, flowers, filename=None):
+    # Stream a garden archive (garden/archive.py) without building it in memory
+    headers = {'Content-Length': str(layout(len(flowers))[1])}
+    if filename is not None:
+        headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return Response(export_chunks(version, flowers), mimetype='application/octet-stream', headers=headers)
+
+
+def parse_flower(payload):
+    # Validate a {x, y, color, seed} flower posted by the client
+    if not isinstance(payload, dict):
+        abort(400)
+    x, y, color, seed = (payload.get(k) for k in ('x', 'y', 'color', 'seed'))
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) and abs(v) <= POSITION_LIMIT for v in (x, y)):
+        abort(400)
+    if not isinstance(color, str) or not HEX_COLOR.fullmatch(color):
+        abort(400)
+    if not isinstance(seed, int) or isinstance(seed, bool) or not 0 <= seed < 2 ** 32:
+        abort(400)
+    return quantize(x), quantize(y), parse_color(color), seed
+
+
+def apply_events(garden_id, records, version):
+    # Bring the channel, tile cache and views of this process up to ``version``
+    hub.channel(garden_id, version - len(records)).publish(records, version)
+    tiles.invalidate(garden_id, records)
+    for kind in VIEW_TYPES:
+        view = views.get((kind, garden_id))
+        if view is not None:
+            view.apply(records)
+    applied[garden_id] = version
+
+
+def record_events(garden_id, records):
+    # Append and publish under the garden lock so broadcast frames follow version order
+    log = get_garden(garden_id, create=True)
+    with log.exclusive():
+        if SHARED:
+            catch_up(garden_id, log)
+        version = log.append(records)
+        event_rates['flower'].add(int(np.count_nonzero(records['kind'] == FLOWER)))
+        event_rates['clear'].add(int(np.count_nonzero(records['kind'] == CLEAR)))
+        event_rates['stroke'].add(int(np.count_nonzero(records['kind'] == STROKE)))
+        if SHARED:
+            shared_gardens.get(garden_id, log).apply(records, version)
+        apply_events(garden_id, records, version)
+    return version
+
+
+def catch_up(garden_id, log):
+    # Apply what other worker processes appended since this one last looked. Costs one
+    # read of the shared version unless something changed.
+    shared = shared_gardens.get(garden_id, log)
+    if applied.get(garden_id) == shared.version:
+        return
+    with log.exclusive():
+        if shared.version != log.version:
+            # A writer died between appending to the log and updating shared memory
+            shared.reset(*log.load())
+        since = applied.get(garden_id, log.version)
+        base, events = log.events()
+        if since < base:
+            # Compacted away: rebuild views on demand and send subscribers back to a full load
+            for kind in VIEW_TYPES:
+                views.pop((kind, garden_id), None)
+            tiles.invalidate(garden_id, clear_event())
+            channel = hub.channels.get(garden_id)
+            if channel is not None:
+                channel.reset(log.version)
+        elif since < log.version:
+            apply_events(garden_id, np.array(events[since - base:]), log.version)
+        applied[garden_id] = log.version
+
+
+def poll_gardens(garden_ids):
+    # Run by the hub before every tick, so subscribers hear about other processes' events
+    for garden_id in garden_ids:
+        log = gardens.get(garden_id)
+        if log is not None:
+            catch_up(garden_id, log)
+
+
+if SHARED:
+    hub.poll = poll_gardens
+
+# Flowers, strokes and clears posted by clients are appended in batches, one write per
+# garden per batch, instead of one write per request
+ingest = Ingest(record_events)
+
+
+def submit_events(garden_id, records):
+    get_garden(garden_id, create=True)  # Invalid ids fail here, not in the batch
+    try:
+        return ingest.submit(garden_id, records)
+    except QueueFull:
+        abort(429, retry_after=RETRY_AFTER)
 
 
 @app.route('/')
 def index():
-    return render_template_string('''
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Particle Flower Garden</title>
-        <style>
-            body {
-                margin: 0;
-                padding: 0;
-                overflow: hidden;
-                background-color: #283618;
-                font-family: Arial, sans-serif;
-                color: #fefae0;
-            }
-
-            #garden-container {
-                position: relative;
-                width: 100vw;
-                height: 100vh;
-            }
-
-            #garden-canvas {
-                position: absolute;
-                top: 0;
-                left: 0;
-                width: 100%;
-                height: 100%;
-                cursor: pointer;
-            }
-
-            .title-overlay {
-                position: absolute;
-                top: 20px;
-                left: 20px;
-                z-index: 10;
-                padding: 10px 15px;
-                background-color: rgba(60, 60, 50, 0.7);
-                border-radius: 8px;
-                pointer-events: none;
-            }
-
-            .controls-overlay {
-                position: absolute;
-                bottom: 20px;
-                right: 20px;
-                z-index: 10;
-                display: flex;
-                gap: 10px;
-            }
-
-            button {
-                background-color: #606c38;
-                color: #fefae0;
-                border: none;
-                padding: 8px 16px;
-                border-radius: 4px;
-                cursor: pointer;
-                transition: background-color 0.3s;
-            }
-
-            button:hover {
-                background-color: #dda15e;
-            }
-
-            .color-picker {
-                display: flex;
-                gap: 8px;
-                margin-bottom: 10px;
-            }
-
-            .color-option {
-                width: 25px;
-                height: 25px;
-                border-radius: 50%;
-                cursor: pointer;
-                border: 2px solid transparent;
-                transition: transform 0.2s;
-            }
-
-            .color-option:hover {
-                transform: scale(1.2);
-            }
-
-            .color-option.selected {
-                border-color: #fff;
-            }
-
-            @keyframes sway {
-                0% {
-                    transform: rotate(0deg);
-                }
-                25% {
-                    transform: rotate(3deg);
-                }
-                50% {
-                    transform: rotate(0deg);
-                }
-                75% {
-                    transform: rotate(-3deg);
-                }
-                100% {
-                    transform: rotate(0deg);
-                }
-            }
-
-            .flower-container {
-                position: absolute;
-                transform-origin: bottom center;
-                animation: sway 4s ease-in-out infinite;
-            }
-
-            /* Different sway timings for visual variety */
-            .flower-container:nth-child(2n) {
-                animation-duration: 5s;
-            }
-
-            .flower-container:nth-child(3n) {
-                animation-duration: 6s;
-            }
-
-            .flower-container:nth-child(4n) {
-                animation-delay: 1s;
-            }
-        </style>
-    </head>
-    <body>
-        <div id="garden-container">
-            <canvas id="garden-canvas"></canvas>
-
-            <div class="title-overlay">
-                <h1>Particle Flower Garden</h1>
-                <p>Click and drag to create flowers</p>
-            </div>
-
-            <div class="controls-overlay">
-                <div>
-                    <div class="color-picker">
-                        <!-- Default colors -->
-                        <div class="color-option selected" style="background-color: #ff7eb9;" data-color="#ff7eb9"></div>
-                        <div class="color-option" style="background-color: #7afcff;" data-color="#7afcff"></div>
-                        <div class="color-option" style="background-color: #feff9c;" data-color="#feff9c"></div>
-                        <div class="color-option" style="background-color: #fff740;" data-color="#fff740"></div>
-                        <div class="color-option" style="background-color: #ff65a3;" data-color="#ff65a3"></div>
-                    </div>
-                    <button id="clear-btn">Clear Garden</button>
-                </div>
-            </div>
-        </div>
-
-        <script>
-            document.addEventListener('DOMContentLoaded', () => {
-                // Canvas setup
-                const canvas = document.getElementById('garden-canvas');
-                const ctx = canvas.getContext('2d');
-                const gardenContainer = document.getElementById('garden-container');
-
-                // Set canvas dimensions
-                function resizeCanvas() {
-                    canvas.width = window.innerWidth;
-                    canvas.height = window.innerHeight;
-                }
-
-                resizeCanvas();
-                window.addEventListener('resize', resizeCanvas);
-
-                // Particle and Flower classes/state
-                let isDrawing = false;
-                let currentPath = [];
-                let flowers = [];
-                let currentColor = '#ff7eb9'; // Default color
-
-                // Color selection handling
-                const colorOptions = document.querySelectorAll('.color-option');
-                colorOptions.forEach(option => {
-                    option.addEventListener('click', () => {
-                        // Remove selected class from all options
-                        colorOptions.forEach(o => o.classList.remove('selected'));
-                        // Add selected class to clicked option
-                        option.classList.add('selected');
-                        // Update current color
-                        currentColor = option.getAttribute('data-color');
-                    });
-                });
-
-                // Clear button
-                const clearBtn = document.getElementById('clear-btn');
-                clearBtn.addEventListener('click', () => {
-                    flowers = [];
-                    // Clear the canvas
-                    ctx.clearRect(0, 0, canvas.width, canvas.height);
-                    // Remove all flower DOM elements
-                    document.querySelectorAll('.flower-container').forEach(el => el.remove());
-                });
-
-                // Classes for our flower system
-                class Vector2 {
-                    constructor(x, y) {
-                        this.x = x;
-                        this.y = y;
-                    }
-
-                    add(v) {
-                        return new Vector2(this.x + v.x, this.y + v.y);
-                    }
-
-                    subtract(v) {
-                        return new Vector2(this.x - v.x, this.y - v.y);
-                    }
-
-                    multiply(scalar) {
-                        return new Vector2(this.x * scalar, this.y * scalar);
-                    }
-
-                    length() {
-                        return Math.sqrt(this.x * this.x + this.y * this.y);
-                    }
-
-                    normalize() {
-                        const len = this.length();
-                        if (len === 0) return new Vector2(0, 0);
-                        return new Vector2(this.x / len, this.y / len);
-                    }
-
-                    rotate(angle) {
-                        const cos = Math.cos(angle);
-                        const sin = Math.sin(angle);
-                        return new Vector2(
-                            this.x * cos - this.y * sin,
-                            this.x * sin + this.y * cos
-                        );
-                    }
-                }
-
-                class Particle {
-                    constructor(position, velocity, color, size, life = 1.0) {
-                        this.position = position;
-                        this.velocity = velocity;
-                        this.color = color;
-                        this.baseSize = size;
-                        this.size = 0; // Start small and grow
-                        this.life = life;
-                        this.decay = 0.01; // How fast life decreases
-                        this.growing = true;
-                        this.growSpeed = 0.1;
-                    }
-
-                    update() {
-                        // Update position based on velocity
-                        this.position = this.position.add(this.velocity);
-
-                        // Handle growth animation
-                        if (this.growing) {
-                            this.size += this.growSpeed;
-                            if (this.size >= this.baseSize) {
-                                this.size = this.baseSize;
-                                this.growing = false;
-                            }
-                        }
-
-                        // Decrease life
-                        this.life -= this.decay;
-
-                        return this.life > 0;
-                    }
-
-                    draw(ctx) {
-                        // Set opacity based on life
-                        const alpha = this.life > 0.8 ? 1.0 : this.life + 0.2;
-
-                        // Extract RGB from hex color
-                        const r = parseInt(this.color.slice(1, 3), 16);
-                        const g = parseInt(this.color.slice(3, 5), 16);
-                        const b = parseInt(this.color.slice(5, 7), 16);
-
-                        ctx.fillStyle = `rgba(${r}, ${g}, ${b}, ${alpha})`;
-
-                        // Draw petal shape using bezier curves
-                        ctx.beginPath();
-                        ctx.moveTo(this.position.x, this.position.y);
-
-                        // Control points for bezier curve to create petal shape
-                        const angle = Math.atan2(this.velocity.y, this.velocity.x);
-                        const length = this.size;
-
-                        // Endpoint of the petal
-                        const end = new Vector2(
-                            this.position.x + length * Math.cos(angle),
-                            this.position.y + length * Math.sin(angle)
-                        );
-
-                        // Control points perpendicular to the direction
-                        const perpAngle = angle + Math.PI / 2;
-                        const controlDist = length * 0.5;
-
-                        const ctrl1 = new Vector2(
-                            this.position.x + controlDist * Math.cos(perpAngle),
-                            this.position.y + controlDist * Math.sin(perpAngle)
-                        );
-
-                        const ctrl2 = new Vector2(
-                            end.x + controlDist * Math.cos(perpAngle),
-                            end.y + controlDist * Math.sin(perpAngle)
-                        );
-
-                        // Draw the curve
-                        ctx.bezierCurveTo(ctrl1.x, ctrl1.y, ctrl2.x, ctrl2.y, end.x, end.y);
-
-                        // Draw the other side of the petal
-                        const ctrl3 = new Vector2(
-                            end.x - controlDist * Math.cos(perpAngle),
-                            end.y - controlDist * Math.sin(perpAngle)
-                        );
-
-                        const ctrl4 = new Vector2(
-                            this.position.x - controlDist * Math.cos(perpAngle),
-                            this.position.y - controlDist * Math.sin(perpAngle)
-                        );
-
-                        ctx.bezierCurveTo(ctrl3.x, ctrl3.y, ctrl4.x, ctrl4.y, this.position.x, this.position.y);
-
-                        ctx.closePath();
-                        ctx.fill();
-                    }
-                }
-
-                class Flower {
-                    constructor(position, color) {
-                        this.position = position;
-                        this.color = color;
-                        this.particles = [];
-                        this.bloomState = 0;
-                        this.bloomSpeed = 0.02;
-                        this.maxPetals = Math.floor(Math.random() * 5) + 8; // 8-12 petals
-                        this.size = Math.random() * 15 + 20; // Random size between 20-35
-                        this.createFlower();
-                    }
-
-                    createFlower() {
-                        // Create center of the flower
-                        const centerColor = this.lightenColor(this.color, 50);
-
-                        // Create petals around the center
-                        for (let i = 0; i < this.maxPetals; i++) {
-                            const angle = (i / this.maxPetals) * Math.PI * 2;
-                            const petalPosition = new Vector2(
-                                this.position.x + Math.cos(angle) * (this.size * 0.2),
-                                this.position.y + Math.sin(angle) * (this.size * 0.2)
-                            );
-
-                            const petalVelocity = new Vector2(
-                                Math.cos(angle) * 0.2,
-                                Math.sin(angle) * 0.2
-                            );
-
-                            // Small variance in petal colors
-                            const variance = Math.floor(Math.random() * 30) - 15;
-                            const petalColor = this.lightenColor(this.color, variance);
-
-                            this.particles.push(new Particle(
-                                petalPosition,
-                                petalVelocity,
-                                petalColor,
-                                this.size * (0.8 + Math.random() * 0.4), // Vary petal sizes
-                                1.0
-                            ));
-                        }
-
-                        // Add center particles
-                        for (let i = 0; i < 6; i++) {
-                            const angle = (i / 6) * Math.PI * 2;
-                            const centerPosition = new Vector2(
-                                this.position.x + Math.cos(angle) * (this.size * 0.1),
-                                this.position.y + Math.sin(angle) * (this.size * 0.1)
-                            );
-
-                            this.particles.push(new Particle(
-                                centerPosition,
-                                new Vector2(0, 0),
-                                centerColor,
-                                this.size * 0.5,
-                                1.0
-                            ));
-                        }
-
-                        // Create the stem using DOM elements for CSS animation
-                        this.createDOMElements();
-                    }
-
-                    createDOMElements() {
-                        // Create a container for the flower stem that will animate
-                        const flowerContainer = document.createElement('div');
-                        flowerContainer.className = 'flower-container';
-                        flowerContainer.style.left = `${this.position.x}px`;
-                        flowerContainer.style.top = `${this.position.y}px`;
-
-                        // Add random animation delay for varied movement
-                        flowerContainer.style.animationDelay = `${Math.random() * 2}s`;
-
-                        gardenContainer.appendChild(flowerContainer);
-                    }
-
-                    update() {
-                        // Update bloom state
-                        this.bloomState = Math.min(1.0, this.bloomState + this.bloomSpeed);
-
-                        // Update all particles
-                        this.particles.forEach(particle => {
-                            particle.update();
-                        });
-
-                        return true; // Flowers don't die in this garden
-                    }
-
-                    draw(ctx) {
-                        // Draw all particles
-                        this.particles.forEach(particle => {
-                            particle.draw(ctx);
-                        });
-                    }
-
-                    // Helper to lighten or darken colors
-                    lightenColor(color, amount) {
-                        // Convert hex to RGB
-                        let r = parseInt(color.slice(1, 3), 16);
-                        let g = parseInt(color.slice(3, 5), 16);
-                        let b = parseInt(color.slice(5, 7), 16);
-
-                        // Adjust RGB values
-                        r = Math.min(255, Math.max(0, r + amount));
-                        g = Math.min(255, Math.max(0, g + amount));
-                        b = Math.min(255, Math.max(0, b + amount));
-
-                        // Convert back to hex
-                        return `#${r.toString(16).padStart(2, '0')}${g.toString(16).padStart(2, '0')}${b.toString(16).padStart(2, '0')}`;
-                    }
-                }
-
-                // Path drawing and particle generation
-                function generatePathParticles(start, end) {
-                    const direction = end.subtract(start);
-                    const distance = direction.length();
-
-                    if (distance < 5) return; // Skip if points are too close
-
-                    // Normalize direction and create particles along path
-                    const normalizedDir = direction.normalize();
-                    const particleCount = Math.ceil(distance / 10); // One particle every 10px
-
-                    for (let i = 0; i < particleCount; i++) {
-                        const t = i / particleCount;
-                        const pos = start.add(direction.multiply(t));
-
-                        // Add some randomness to position
-                        const randOffset = new Vector2(
-                            (Math.random() - 0.5) * 10,
-                            (Math.random() - 0.5) * 10
-                        );
-
-                        const particlePos = pos.add(randOffset);
-
-                        // Create trail particle with velocity perpendicular to direction
-                        const perpAngle = Math.atan2(normalizedDir.y, normalizedDir.x) + (Math.PI / 2);
-                        const perpVector = new Vector2(
-                            Math.cos(perpAngle),
-                            Math.sin(perpAngle)
-                        ).multiply(Math.random() * 2 - 1); // Random direction
-
-                        currentPath.push({
-                            position: particlePos,
-                            velocity: perpVector,
-                        });
-                    }
-                }
-
-                // Mouse event handlers
-                canvas.addEventListener('mousedown', (e) => {
-                    isDrawing = true;
-                    currentPath = [];
-
-                    const mousePos = new Vector2(e.clientX, e.clientY);
-                    currentPath.push({
-                        position: mousePos,
-                        velocity: new Vector2(0, 0)
-                    });
-                });
-
-                canvas.addEventListener('mousemove', (e) => {
-                    if (!isDrawing) return;
-
-                    const mousePos = new Vector2(e.clientX, e.clientY);
-                    const lastPos = currentPath.length > 0 
-                        ? currentPath[currentPath.length - 1].position 
-                        : mousePos;
-
-                    generatePathParticles(lastPos, mousePos);
-                });
-
-                function endDrawing(e) {
-                    if (!isDrawing) return;
-                    isDrawing = false;
-
-                    if (currentPath.length > 0) {
-                        // Create a flower at the end of the path
-                        const lastPos = currentPath[currentPath.length - 1].position;
-                        flowers.push(new Flower(lastPos, currentColor));
-                    }
-                }
-
-                canvas.addEventListener('mouseup', endDrawing);
-                canvas.addEventListener('mouseleave', endDrawing);
-
-                // Touch event handlers for mobile support
-                canvas.addEventListener('touchstart', (e) => {
-                    e.preventDefault();
-                    const touch = e.touches[0];
-                    isDrawing = true;
-                    currentPath = [];
-
-                    const touchPos = new Vector2(touch.clientX, touch.clientY);
-                    currentPath.push({
-                        position: touchPos,
-                        velocity: new Vector2(0, 0)
-                    });
-                });
-
-                canvas.addEventListener('touchmove', (e) => {
-                    e.preventDefault();
-                    if (!isDrawing) return;
-
-                    const touch = e.touches[0];
-                    const touchPos = new Vector2(touch.clientX, touch.clientY);
-                    const lastPos = currentPath.length > 0 
-                        ? currentPath[currentPath.length - 1].position 
-                        : touchPos;
-
-                    generatePathParticles(lastPos, touchPos);
-                });
-
-                function endTouchDrawing(e) {
-                    e.preventDefault();
-                    if (!isDrawing) return;
-                    isDrawing = false;
-
-                    if (currentPath.length > 0) {
-                        // Create a flower at the end of the path
-                        const lastPos = currentPath[currentPath.length - 1].position;
-                        flowers.push(new Flower(lastPos, currentColor));
-                    }
-                }
-
-                canvas.addEventListener('touchend', endTouchDrawing);
-                canvas.addEventListener('touchcancel', endTouchDrawing);
-
-                // Animation loop
-                function animate() {
-                    // Clear the canvas
-                    ctx.clearRect(0, 0, canvas.width, canvas.height);
-
-                    // Draw path particles
-                    if (isDrawing && currentPath.length > 0) {
-                        for (const point of currentPath) {
-                            const particle = new Particle(
-                                point.position,
-                                point.velocity,
-                                currentColor,
-                                8 + Math.random() * 4,
-                                0.8
-                            );
-                            particle.size = particle.baseSize; // Show full size immediately
-                            particle.draw(ctx);
-                        }
-                    }
-
-                    // Update and draw flowers
-                    flowers.forEach(flower => {
-                        flower.update();
-                        flower.draw(ctx);
-                    });
-
-                    requestAnimationFrame(animate);
-                }
-
-                // Start animation
-                animate();
-
-                // Optional: Add background elements
-                function drawBackground() {
-                    // Add subtle grass texture at the bottom
-                    const grassHeight = canvas.height * 0.1;
-                    const grassGradient = ctx.createLinearGradient(0, canvas.height - grassHeight, 0, canvas.height);
-                    grassGradient.addColorStop(0, 'rgba(76, 154, 42, 0.2)');
-                    grassGradient.addColorStop(1, 'rgba(82, 121, 65, 0.4)');
-
-                    ctx.fillStyle = grassGradient;
-                    ctx.fillRect(0, canvas.height - grassHeight, canvas.width, grassHeight);
-                }
-            });
-        </script>
-    </body>
-    </html>
-    ''')
+    return index_page.response(request)
+
+
+@app.route('/static/<path:filename>')
+def static_asset(filename):
+    asset = assets.get(filename)
+    if asset is None:
+        abort(404)
+    return asset.response(request)
+
+
+@app.route('/garden/<garden_id>')
+def garden_state(garden_id):
+    # Every live flower, or with ?since=<version> just the changes after that version:
+    # ``full`` says whether ``flowers`` replaces the garden (after a clear) or adds to it.
+    # Changes no longer in the log are a 410, and the client loads its view again rather
+    # than every flower. The version is the ETag, so an unchanged garden is a 304.
+    since = request.args.get('since')
+    if since is not None:
+        since = version_arg(since)
+    log = get_garden(garden_id)
+    version = log.version if log is not None else 0
+    if request.if_none_match.contains_weak(str(version)):
+        response = Response(status=304)
+    else:
+        if log is None:
+            flowers, full = [], True
+        elif since is None:
+            version, flowers = load_garden(garden_id, log)
+            full = True
+        else:
+            delta = log.events_since(since)
+            if delta is None:
+                abort(410)
+            version, events = delta
+            flowers = replay(np.zeros(0, dtype=EVENT), events)
+            full = bool((events['kind'] == CLEAR).any())
+        response = flowers_json(version, flowers, full=full)
+    response.set_etag(str(version), weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/garden/<garden_id>/viewport')
+def garden_viewport(garden_id):
+    # Flowers that can draw anything inside the rectangle x, y, width, height
+    rect = rect_args()
+    log, index = get_view(garden_id, 'index')
+    with log.lock:
+        version = log.version
+        flowers = index.flowers[index.query(*rect)]
+    if request.args.get('format') == 'archive':
+        return archive_response(version, flowers)
+    return flowers_json(version, flowers)
+
+
+@app.route('/garden/<garden_id>/lod/<int:z>')
+def garden_lod(garden_id, z):
+    # Aggregated flower cells of zoom level z inside the rectangle x, y, width, height
+    rect = rect_args()
+    log, pyramid = get_view(garden_id, 'lod')
+    if z >= len(pyramid.levels):
+        abort(404)
+    # Only the lookup holds the garden; the cells are copies, encoded after letting go
+    with log.lock:
+        version = log.version
+        keys, counts, colors, centroids, densities = pyramid.cells(z, *rect)
+    return jsonify(
+        version=version,
+        level=z,
+        cellSize=pyramid.levels[z].cell_size,
+        cells={
+            'x': keys[:, 0].tolist(),
+            'y': keys[:, 1].tolist(),
+            'count': counts.tolist(),
+            'color': [format_color(c) for c in colors],
+            'cx': centroids[:, 0].tolist(),
+            'cy': centroids[:, 1].tolist(),
+            'density': densities.tolist(),
+        },
+    )
+
+
+@app.route('/garden/<garden_id>/flowers', methods=['POST'])
+def add_flower(garden_id):
+    records = flower_event(*parse_flower(request.get_json(silent=True)))
+    return jsonify(version=submit_events(garden_id, records)), 201
+
+
+@app.route('/garden/<garden_id>/strokes', methods=['POST'])
+def add_strokes(garden_id):
+    # Binary strokes (garden/strokes.py): each one's simplified line is stored and
+    # broadcast, followed by the flower planted where it ends
+    data = request.stream.read(MAX_BYTES + 1)
+    if len(data) > MAX_BYTES:
+        abort(413)
+    try:
+        strokes = decode_strokes(data)
+    except StrokeError:
+        abort(400)
+    if not strokes:
+        abort(400)
+    records = stroke_records(strokes)
+    points = int(np.count_nonzero(records['kind'] == STROKE))
+    return jsonify(version=submit_events(garden_id, records), flowers=len(strokes), points=points), 201
+
+
+@app.route('/garden/<garden_id>/export')
+def export_garden(garden_id):
+    log = get_garden(garden_id)
+    version, flowers = load_garden(garden_id, log) if log is not None else (0, np.zeros(0, dtype=EVENT))
+    return archive_response(version, flowers, filename=f'{garden_id}.garden')
+
+
+@app.route('/garden/<garden_id>/import', methods=['POST'])
+def import_garden(garden_id):
+    # Replace the garden with an uploaded archive: spooled to a temporary file as it
+    # arrives, then memory-mapped and appended as a clear plus batches of flowers
+    get_garden(garden_id)  # Invalid ids fail before the upload is spooled
+    with tempfile.TemporaryFile() as f:
+        shutil.copyfileobj(request.stream, f)
+        f.flush()
+        try:
+            _, columns = open_archive(f)
+            check_positions(columns)
+        except (ArchiveError, ValueError):
+            abort(400)
+        count = len(columns['seed'])
+        # Through the ingest queue like any other write, so other gardens keep being written
+        # meanwhile. Once the clear is in, the chunks wait for room rather than stop half way.
+        version = submit_events(garden_id, clear_event())
+        for start in range(0, count, CHUNK_ROWS):
+            version = ingest.submit(garden_id, flower_records(columns, start, start + CHUNK_ROWS), block=True)
+    return jsonify(version=version, flowers=count)
+
+
+@app.route('/garden/<garden_id>/clear', methods=['POST'])
+def clear_garden(garden_id):
+    return jsonify(version=submit_events(garden_id, clear_event()))
+
+
+@app.route('/garden/<garden_id>/events')
+def garden_events(garden_id):
+    # EventSource sends Last-Event-ID when it reconnects, which wins over ?since=
+    since = version_arg(request.headers.get('Last-Event-ID', request.args.get('since', '0')))
+    log = get_garden(garden_id)
+    if log is None:
+        return Response(f'retry: {MISSING_RETRY_MS}\n\n', mimetype='text/event-stream')
+    channel = hub.channel(garden_id, log.version)
+    response = Response(channel.subscribe(since), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus text format. Every worker process keeps its own, see README
+    garden_sizes = []
+    for garden_id, log in list(gardens.logs.items()):
+        if SHARED and garden_id in shared_gardens.gardens:
+            flowers = shared_gardens.gardens[garden_id].state()[1]
+        elif ('index', garden_id) in views:
+            flowers = views['index', garden_id].count
+        else:
+            continue
+        garden_sizes.append((garden_id, log.version, flowers))
+
+    families = [
+        ('garden_request_duration_seconds', 'histogram', 'Time to handle a request, by route.',
+         [line for route, histogram in sorted(request_latency.items())
+          for line in histogram.samples('garden_request_duration_seconds', {'route': route})]),
+        ('garden_events_total', 'counter', 'Events appended by this process, by kind.',
+         [f'garden_events_total{{kind="{kind}"}} {rate.total}' for kind, rate in event_rates.items()]),
+        ('garden_events_per_second', 'gauge', 'Events appended per second over the last minute.',
+         [f'garden_events_per_second{{kind="{kind}"}} {rate.rate():.9g}' for kind, rate in event_rates.items()]),
+        ('garden_version', 'gauge', 'Current version of each loaded garden.',
+         [f'garden_version{{garden="{garden_id}"}} {version}' for garden_id, version, _ in garden_sizes]),
+        ('garden_flowers', 'gauge', 'Live flowers of each loaded garden.',
+         [f'garden_flowers{{garden="{garden_id}"}} {flowers}' for garden_id, _, flowers in garden_sizes]),
+    ]
+    families += [
+        ('garden_ingest_queue_depth', 'gauge', 'Submissions waiting to be written.',
+         [f'garden_ingest_queue_depth {ingest.depth}']),
+        ('garden_ingest_rejected_total', 'counter', 'Submissions turned away with a 429.',
+         [f'garden_ingest_rejected_total {ingest.rejected}']),
+        ('garden_ingest_wait_seconds', 'histogram', 'Time from submission to the start of its batch write.',
+         ingest.wait_latency.samples('garden_ingest_wait_seconds', {})),
+        ('garden_ingest_write_seconds', 'histogram', 'Time to write one batch of one garden.',
+         ingest.write_latency.samples('garden_ingest_write_seconds', {})),
+        ('garden_ingest_batch_events', 'histogram', 'Events per batch write.',
+         ingest.batch_sizes.samples('garden_ingest_batch_events', {})),
+    ]
+    for name, sketch in client_sketches.items():
+        families.append((f'garden_client_{name}', 'summary', CLIENT_HELP[name],
+                         sketch.samples(f'garden_client_{name}')))
+    return Response(exposition(families), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/metrics/client', methods=['POST'])
+def client_metrics():
+    # A batch of {frame_ms: [...], stall_ms: [...], particles: [...]} samples from one client
+    if (request.content_length or 0) > MAX_CLIENT_BYTES:
+        abort(413)
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        abort(400)
+    batches = {}
+    for name in client_sketches:
+        values = payload.get(name, [])
+        if not isinstance(values, list) or not all(
+                isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            abort(400)
+        batches[name] = np.array(values, dtype=np.float64)
+    if sum(len(values) for values in batches.values()) > MAX_CLIENT_SAMPLES:
+        abort(413)
+    if not all(np.isfinite(values).all() and (values >= 0).all() for values in batches.values()):
+        abort(400)
+    for name, values in batches.items():
+        client_sketches[name].add(values)
+    return '', 204
+
+
+@app.route('/tiles/<int:z>/<int(signed=True):x>/<int(signed=True):y>.png')
+def garden_tile(z, x, y):
+    # Pre-rendered raster tile of ?garden=<id> (default 'default'), zoomed out by 2 ** z
+    # No flower can be further out than POSITION_LIMIT, so neither can a tile with anything on it
+    limit = POSITION_LIMIT // tile_span(z) + 1
+    if z > MAX_ZOOM or abs(x) > limit or abs(y) > limit:
+        abort(404)
+    garden_id = request.args.get('garden', 'default')
+    log, index = get_view(garden_id, 'index')
+    with log.lock:
+        empty = len(index.query(*tile_bounds(z, x, y))) == 0
+
+    def render():
+        with log.lock:
+            flowers = index.flowers[index.query(*tile_bounds(z, x, y))].copy()
+        return render_tile(flowers, z, x, y)
+
+    # Empty tiles are all the same and not cached, so requests for them can't fill the disk
+    data = EMPTY_TILE if empty else tiles.get(garden_id, z, x, y, render)
+    response = Response(data, mimetype='image/png')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(hashlib.sha256(data).hexdigest()[:32])
+    return response.make_conditional(request)
+
+
+@app.route('/garden/<garden_id>/timelapse.png')
+def garden_timelapse(garden_id):
+    # Animated PNG of the rectangle x, y, width, height blooming, streamed frame by frame.
+    # ?scale= sets pixels per world pixel, ?frames= the length and ?grow= flowers planted per frame.
+    x0, y0, x1, y1 = rect_args()
+    scale = float_arg('scale') if 'scale' in request.args else 1.0
+    frames = request.args.get('frames', 120, type=int)
+    grow = request.args.get('grow', 0, type=int)
+    width, height = math.ceil((x1 - x0) * scale), math.ceil((y1 - y0) * scale)
+    if not (scale > 0 and 0 < frames <= MAX_FRAMES and grow >= 0
+            and 0 < width and 0 < height and width * height <= MAX_TIMELAPSE_PIXELS
+            and width * height * frames <= MAX_TIMELAPSE_WORK):
+        abort(400)
+
+    log, index = get_view(garden_id, 'index')
+    with log.lock:
+        flowers = index.flowers[index.query(x0, y0, x1, y1)]
+    if not timelapse_slots.acquire(blocking=False):
+        abort(429, retry_after=RETRY_AFTER)
+    try:
+        timelapse = Timelapse(flowers, frames, width, height, x0, y0, scale, planted_per_frame=grow)
+        response = Response(timelapse.apng(renderers), mimetype='image/png')
+    except BaseException:
+        timelapse_slots.release()
+        raise
+    # The slot is held until the stream ends or the client goes away
+    response.call_on_close(timelapse_slots.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=True, port=5000)
@@ -0,0 +1,162 @@
+"""Benchmarks for page serving, simulation and rasterization.
+
+    python -m benchmarks.bench                          # print results as JSON
+    python -m benchmarks.bench -o results.json          # write them to a file
+    python -m benchmarks.bench --baseline base.json     # compare, exit 1 on regressions
+
+Every result is a time per operation in seconds, so lower is always better.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from garden.render import Canvas, draw_garden
+from garden.simulation import Garden, parse_color
+
+SEED = 1234
+COLOR = parse_color('#ff7eb9')
+
+
+def percentile(samples, q):
+    return float(np.percentile(samples, q))
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def random_garden(flowers, extent=4096.0):
+    rng = np.random.default_rng(SEED)
+    garden = Garden()
+    garden.plant(rng.random((flowers, 2)) * extent, COLOR, rng)
+    return garden
+
+
+def bench_page(requests=2000):
+    # Keep the benchmark's stored gardens out of the real data directory
+    os.environ.setdefault('GARDEN_DATA', tempfile.mkdtemp(prefix='garden-bench-'))
+    from app import app
+
+    client = app.test_client()
+    headers = {'Accept-Encoding': 'gzip, br'}
+    etag = client.get('/', headers=headers).headers['ETag']
+
+    results = {}
+    full = timed(lambda: client.get('/', headers=headers), requests)
+    results['page.full.p50'] = percentile(full, 50)
+    results['page.full.p99'] = percentile(full, 99)
+    revalidate = {**headers, 'If-None-Match': etag}
+    cached = timed(lambda: client.get('/', headers=revalidate), requests)
+    results['page.not_modified.p50'] = percentile(cached, 50)
+    results['page.not_modified.p99'] = percentile(cached, 99)
+    return results
+
+
+def bench_simulation(sizes=(1000, 10000, 100000), steps=20):
+    results = {}
+    for n in sizes:
+        garden = random_garden(n)
+        samples = timed(garden.step, steps)
+        results[f'simulation.step.{n}'] = statistics.median(samples)
+    return results
+
+
+def bench_raster(flowers=200, repeat=3):
+    garden = random_garden(flowers, extent=1024.0)
+
+    def render():
+        draw_garden(Canvas(1024, 1024), garden, bloomed=True).to_image()
+
+    return {'raster.flower': statistics.median(timed(render, repeat)) / flowers}
+
+
+def bench_generate(flowers=500000):
+    from garden.generate import generate
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.garden')
+        for name, workers in (('serial', 1), ('parallel', os.cpu_count())):
+            start = time.perf_counter()
+            generate(path, flowers, 65536.0, 65536.0, workers=workers, seed=SEED)
+            results[f'generate.flower.{name}'] = (time.perf_counter() - start) / flowers
+    return results
+
+
+SUITES = {
+    'page': bench_page,
+    'simulation': bench_simulation,
+    'raster': bench_raster,
+    'generate': bench_generate,
+}
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison table and return the names that slowed down beyond ``threshold``."""
+    regressions = []
+    for name, value in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            print(f'{name:32} {value:12.3e}        (new)', file=sys.stderr)
+            continue
+        change = value / base - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f'{name:32} {value:12.3e} {change:+8.1%}{flag}', file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('suites', nargs='*', metavar='suite',
+                        help=f'suites to run: {", ".join(SUITES)} (default: all)')
+    parser.add_argument('-o', '--output', help='write results JSON here instead of stdout')
+    parser.add_argument('--baseline', help='results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative slowdown reported as a regression (default: 0.2)')
+    args = parser.parse_args(argv)
+    for name in args.suites:
+        if name not in SUITES:
+            parser.error(f'unknown suite {name!r}')
+
+    results = {}
+    for name in args.suites or SUITES:
+        results.update(SUITES[name]())
+
+    report = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+// Node side of benchmarks/conformance.py: loads static/js/engine.js, runs the flowers and
+// timings described by the JSON request on stdin and writes the results as JSON to stdout.
+// Float64 results are base64 encoded.
+const fs = require('fs');
+const vm = require('vm');
+
+const request = JSON.parse(fs.readFileSync(0, 'utf8'));
+const context = vm.createContext({ Math, Float64Array, Uint8Array, Uint16Array, Uint32Array, Map, performance });
+vm.runInContext(fs.readFileSync(request.engine, 'utf8') +
+    '\nthis.engine = { Vector2, ParticlePool, Flower, lightenColor };', context);
+const { Vector2, ParticlePool, Flower, lightenColor } = context.engine;
+
+// Stands in for a canvas context and keeps what ParticlePool.draw fills
+class RecordingContext {
+    constructor() {
+        this.globalAlpha = 1;
+        this.fillStyle = '';
+        this.path = [];
+        this.alpha = [];
+        this.styles = [];
+        this.points = [];
+    }
+
+    beginPath() { this.path = []; }
+    moveTo(x, y) { this.path.push(x, y); }
+    bezierCurveTo(...args) { this.path.push(...args); }
+    closePath() {}
+
+    fill() {
+        this.alpha.push(this.globalAlpha);
+        this.styles.push(this.fillStyle);
+        // moveTo and the two curves: start, ctrl1, ctrl2, end, ctrl3, ctrl4, start
+        this.points.push(...this.path.slice(0, 12));
+    }
+}
+
+const nullContext = {
+    beginPath() {}, moveTo() {}, bezierCurveTo() {}, closePath() {}, fill() {}
+};
+
+function encode(values) {
+    return Buffer.from(new Float64Array(values).buffer).toString('base64');
+}
+
+function plant(flowers) {
+    const pool = new ParticlePool(1024);
+    const planted = flowers.map(([x, y, color, seed]) => new Flower(pool, new Vector2(x, y), color, seed));
+    return { pool, planted };
+}
+
+function trace(flowers, steps) {
+    const { pool, planted } = plant(flowers);
+    const state = [];
+    const drawn = [];
+    const alpha = [];
+    const points = [];
+    let styles = null;
+    for (let step = 0; step <= steps; step++) {
+        if (step > 0) planted.forEach(flower => flower.update());
+        for (let i = 0; i < pool.count; i++) {
+            state.push(pool.x[i], pool.y[i], pool.vx[i], pool.vy[i], pool.size[i], pool.life[i]);
+        }
+        const ctx = new RecordingContext();
+        pool.draw(ctx, 0, pool.count);
+        drawn.push(ctx.alpha.length);
+        alpha.push(...ctx.alpha);
+        points.push(...ctx.points);
+        if (styles === null) styles = ctx.styles;
+    }
+    return {
+        particles: pool.count,
+        state: encode(state),
+        drawn: drawn,
+        alpha: encode(alpha),
+        points: encode(points),
+        styles: styles
+    };
+}
+
+// Milliseconds per step of updating every flower, and of drawing every petal into a
+// context that does nothing, so only the geometry is timed
+function time(flowers, steps) {
+    const { pool, planted } = plant(flowers);
+    const update = () => planted.forEach(flower => flower.update());
+    const draw = () => pool.draw(nullContext, 0, pool.count);
+    const measure = (fn) => {
+        for (let i = 0; i < 5; i++) fn(); // Let the JIT settle
+        const start = performance.now();
+        for (let i = 0; i < steps; i++) fn();
+        return (performance.now() - start) / steps;
+    };
+    // Drawing leaves the particles alone, so it goes first
+    const drawMs = measure(draw);
+    return { particles: pool.count, draw: drawMs, update: measure(update) };
+}
+
+const response = {
+    trace: trace(request.flowers, request.steps),
+    lighten: request.lighten.map(([color, amount]) => lightenColor(color, amount)),
+    timing: time(request.timing.flowers, request.timing.steps)
+};
+process.stdout.write(JSON.stringify(response));
@@ -0,0 +1,189 @@
+"""Check the JS engine against the Python simulation, and compare their speed.
+
+    python -m benchmarks.conformance                    # report, exit 1 on any mismatch
+    python -m benchmarks.conformance --steps 200 --tolerance 1e-6
+
+static/js/engine.js runs under Node (benchmarks/conformance.js). The same seeded flowers
+are stepped on both sides and compared after every step: particle positions, velocities,
+sizes and life, the petal control points and opacity ParticlePool.draw uses, petal colours
+and lightenColor. Timings are per step for the same garden on each side.
+"""
+import argparse
+import base64
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from garden.render import alpha_for, petal_control_points
+from garden.simulation import Garden, format_color, lighten, parse_color
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENGINE = os.path.join(BASE_DIR, 'static', 'js', 'engine.js')
+DRIVER = os.path.join(BASE_DIR, 'benchmarks', 'conformance.js')
+COLORS = ('#ff7eb9', '#7afcff', '#feff9c', '#fff740', '#ff65a3', '#000000', '#ffffff')
+SEED = 1234
+TOLERANCE = 1e-9
+
+
+class NodeMissing(Exception):
+    pass
+
+
+def random_flowers(count, extent, rng):
+    seeds = rng.integers(0, 2 ** 32, size=count, dtype=np.uint32)
+    positions = np.round(rng.random((count, 2)) * extent * 16) / 16
+    colors = rng.choice(COLORS, size=count)
+    return [[float(x), float(y), str(color), int(seed)] for (x, y), color, seed in zip(positions, colors, seeds)]
+
+
+def python_garden(flowers):
+    garden = Garden()
+    garden.plant_seeded([f[:2] for f in flowers], [parse_color(f[2]) for f in flowers], [f[3] for f in flowers])
+    return garden
+
+
+def run_node(request, node='node'):
+    executable = shutil.which(node)
+    if executable is None:
+        raise NodeMissing(f'{node} not found; the JS side needs Node.js')
+    result = subprocess.run([executable, DRIVER], input=json.dumps(request).encode(),
+                            capture_output=True, check=True)
+    return json.loads(result.stdout)
+
+
+def _decode(data):
+    return np.frombuffer(base64.b64decode(data), dtype=np.float64)
+
+
+def compare_trace(flowers, steps, trace):
+    """Largest difference per quantity as ``{name: (diff, step)}``, and mismatches that can't be measured."""
+    garden = python_garden(flowers)
+    n = garden.particle_count
+    errors = []
+    if trace['particles'] != n:
+        return {}, [f'particle count: js {trace["particles"]}, python {n}']
+
+    state = _decode(trace['state']).reshape(steps + 1, n, 6)
+    alpha = _decode(trace['alpha'])
+    points = _decode(trace['points']).reshape(-1, 6, 2)
+    worst = dict.fromkeys(('position', 'velocity', 'size', 'life', 'control_points', 'alpha'), (0.0, 0))
+
+    def record(name, js, python):
+        diff = float(np.abs(js - python).max(initial=0))
+        if diff > worst[name][0]:
+            worst[name] = (diff, step)
+
+    drawn = 0
+    for step in range(steps + 1):
+        if step:
+            garden.step()
+        js = state[step]
+        record('position', js[:, 0:2], garden.position[:n])
+        record('velocity', js[:, 2:4], garden.velocity[:n])
+        record('size', js[:, 4], garden.size[:n])
+        record('life', js[:, 5], garden.life[:n])
+
+        # ParticlePool.draw skips petals that have faded out
+        opacity = alpha_for(garden.life[:n])
+        visible = np.flatnonzero(opacity > 0)
+        count = trace['drawn'][step]
+        if count != len(visible):
+            errors.append(f'step {step}: js drew {count} petals, python {len(visible)}')
+            drawn += count
+            continue
+        expected = petal_control_points(garden.position[visible], garden.velocity[visible], garden.size[visible])
+        record('control_points', points[drawn:drawn + count], expected)
+        record('alpha', alpha[drawn:drawn + count], opacity[visible])
+        drawn += count
+
+    # ParticlePool.draw fills 'rgb(r, g, b)'
+    colors = [f'rgb({r}, {g}, {b})' for r, g, b in garden.color[:n].astype(int).tolist()]
+    mismatched = sum(a != b for a, b in zip(trace['styles'], colors))
+    if mismatched:
+        errors.append(f'{mismatched} of {n} petal colours differ')
+    return worst, errors
+
+
+def lighten_cases():
+    return [[color, amount] for color in COLORS for amount in range(-80, 81, 5)]
+
+
+def compare_lighten(cases, results):
+    expected = [format_color(lighten(parse_color(color), amount)) for color, amount in cases]
+    return [f'lightenColor({color!r}, {amount}): js {got}, python {want}'
+            for (color, amount), got, want in zip(cases, results, expected) if got != want]
+
+
+def python_timing(flowers, steps):
+    """Milliseconds per step of ``Garden.step`` and of computing every petal's control points."""
+    garden = python_garden(flowers)
+    n = garden.particle_count
+
+    def measure(fn):
+        fn()
+        start = time.perf_counter()
+        for _ in range(steps):
+            fn()
+        return (time.perf_counter() - start) / steps * 1000
+
+    draw = measure(lambda: petal_control_points(garden.position[:n], garden.velocity[:n], garden.size[:n]))
+    return {'particles': n, 'draw': draw, 'update': measure(garden.step)}
+
+
+def run(flowers=32, steps=100, timing_flowers=2000, timing_steps=50, node='node'):
+    rng = np.random.default_rng(SEED)
+    traced = random_flowers(flowers, 512.0, rng)
+    timed = random_flowers(timing_flowers, 4096.0, rng)
+    cases = lighten_cases()
+    response = run_node({
+        'engine': ENGINE,
+        'flowers': traced,
+        'steps': steps,
+        'lighten': cases,
+        'timing': {'flowers': timed, 'steps': timing_steps},
+    }, node)
+    worst, errors = compare_trace(traced, steps, response['trace'])
+    errors += compare_lighten(cases, response['lighten'])
+    timing = {'js': response['timing'], 'python': python_timing(timed, timing_steps)}
+    return worst, errors, timing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--flowers', type=int, default=32, help='flowers compared step by step')
+    parser.add_argument('--steps', type=int, default=100)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='largest allowed difference')
+    parser.add_argument('--timing-flowers', type=int, default=2000, help='flowers in the timed garden')
+    parser.add_argument('--timing-steps', type=int, default=50)
+    parser.add_argument('--node', default='node', help='Node.js executable')
+    args = parser.parse_args(argv)
+
+    try:
+        worst, errors, timing = run(args.flowers, args.steps, args.timing_flowers, args.timing_steps, args.node)
+    except NodeMissing as error:
+        print(error, file=sys.stderr)
+        return 2
+
+    for name, (value, step) in worst.items():
+        flag = '' if value <= args.tolerance else '  MISMATCH'
+        print(f'{name:16} max diff {value:.3e} (step {step}){flag}')
+        if flag:
+            errors.append(f'{name} differs by {value:.3e} at step {step}')
+    for error in errors:
+        print(error, file=sys.stderr)
+
+    particles = timing['js']['particles']
+    print(f'\nper step, {particles} particles   {"js":>10} {"python":>10} {"js/python":>10}')
+    for name in ('update', 'draw'):
+        js, py = timing['js'][name], timing['python'][name]
+        print(f'{name:30} {js:8.3f}ms {py:8.3f}ms {js / py:10.2f}')
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import mmap
+import struct
+
+import numpy as np
+
+from garden.prng import mulberry32
+from garden.simulation import PETALS_MAX, PETALS_MIN
+from garden.spatial import flower_sizes
+from garden.storage import EVENT, FLOWER, POSITION_LIMIT, POSITION_SCALE
+
+# Garden archives: a fixed header followed by one column per flower field. Every column
+# starts on an 8 byte boundary so it can be viewed in place, by np.frombuffer over an
+# mmap here and by a typed array over an ArrayBuffer in the browser.
+ARCHIVE_MAGIC = b'PFGARDEN'
+FORMAT_VERSION = 1
+# magic, format version, reserved, garden version, flower count
+ARCHIVE_HEADER = struct.Struct('<8sIIQQ')
+COLUMNS = [
+    ('x', np.dtype('<f4'), 1),
+    ('y', np.dtype('<f4'), 1),
+    ('color', np.dtype('u1'), 3),
+    ('size', np.dtype('<f4'), 1),
+    ('petals', np.dtype('u1'), 1),
+    ('seed', np.dtype('<u4'), 1),
+]
+ALIGN = 8
+CHUNK_ROWS = 1 << 16
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def _padding(size):
+    return -size % ALIGN
+
+
+def layout(count):
+    """``(name, dtype, width, offset)`` of every column, and the archive size in bytes."""
+    columns = []
+    offset = ARCHIVE_HEADER.size
+    for name, dtype, width in COLUMNS:
+        columns.append((name, dtype, width, offset))
+        size = count * width * dtype.itemsize
+        offset += size + _padding(size)
+    return columns, offset
+
+
+def petal_counts(seeds):
+    # Flower.maxPetals is the first draw of the flower's seed
+    return np.floor(mulberry32(seeds, 0) * (PETALS_MAX - PETALS_MIN + 1)).astype(np.uint8) + PETALS_MIN
+
+
+def _column(flowers, name):
+    if name == 'size':
+        return flower_sizes(flowers['seed'])
+    if name == 'petals':
+        return petal_counts(flowers['seed'])
+    return flowers[name]
+
+
+def export_chunks(version, flowers, chunk_rows=CHUNK_ROWS):
+    """Yield the archive of FLOWER records as byte strings of at most ``chunk_rows`` rows.
+
+    Derived columns (size, petal count) are computed one chunk at a time, so memory
+    stays bounded by the chunk size rather than the garden.
+    """
+    count = len(flowers)
+    yield ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, FORMAT_VERSION, 0, version, count)
+    for name, dtype, width, _ in layout(count)[0]:
+        for start in range(0, count, chunk_rows):
+            chunk = _column(flowers[start:start + chunk_rows], name)
+            yield np.ascontiguousarray(chunk, dtype=dtype).tobytes()
+        padding = _padding(count * width * dtype.itemsize)
+        if padding:
+            yield bytes(padding)
+
+
+def allocate(path, count, version=0):
+    """Create an archive file for ``count`` flowers with zeroed columns, to be filled in place."""
+    size = layout(count)[1]
+    with open(path, 'wb') as f:
+        f.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, FORMAT_VERSION, 0, version, count))
+        f.truncate(size)
+
+
+def read_archive(buffer):
+    """Return ``(version, columns)`` with each column a view into ``buffer``, not a copy."""
+    if len(buffer) < ARCHIVE_HEADER.size:
+        raise ArchiveError('truncated archive header')
+    magic, format_version, _, version, count = ARCHIVE_HEADER.unpack_from(buffer)
+    if magic != ARCHIVE_MAGIC:
+        raise ArchiveError('not a garden archive')
+    if format_version != FORMAT_VERSION:
+        raise ArchiveError(f'unsupported archive format {format_version}')
+    columns, size = layout(count)
+    if len(buffer) < size:
+        raise ArchiveError('truncated archive')
+
+    arrays = {}
+    for name, dtype, width, offset in columns:
+        array = np.frombuffer(buffer, dtype=dtype, count=count * width, offset=offset)
+        arrays[name] = array.reshape(count, width) if width > 1 else array
+    return version, arrays
+
+
+def open_archive(f):
+    """Memory-map an archive file opened in binary mode, see ``read_archive``."""
+    return read_archive(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def check_positions(columns, chunk_rows=CHUNK_ROWS):
+    """Raise ArchiveError unless every flower position is within POSITION_LIMIT, reading one chunk at a time."""
+    for start in range(0, len(columns['seed']), chunk_rows):
+        stop = start + chunk_rows
+        # NaN fails the comparison too
+        if not ((np.abs(columns['x'][start:stop]) <= POSITION_LIMIT).all()
+                and (np.abs(columns['y'][start:stop]) <= POSITION_LIMIT).all()):
+            raise ArchiveError('flower position out of range')
+
+
+def flower_records(columns, start=0, stop=None):
+    """FLOWER records for rows ``[start, stop)`` of an archive.
+
+    Size and petal count are not read back: they follow from the seed.
+    """
+    seeds = columns['seed'][start:stop]
+    x, y = columns['x'][start:stop], columns['y'][start:stop]
+    records = np.zeros(len(seeds), dtype=EVENT)
+    records['kind'] = FLOWER
+    records['color'] = columns['color'][start:stop]
+    records['seed'] = seeds
+    # Snap to the stored position resolution, as quantize() does for posted flowers
+    records['x'] = np.round(x * POSITION_SCALE) / POSITION_SCALE
+    records['y'] = np.round(y * POSITION_SCALE) / POSITION_SCALE
+    return records
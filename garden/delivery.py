@@ -0,0 +1,89 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+# Assets are fingerprinted, so they can be cached forever
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# The page itself changes on deploy, so clients always revalidate it
+REVALIDATE = 'no-cache'
+
+
+class Precompressed:
+    """A response body encoded once up front in every supported encoding."""
+
+    def __init__(self, body, mimetype, cache_control=REVALIDATE):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        self.digest = hashlib.sha256(body).hexdigest()
+
+        self.variants = {'identity': body}
+        compressed = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed['br'] = brotli.compress(body, quality=11)
+        for encoding, data in compressed.items():
+            # Only keep encodings that actually save bytes
+            if len(data) < len(body):
+                self.variants[encoding] = data
+
+        # Preferred order when the client accepts several encodings equally
+        self.encodings = [e for e in ('br', 'gzip', 'identity') if e in self.variants]
+
+    def etag(self, encoding):
+        # Strong validators must differ between content-codings
+        if encoding == 'identity':
+            return self.digest[:32]
+        return f'{self.digest[:32]}-{encoding}'
+
+    def negotiate(self, request):
+        return request.accept_encodings.best_match(self.encodings, default='identity')
+
+    def response(self, request):
+        encoding = self.negotiate(request)
+        response = Response(self.variants[encoding], mimetype=self.mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Cache-Control'] = self.cache_control
+        response.vary.add('Accept-Encoding')
+        response.set_etag(self.etag(encoding))
+        return response.make_conditional(request)
+
+
+class AssetBundle:
+    """Static files loaded once, fingerprinted by content hash and precompressed."""
+
+    def __init__(self, root):
+        self.root = root
+        self.urls = {}
+        self.assets = {}
+
+        for directory, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    body = f.read()
+
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                asset = Precompressed(body, mimetype, IMMUTABLE)
+
+                stem, ext = os.path.splitext(name)
+                fingerprinted = f'{stem}.{asset.digest[:12]}{ext}'
+                self.urls[name] = fingerprinted
+                self.assets[fingerprinted] = asset
+
+    def url_for(self, name):
+        return f'/static/{self.urls[name]}'
+
+    def get(self, fingerprinted):
+        return self.assets.get(fingerprinted)
@@ -0,0 +1,96 @@
+"""Generate large random gardens as archives (garden/archive.py), in parallel.
+
+    python -m garden.generate demo.garden --flowers 1000000
+    curl --data-binary @demo.garden localhost:5000/garden/demo/import
+
+The area is cut into square tiles and every tile's flowers are generated, vectorized,
+by a process pool that writes them straight into its rows of the memory-mapped file.
+Flowers only store (x, y, color, seed): petal count, size and petal colour variance
+come from the seed exactly as the ``Flower`` constructor draws them.
+"""
+import argparse
+import concurrent.futures
+import mmap
+import os
+import sys
+
+import numpy as np
+
+from garden.archive import allocate, petal_counts, read_archive
+from garden.simulation import parse_color
+from garden.spatial import flower_sizes
+from garden.storage import POSITION_SCALE
+
+# The colours of the page's color picker
+PALETTE = np.array([parse_color(c) for c in ('#ff7eb9', '#7afcff', '#feff9c', '#fff740', '#ff65a3')],
+                   dtype=np.uint8)
+TILE_SIZE = 4096.0
+
+
+def shard(width, height, tile_size=TILE_SIZE):
+    """``(x0, y0, x1, y1)`` tiles covering a ``width`` x ``height`` area from the origin."""
+    xs = np.append(np.arange(0, width, tile_size), width)
+    ys = np.append(np.arange(0, height, tile_size), height)
+    return [(float(x0), float(y0), float(x1), float(y1))
+            for y0, y1 in zip(ys[:-1], ys[1:]) for x0, x1 in zip(xs[:-1], xs[1:])]
+
+
+def fill_tile(path, tile, start, count, seed):
+    """Generate ``count`` flowers uniformly over ``tile`` into rows ``[start, start + count)``."""
+    rng = np.random.default_rng(seed)
+    x0, y0, x1, y1 = tile
+    stop = start + count
+    with open(path, 'r+b') as f, mmap.mmap(f.fileno(), 0) as buffer:
+        _, columns = read_archive(buffer)
+        seeds = rng.integers(0, 2 ** 32, size=count, dtype=np.uint32)
+        # Whole steps of the stored position resolution
+        columns['x'][start:stop] = np.floor(rng.uniform(x0, x1, count) * POSITION_SCALE) / POSITION_SCALE
+        columns['y'][start:stop] = np.floor(rng.uniform(y0, y1, count) * POSITION_SCALE) / POSITION_SCALE
+        columns['color'][start:stop] = PALETTE[rng.integers(0, len(PALETTE), count)]
+        columns['seed'][start:stop] = seeds
+        columns['size'][start:stop] = flower_sizes(seeds)
+        columns['petals'][start:stop] = petal_counts(seeds)
+        del columns  # Views must go before the map can close
+        buffer.flush()
+    return count
+
+
+def generate(path, flowers, width, height, tile_size=TILE_SIZE, workers=None, seed=None):
+    """Write an archive of ``flowers`` random flowers over a ``width`` x ``height`` area.
+
+    Flowers are split between tiles in proportion to their area, and every tile gets its
+    own child of ``seed``, so the output only depends on the arguments, not on ``workers``.
+    """
+    tiles = shard(width, height, tile_size)
+    areas = np.array([(x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in tiles])
+    sequence = np.random.SeedSequence(seed)
+    counts = np.random.default_rng(sequence).multinomial(flowers, areas / areas.sum())
+    starts = np.cumsum(counts) - counts
+    allocate(path, flowers)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [pool.submit(fill_tile, path, tile, int(start), int(count), child)
+                for tile, start, count, child in zip(tiles, starts, counts, sequence.spawn(len(tiles)))
+                if count]
+        return sum(job.result() for job in jobs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', help='archive file to write')
+    parser.add_argument('--flowers', type=int, default=1000000, help='number of flowers (default: 1000000)')
+    parser.add_argument('--width', type=float, default=65536.0, help='width of the area in pixels')
+    parser.add_argument('--height', type=float, default=65536.0, help='height of the area in pixels')
+    parser.add_argument('--tile', type=float, default=TILE_SIZE, help='tile size in pixels')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes (default: all cores)')
+    parser.add_argument('--seed', type=int, help='seed for a reproducible garden')
+    args = parser.parse_args(argv)
+    if args.flowers < 0 or args.width <= 0 or args.height <= 0 or args.tile <= 0:
+        parser.error('sizes must be positive')
+
+    generate(args.output, args.flowers, args.width, args.height, args.tile, args.workers, args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from garden.metrics import Histogram
+
+MAX_QUEUE = 1024  # Submissions waiting to be written
+BATCH_EVENTS = 4096
+BATCH_DELAY = 0.005  # seconds a batch stays open for more events
+RETRY_AFTER = 1  # seconds, suggested to clients turned away
+BATCH_SIZES = (1, 4, 16, 64, 256, 1024, 4096, 16384)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Ingest:
+    """Bounded queue of event submissions, written to storage in coalesced batches.
+
+    An asyncio loop on its own thread takes submissions off the queue until a batch has
+    ``batch_events`` records or is ``batch_delay`` old, and hands them to a writer per
+    key, which makes one ``write(key, records)`` call for everything waiting on that key
+    and gets back the version after the records. A write takes as long as it takes:
+    whatever arrives for its key meanwhile forms the next batch, so batches grow with the
+    load instead of writes multiplying, and a slow write holds up only its own key.
+    """
+
+    def __init__(self, write, max_queue=MAX_QUEUE, batch_events=BATCH_EVENTS, batch_delay=BATCH_DELAY):
+        self.write = write
+        self.max_queue = max_queue
+        self.batch_events = batch_events
+        self.batch_delay = batch_delay
+        self.loop = None
+        self.queue = None
+        self.thread = None
+        self.lock = threading.Lock()
+        self.pending = {}  # key -> submissions taken off the queue, waiting for its writer
+        self.waiting = 0  # Submissions in pending
+        self.drained = None
+        self.rejected = 0
+        self.wait_latency = Histogram()  # Submission to write start
+        self.write_latency = Histogram()
+        self.batch_sizes = Histogram(BATCH_SIZES)
+
+    @property
+    def depth(self):
+        return self.queue.qsize() + self.waiting if self.queue is not None else 0
+
+    def _start(self):
+        with self.lock:
+            if self.thread is None:
+                ready = threading.Event()
+                self.thread = threading.Thread(target=self._serve, args=(ready,), name='garden-ingest', daemon=True)
+                self.thread.start()
+                ready.wait()
+
+    def _serve(self, ready):
+        self.loop = asyncio.new_event_loop()
+        self.queue = asyncio.Queue(self.max_queue)
+        self.drained = asyncio.Event()
+        self.loop.create_task(self._run())
+        ready.set()
+        self.loop.run_forever()
+
+    def submit(self, key, records, timeout=None, block=False):
+        """Queue EVENT ``records`` for ``key`` and wait until they are written.
+
+        Returns the version after them. If the queue has no room this raises QueueFull,
+        or with ``block`` waits for room.
+        """
+        if self.loop is None:
+            self._start()
+        future = asyncio.run_coroutine_threadsafe(self._enqueue(key, records, block), self.loop)
+        try:
+            return future.result(timeout)
+        except QueueFull:
+            self.rejected += 1
+            raise
+
+    async def _enqueue(self, key, records, block):
+        done = self.loop.create_future()
+        item = (key, records, time.perf_counter(), done)
+        if block:
+            await self.queue.put(item)
+        else:
+            try:
+                self.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                raise QueueFull() from None
+        return await done
+
+    async def _take(self):
+        # Everything submitted within batch_delay of the first submission, up to batch_events records
+        batch = [await self.queue.get()]
+        events = len(batch[0][1])
+        deadline = self.loop.time() + self.batch_delay
+        while events < self.batch_events:
+            try:
+                item = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - self.loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            batch.append(item)
+            events += len(item[1])
+        return batch
+
+    async def _run(self):
+        while True:
+            # Leave submissions on the queue, where they count against max_queue, while
+            # as many again wait for their writers
+            while self.waiting >= self.max_queue:
+                self.drained.clear()
+                await self.drained.wait()
+            batch = await self._take()
+            for item in batch:
+                key = item[0]
+                if key not in self.pending:
+                    self.pending[key] = []
+                    self.loop.create_task(self._write(key))
+                self.pending[key].append(item)
+                self.waiting += 1
+
+    async def _write(self, key):
+        # The key's only writer, for as long as anything is waiting on it
+        while self.pending[key]:
+            items, self.pending[key] = self.pending[key], []
+            self.waiting -= len(items)
+            self.drained.set()
+            started = time.perf_counter()
+            for item in items:
+                self.wait_latency.observe(started - item[2])
+            records = np.concatenate([item[1] for item in items])
+            self.batch_sizes.observe(len(records))
+            try:
+                version = await self.loop.run_in_executor(None, self.write, key, records)
+            except Exception as error:
+                for item in items:
+                    item[3].set_exception(error)
+                continue
+            finally:
+                self.write_latency.observe(time.perf_counter() - started)
+            # Each submission ends where its own records end within the batch
+            ends = version - len(records) + np.cumsum([len(item[1]) for item in items])
+            for item, end in zip(items, ends.tolist()):
+                item[3].set_result(end)
+        del self.pending[key]
@@ -0,0 +1,122 @@
+import numpy as np
+
+from garden.storage import CLEAR, FLOWER
+
+LEVELS = 10
+# Cell size at level 0 in world pixels; every level above doubles it
+BASE_CELL = 32.0
+
+
+class Level:
+    """Running per-cell sums for one zoom level, stored in growable arrays.
+
+    Cells get rows in the order they are first occupied. ``codes`` holds every occupied
+    cell's int64 code, sorted, with its row in ``code_rows``, so a batch of flowers
+    finds or allocates its cells with one search instead of a lookup per cell.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.count = 0
+        self.codes = np.zeros(0, dtype=np.int64)
+        self.code_rows = np.zeros(0, dtype=np.int64)
+        self.keys = np.zeros((64, 2), dtype=np.int64)
+        self.flowers = np.zeros(64, dtype=np.int64)
+        self.color_sum = np.zeros((64, 3), dtype=np.int64)
+        self.position_sum = np.zeros((64, 2), dtype=np.float64)
+
+    def _grow(self, needed):
+        capacity = len(self.flowers)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ('keys', 'flowers', 'color_sum', 'position_sum'):
+            old = getattr(self, name)
+            array = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            array[:self.count] = old[:self.count]
+            setattr(self, name, array)
+
+    def add(self, positions, colors):
+        cells = np.floor(positions / self.cell_size).astype(np.int64)
+        # x in the high half, y offset into the low half
+        codes, first, inverse = np.unique((cells[:, 0] << 32) + (cells[:, 1] + (1 << 31)),
+                                          return_index=True, return_inverse=True)
+        at = np.searchsorted(self.codes, codes)
+        found = np.zeros(len(codes), dtype=bool)
+        inside = at < len(self.codes)
+        found[inside] = self.codes[at[inside]] == codes[inside]
+
+        rows = np.empty(len(codes), dtype=np.int64)
+        rows[found] = self.code_rows[at[found]]
+        new = ~found
+        added = int(new.sum())
+        if added:
+            self._grow(self.count + added)
+            rows[new] = np.arange(self.count, self.count + added)
+            self.keys[rows[new]] = cells[first[new]]
+            self.count += added
+            self.codes = np.insert(self.codes, at[new], codes[new])
+            self.code_rows = np.insert(self.code_rows, at[new], rows[new])
+
+        # Rows are distinct, so per-cell totals can be added with plain indexing
+        inverse = inverse.reshape(-1)
+        self.flowers[rows] += np.bincount(inverse, minlength=len(codes))
+        for channel in range(3):
+            self.color_sum[rows, channel] += np.bincount(inverse, colors[:, channel], len(codes)).astype(np.int64)
+        for axis in range(2):
+            self.position_sum[rows, axis] += np.bincount(inverse, positions[:, axis], len(codes))
+
+    def query(self, x0, y0, x1, y1):
+        """Rows of the occupied cells overlapping the rectangle."""
+        keys = self.keys[:self.count]
+        cx0, cy0 = np.floor(np.array([x0, y0]) / self.cell_size)
+        cx1, cy1 = np.floor(np.array([x1, y1]) / self.cell_size)
+        inside = ((keys[:, 0] >= cx0) & (keys[:, 0] <= cx1)
+                  & (keys[:, 1] >= cy0) & (keys[:, 1] <= cy1))
+        return np.flatnonzero(inside)
+
+
+class LodPyramid:
+    """Flowers aggregated per cell at every zoom level, updated as events arrive.
+
+    Each cell keeps the number of flowers, the sum of their colours and the sum of
+    their positions, so adding a flower is O(levels) and never rebuilds a level.
+    """
+
+    def __init__(self, levels=LEVELS, base_cell=BASE_CELL):
+        self.base_cell = base_cell
+        self.level_count = levels
+        self.clear()
+
+    def clear(self):
+        self.levels = [Level(self.base_cell * 2 ** z) for z in range(self.level_count)]
+
+    def apply(self, records):
+        """Apply a batch of EVENT records (flowers and clears) in order."""
+        clears = np.flatnonzero(records['kind'] == CLEAR)
+        if len(clears):
+            self.clear()
+            records = records[clears[-1] + 1:]
+        flowers = records[records['kind'] == FLOWER]
+        if len(flowers) == 0:
+            return
+        positions = np.stack([flowers['x'], flowers['y']], axis=1).astype(np.float64)
+        colors = flowers['color'].astype(np.int64)
+        for level in self.levels:
+            level.add(positions, colors)
+
+    def cells(self, z, x0, y0, x1, y1):
+        """Aggregated cells of level ``z`` in a rectangle.
+
+        Returns ``(keys, counts, colors, centroids, densities)``: integer cell
+        coordinates, flower counts, mean RGB colours, mean flower positions and
+        flowers per square world pixel.
+        """
+        level = self.levels[z]
+        rows = level.query(x0, y0, x1, y1)
+        counts = level.flowers[rows]
+        colors = np.rint(level.color_sum[rows] / counts[:, None]).astype(np.uint8)
+        centroids = level.position_sum[rows] / counts[:, None]
+        densities = counts / level.cell_size ** 2
+        return level.keys[rows], counts, colors, centroids, densities
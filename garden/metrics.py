@@ -0,0 +1,137 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+# Upper bounds of the request latency buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.9, 0.99)
+RATE_WINDOW = 60  # seconds
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+
+def _sample(name, value, labels=None):
+    return f'{name}{_labels(labels)} {value:.9g}'
+
+
+class Histogram:
+    """Counts of observations per fixed bucket, plus their count and sum."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = np.array(bounds, dtype=np.float64)
+        self.counts = np.zeros(len(bounds) + 1, dtype=np.int64)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        bucket = int(np.searchsorted(self.bounds, value))
+        with self.lock:
+            self.counts[bucket] += 1
+            self.sum += value
+
+    def samples(self, name, labels):
+        with self.lock:
+            counts = np.cumsum(self.counts)
+            total = self.sum
+        lines = [_sample(f'{name}_bucket', count, {**labels, 'le': f'{bound:g}'})
+                 for bound, count in zip(self.bounds.tolist(), counts[:-1].tolist())]
+        lines.append(_sample(f'{name}_bucket', counts[-1], {**labels, 'le': '+Inf'}))
+        lines.append(_sample(f'{name}_sum', total, labels))
+        lines.append(_sample(f'{name}_count', counts[-1], labels))
+        return lines
+
+
+class QuantileSketch:
+    """Streaming quantiles with a relative error of at most ``accuracy``, in constant memory.
+
+    Values are counted in logarithmic buckets ``gamma ** (i - 1) < v <= gamma ** i`` over
+    ``[minimum, maximum]`` (values outside are clamped), so a quantile is off by at most
+    ``accuracy`` of its value however many values were added.
+    """
+
+    def __init__(self, minimum=1e-3, maximum=1e6, accuracy=0.01):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.offset = math.ceil(math.log(minimum) / self.log_gamma)
+        self.minimum = minimum
+        self.maximum = maximum
+        size = math.ceil(math.log(maximum) / self.log_gamma) - self.offset + 1
+        self.counts = np.zeros(size, dtype=np.int64)
+        self.zeros = 0  # Values below minimum, reported as 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        small = values < self.minimum
+        clamped = np.minimum(values[~small], self.maximum)
+        buckets = np.ceil(np.log(clamped) / self.log_gamma).astype(np.int64) - self.offset
+        with self.lock:
+            np.add.at(self.counts, np.clip(buckets, 0, len(self.counts) - 1), 1)
+            self.zeros += int(small.sum())
+            self.sum += float(values.sum())
+
+    def quantile(self, q):
+        with self.lock:
+            count = self.zeros + int(self.counts.sum())
+            if count == 0:
+                return math.nan
+            rank = q * (count - 1)
+            if rank < self.zeros:
+                return 0.0
+            bucket = int(np.searchsorted(np.cumsum(self.counts), rank - self.zeros, side='right'))
+        # Midpoint of the bucket, relative to its bounds
+        return 2 * self.gamma ** (bucket + self.offset) / (self.gamma + 1)
+
+    def samples(self, name, labels=None):
+        labels = labels or {}
+        lines = [_sample(name, self.quantile(q), {**labels, 'quantile': f'{q:g}'}) for q in QUANTILES]
+        with self.lock:
+            count, total = self.zeros + int(self.counts.sum()), self.sum
+        lines.append(_sample(f'{name}_sum', total, labels))
+        lines.append(_sample(f'{name}_count', count, labels))
+        return lines
+
+
+class RateCounter:
+    """A running total plus the rate per second over the last ``window`` seconds."""
+
+    def __init__(self, window=RATE_WINDOW, clock=time.monotonic):
+        self.clock = clock
+        # Events per whole second, as a ring indexed by second modulo window
+        self.slots = np.zeros(window, dtype=np.int64)
+        self.seconds = np.full(window, -1, dtype=np.int64)
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def add(self, count=1):
+        second = int(self.clock())
+        slot = second % len(self.slots)
+        with self.lock:
+            if self.seconds[slot] != second:
+                self.seconds[slot] = second
+                self.slots[slot] = 0
+            self.slots[slot] += count
+            self.total += count
+
+    def rate(self):
+        second = int(self.clock())
+        with self.lock:
+            recent = self.seconds > second - len(self.slots)
+            return float(self.slots[recent].sum()) / len(self.slots)
+
+
+def exposition(families):
+    """Prometheus text format of ``(name, type, help, lines)`` metric families."""
+    out = []
+    for name, kind, help_text, lines in families:
+        out.append(f'# HELP {name} {help_text}')
+        out.append(f'# TYPE {name} {kind}')
+        out.extend(lines)
+    return '\n'.join(out) + '\n'
@@ -0,0 +1,63 @@
+import struct
+import zlib
+
+import numpy as np
+
+SIGNATURE = b'\x89PNG\r\n\x1a\n'
+COLOR_TYPES = {3: 2, 4: 6}  # channels -> PNG colour type (RGB, RGBA)
+
+
+def chunk(kind, data):
+    return (struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+
+def header(width, height, channels):
+    return chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, COLOR_TYPES[channels], 0, 0, 0))
+
+
+def compress_rows(image, level=6):
+    # Every scanline is prefixed with filter type 0 (None)
+    height = image.shape[0]
+    rows = np.zeros((height, image.shape[1] * image.shape[2] + 1), dtype=np.uint8)
+    rows[:, 1:] = image.reshape(height, -1)
+    return zlib.compress(rows.tobytes(), level)
+
+
+def encode_png(image, level=6):
+    """Encode an (H, W, 3) or (H, W, 4) uint8 array as PNG bytes."""
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    height, width, channels = image.shape
+    return assemble_png(width, height, channels, compress_rows(image, level))
+
+
+def assemble_png(width, height, channels, data):
+    """PNG bytes around image data already compressed by ``compress_rows``."""
+    return b''.join([
+        SIGNATURE,
+        header(width, height, channels),
+        chunk(b'IDAT', data),
+        chunk(b'IEND', b''),
+    ])
+
+
+def stream_apng(width, height, channels, frames, count, delay=(1, 30), plays=0):
+    """Yield an animated PNG piece by piece.
+
+    ``frames`` yields ``count`` full-size frames compressed by ``compress_rows``, each
+    shown for ``delay`` = (numerator, denominator) seconds. ``plays`` 0 loops forever.
+    """
+    yield SIGNATURE + header(width, height, channels) + chunk(b'acTL', struct.pack('>II', count, plays))
+    sequence = 0
+    for index, data in enumerate(frames):
+        # Every frame covers the whole image and replaces the previous one
+        control = struct.pack('>IIIIIHHBB', sequence, width, height, 0, 0, delay[0], delay[1], 0, 0)
+        sequence += 1
+        if index == 0:
+            # The first frame doubles as the still image for viewers without APNG support
+            body = chunk(b'IDAT', data)
+        else:
+            body = chunk(b'fdAT', struct.pack('>I', sequence) + data)
+            sequence += 1
+        yield chunk(b'fcTL', control) + body
+    yield chunk(b'IEND', b'')
@@ -0,0 +1,19 @@
+import numpy as np
+
+# mulberry32, the same generator as mulberry32() in static/js/engine.js. Its state just
+# advances by a constant, so draw k of a seed can be computed directly, for any number
+# of seeds at once.
+INCREMENT = 0x6D2B79F5
+MASK = np.uint64(0xffffffff)
+
+
+def mulberry32(seeds, index):
+    """The ``index``-th value (0-based) in [0, 1) of the stream of each seed."""
+    # uint64 holds every 32x32 bit product exactly; masking gives Math.imul's wraparound
+    seeds = np.asarray(seeds, dtype=np.uint64)
+    index = np.asarray(index, dtype=np.uint64)
+    a = (seeds + (index + 1) * INCREMENT) & MASK
+    t = ((a ^ (a >> 15)) * (a | 1)) & MASK
+    t = ((t + (((t ^ (t >> 7)) * (t | 61)) & MASK)) & MASK) ^ t
+    return (t ^ (t >> 14)) / 4294967296.0
+
@@ -0,0 +1,226 @@
+import numpy as np
+
+from garden.png import encode_png
+
+# body background colour from static/css/garden.css
+BACKGROUND = (0x28, 0x36, 0x18)
+CURVE_SAMPLES = 8
+SUPERSAMPLE = 2
+# Upper bound on coverage samples evaluated per batch, keeps memory flat for large gardens
+BATCH_SAMPLES = 1 << 22
+# Occlusion grid: cells are at least OCCLUSION_CELL pixels, and petals spanning more than
+# OCCLUSION_SPAN cells a side are always drawn
+OCCLUSION_CELL = 4
+OCCLUSION_SPAN = 8
+# Half side of a square, centred on the petal, that the petal always covers completely
+# (the tessellated petal's inscribed circle has a radius of 0.372 * size)
+PETAL_CORE = 0.25
+
+
+def _bernstein(samples):
+    t = np.arange(samples) / samples
+    u = 1 - t
+    return np.stack([u ** 3, 3 * u ** 2 * t, 3 * u * t ** 2, t ** 3], axis=1)
+
+
+BEZIER_WEIGHTS = _bernstein(CURVE_SAMPLES)
+
+
+def alpha_for(life):
+    # Particle.draw: opaque while life > 0.8, then fade; canvas clamps alpha into [0, 1]
+    return np.clip(np.where(life > 0.8, 1.0, life + 0.2), 0.0, 1.0)
+
+
+def petal_control_points(position, velocity, size):
+    """Control points of the petal drawn by ``Particle.draw`` for N particles.
+
+    Returns an (N, 6, 2) array of ``start, ctrl1, ctrl2, end, ctrl3, ctrl4``: the petal
+    is ``start -> end`` via ``ctrl1, ctrl2`` and back ``end -> start`` via ``ctrl3, ctrl4``.
+    """
+    position = np.asarray(position, dtype=np.float64).reshape(-1, 2)
+    velocity = np.asarray(velocity, dtype=np.float64).reshape(-1, 2)
+    size = np.asarray(size, dtype=np.float64).reshape(-1)
+
+    angle = np.arctan2(velocity[:, 1], velocity[:, 0])
+    direction = np.stack([np.cos(angle), np.sin(angle)], axis=1)
+    perp_angle = angle + np.pi / 2
+    perp = np.stack([np.cos(perp_angle), np.sin(perp_angle)], axis=1) * (size * 0.5)[:, None]
+
+    end = position + direction * size[:, None]
+    return np.stack([position, position + perp, end + perp, end, end - perp, position - perp], axis=1)
+
+
+def petal_outlines(control_points, samples=CURVE_SAMPLES):
+    """Tessellate (N, 6, 2) control points into closed (N, 2 * samples, 2) polygons."""
+    weights = BEZIER_WEIGHTS if samples == CURVE_SAMPLES else _bernstein(samples)
+    first = control_points[:, [0, 1, 2, 3]]
+    second = control_points[:, [3, 4, 5, 0]]
+    return np.concatenate([
+        np.einsum('kc,ncd->nkd', weights, first),
+        np.einsum('kc,ncd->nkd', weights, second),
+    ], axis=1)
+
+
+def coverage(polygons, origin, box, supersample=SUPERSAMPLE):
+    """Fractional pixel coverage of each polygon over a ``box`` x ``box`` pixel window.
+
+    ``polygons`` is (N, V, 2) in pixel space and ``origin`` is the (N, 2) integer top-left
+    pixel of each window. Coverage is evaluated for all polygons at once with an even-odd
+    crossing test on a ``supersample`` x ``supersample`` grid inside every pixel.
+    """
+    n, vertices = polygons.shape[:2]
+    steps = (np.arange(box * supersample) + 0.5) / supersample
+    px = (origin[:, 0, None] + steps)[:, None, :]
+    py = (origin[:, 1, None] + steps)[:, :, None]
+
+    inside = np.zeros((n, len(steps), len(steps)), dtype=np.bool_)
+    for v in range(vertices):
+        a = polygons[:, v]
+        b = polygons[:, (v + 1) % vertices]
+        ax, ay = a[:, 0, None, None], a[:, 1, None, None]
+        bx, by = b[:, 0, None, None], b[:, 1, None, None]
+        dy = by - ay
+        crosses = (ay > py) != (by > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = ax + (py - ay) * (bx - ax) / dy
+        inside ^= crosses & (px < x)
+
+    return inside.reshape(n, box, supersample, box, supersample).mean(axis=(2, 4), dtype=np.float32)
+
+
+def occluded(lo, hi, core_lo, core_hi, opaque, width, height):
+    """Which of N petals, drawn in order, end up completely under later opaque petals.
+
+    ``lo``/``hi`` bound the pixels each petal touches and ``core_lo``/``core_hi`` a box
+    each one fills completely. Cells of a coarse grid remember the latest opaque petal
+    covering them whole; a petal is hidden when every cell it touches has a later one.
+    """
+    n = len(lo)
+    rank = np.arange(n)
+    # Cells sized so most petals span few enough of them to be tested
+    cell = max(OCCLUSION_CELL, int(np.ceil(np.percentile(hi - lo, 95) / (OCCLUSION_SPAN - 1))))
+    grid = np.array([-(-width // cell), -(-height // cell)])
+    latest = np.full((grid[1], grid[0]), -1, dtype=np.int64)
+
+    core0 = np.maximum(np.ceil(core_lo / cell).astype(np.int64), 0)
+    core1 = np.minimum(np.floor(core_hi / cell).astype(np.int64), grid)
+    covering = opaque & (core1 > core0).all(axis=1)
+    if not covering.any():
+        return np.zeros(n, dtype=np.bool_)
+    box0 = np.maximum(lo, 0) // cell
+    box1 = (np.minimum(hi, (width, height)) - 1) // cell + 1
+    tested = (box1 - box0 <= OCCLUSION_SPAN).all(axis=1)
+    lowest = np.full(n, n, dtype=np.int64)
+
+    span = min(OCCLUSION_SPAN, int((core1 - core0)[covering].max()))
+    for offset in np.ndindex(span, span):
+        cells = core0 + offset
+        inside = np.flatnonzero(covering & (cells < core1).all(axis=1))
+        np.maximum.at(latest, (cells[inside, 1], cells[inside, 0]), rank[inside])
+    span = int((box1 - box0)[tested].max(initial=0))
+    for offset in np.ndindex(span, span):
+        cells = box0 + offset
+        inside = np.flatnonzero(tested & (cells < box1).all(axis=1))
+        lowest[inside] = np.minimum(lowest[inside], latest[cells[inside, 1], cells[inside, 0]])
+    return tested & (lowest > rank)
+
+
+class Canvas:
+    """Premultiplied RGBA float canvas with source-over compositing."""
+
+    def __init__(self, width, height, x=0.0, y=0.0, scale=1.0):
+        self.width = width
+        self.height = height
+        # World coordinates of the top-left pixel, and pixels per world unit
+        self.x = x
+        self.y = y
+        self.scale = scale
+        self.pixels = np.zeros((height, width, 4), dtype=np.float32)
+
+    def to_pixels(self, points):
+        return (points - (self.x, self.y)) * self.scale
+
+    def draw_particles(self, position, velocity, size, life, color, supersample=SUPERSAMPLE):
+        """Fill petals in order, like calling ``Particle.draw`` for each particle."""
+        alpha = alpha_for(np.asarray(life, dtype=np.float64))
+        size = np.asarray(size, dtype=np.float64)
+        control_points = petal_control_points(position, velocity, size)
+        outlines = self.to_pixels(petal_outlines(control_points))
+
+        lo = np.floor(outlines.min(axis=1)).astype(np.int64)
+        hi = np.ceil(outlines.max(axis=1)).astype(np.int64)
+        visible = ((alpha > 0) & (size * self.scale > 0.05)
+                   & (hi[:, 0] > 0) & (hi[:, 1] > 0)
+                   & (lo[:, 0] < self.width) & (lo[:, 1] < self.height))
+        order = np.flatnonzero(visible)
+        if len(order) == 0:
+            return
+
+        # Skip petals that later opaque ones paint over completely
+        center = self.to_pixels((control_points[order, 0] + control_points[order, 3]) / 2)
+        core = (PETAL_CORE * self.scale * size[order])[:, None]
+        order = order[~occluded(lo[order], hi[order], center - core, center + core,
+                                alpha[order] >= 1, self.width, self.height)]
+
+        boxes = (hi - lo).max(axis=1)
+        source = np.ones((len(alpha), 4), dtype=np.float32)
+        source[:, :3] = np.asarray(color, dtype=np.float32).reshape(-1, 3) / 255
+
+        start = 0
+        while start < len(order):
+            # Grow the batch while its padded sample count stays under budget
+            box = 1
+            end = start
+            while end < len(order):
+                candidate = max(box, int(boxes[order[end]]))
+                if (end - start + 1) * (candidate * supersample) ** 2 > BATCH_SAMPLES and end > start:
+                    break
+                box = candidate
+                end += 1
+            batch = order[start:end]
+            cover = coverage(outlines[batch], lo[batch], box, supersample)
+            for i, index in enumerate(batch):
+                self._composite(cover[i] * alpha[index], lo[index], source[index])
+            start = end
+
+    def _composite(self, cover, origin, source):
+        x0, y0 = origin
+        box = cover.shape[0]
+        cx0, cy0 = max(0, -x0), max(0, -y0)
+        cx1, cy1 = min(box, self.width - x0), min(box, self.height - y0)
+        if cx1 <= cx0 or cy1 <= cy0:
+            return
+        cover = cover[cy0:cy1, cx0:cx1, None]
+        region = self.pixels[y0 + cy0:y0 + cy1, x0 + cx0:x0 + cx1]
+        region *= 1 - cover
+        region += cover * source
+
+    def to_image(self, background=BACKGROUND):
+        """uint8 RGBA, or RGB composited onto ``background`` when one is given."""
+        if background is None:
+            alpha = self.pixels[..., 3:]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rgb = np.where(alpha > 0, self.pixels[..., :3] / alpha, 0)
+            image = np.concatenate([rgb, alpha], axis=2)
+        else:
+            back = np.asarray(background, dtype=np.float32) / 255
+            image = self.pixels[..., :3] + back * (1 - self.pixels[..., 3:])
+        return np.round(np.clip(image, 0, 1) * 255).astype(np.uint8)
+
+
+def draw_garden(canvas, garden, bloomed=False):
+    """Draw every flower of a ``Garden`` onto ``canvas`` in planting order.
+
+    With ``bloomed`` each petal is drawn at its full ``base_size`` and full opacity, the
+    pose used for thumbnails of gardens that were never stepped.
+    """
+    n = garden.particle_count
+    size = garden.base_size[:n] if bloomed else garden.size[:n]
+    life = np.ones(n) if bloomed else garden.life[:n]
+    canvas.draw_particles(garden.position[:n], garden.velocity[:n], size, life, garden.color[:n])
+    return canvas
+
+
+def render_png(garden, width, height, x=0.0, y=0.0, scale=1.0, bloomed=False, background=BACKGROUND):
+    canvas = draw_garden(Canvas(width, height, x, y, scale), garden, bloomed)
+    return encode_png(canvas.to_image(background))
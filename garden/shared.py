@@ -0,0 +1,238 @@
+import hashlib
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from garden.archive import (ARCHIVE_HEADER, ARCHIVE_MAGIC, FORMAT_VERSION, flower_records, layout,
+                            petal_counts, read_archive)
+from garden.spatial import flower_sizes
+from garden.storage import CLEAR, FLOWER
+
+# Shared state of one garden: a small control block plus a data block laid out like a
+# garden archive (garden/archive.py) with room for ``capacity`` flowers. The control
+# block is guarded by a seqlock: a writer makes ``sequence`` odd, updates the fields and
+# makes it even again, and readers retry until they see the same even value on both
+# sides of their read.
+CONTROL = np.dtype([
+    ('sequence', '<u8'),
+    ('version', '<u8'),
+    ('count', '<u8'),
+    ('capacity', '<u8'),
+    ('generation', '<u8'),
+    # Bumped by clears: rows below ``count`` only change when it does
+    ('epoch', '<u8'),
+])
+INITIAL_CAPACITY = 1024
+# Seconds a reader waits on an odd sequence before suspecting its writer died half way
+STALL_TIMEOUT = 0.1
+
+
+def _open(name, size=0):
+    """Attach to (or with ``size``, create) a segment that outlives the process that made it."""
+    segment = shared_memory.SharedMemory(name=name, create=size > 0, size=size)
+    # Every worker may exit at any time, so no process's resource tracker may unlink it
+    resource_tracker.unregister(segment._name, 'shared_memory')
+    return segment
+
+
+def _unlink(segment):
+    # unlink() unregisters the segment again, so hand it back to the tracker first
+    resource_tracker.register(segment._name, 'shared_memory')
+    segment.unlink()
+
+
+class SharedGarden:
+    """Live flowers and version of one garden in shared memory, readable by every process.
+
+    Writers must hold the garden's cross-process lock (``GardenLog.exclusive``); readers
+    take no lock and get NumPy views straight into the shared block. A reader that finds
+    the sequence stuck odd calls ``repair(garden)``, which should take that lock and
+    ``recover()`` if the sequence is still odd once it has it.
+    """
+
+    def __init__(self, name, repair=None):
+        self.name = name
+        self.repair = repair
+        try:
+            self.control_segment = _open(name, CONTROL.itemsize)
+            created = True
+        except FileExistsError:
+            self.control_segment = _open(name)
+            created = False
+        self.control = np.ndarray((), dtype=CONTROL, buffer=self.control_segment.buf)
+        self.generation = None
+        self.data_segment = None
+        # Outgrown data segments, closed once no view into them is left
+        self.retired = []
+        if created:
+            self._resize(INITIAL_CAPACITY, generation=1)
+            self._publish(version=0, count=0, epoch=0)
+
+    def _data_name(self, generation):
+        return f'{self.name}-{generation}'
+
+    def _retire(self, segment):
+        self.retired.append(segment)
+        for segment in list(self.retired):
+            try:
+                segment.close()
+            except BufferError:
+                continue
+            self.retired.remove(segment)
+
+    def _attach(self, generation):
+        segment = _open(self._data_name(generation))
+        if self.data_segment is not None:
+            self.columns = None
+            self._retire(self.data_segment)
+        self.data_segment = segment
+        self.columns = read_archive(segment.buf)[1]
+        self.generation = generation
+
+    def _resize(self, capacity, generation):
+        segment = _open(self._data_name(generation), layout(capacity)[1])
+        segment.buf[:ARCHIVE_HEADER.size] = ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, FORMAT_VERSION, 0, 0, capacity)
+        columns = read_archive(segment.buf)[1]
+        if self.generation is not None:
+            count = int(self.control['count'])
+            for name, column in self.columns.items():
+                columns[name][:count] = column[:count]
+            # Readers still holding the old block keep their mapping; new ones can't find it
+            _unlink(self.data_segment)
+            self.columns = None
+            self._retire(self.data_segment)
+        self.data_segment = segment
+        self.columns = columns
+        self.generation = generation
+        self._publish(capacity=capacity, generation=generation)
+
+    def _publish(self, **fields):
+        self.control['sequence'] += 1
+        for name, value in fields.items():
+            self.control[name] = value
+        self.control['sequence'] += 1
+
+    def state(self):
+        """Consistent ``(version, count, epoch, generation)``."""
+        stalled = None  # (odd sequence, when it was first seen)
+        while True:
+            sequence = int(self.control['sequence'])
+            if sequence % 2 == 0:
+                state = (int(self.control['version']), int(self.control['count']),
+                         int(self.control['epoch']), int(self.control['generation']))
+                if int(self.control['sequence']) == sequence:
+                    return state
+            elif stalled is None or stalled[0] != sequence:
+                stalled = (sequence, time.monotonic())
+            elif self.repair is not None and time.monotonic() - stalled[1] > STALL_TIMEOUT:
+                self.repair(self)
+                stalled = None
+            time.sleep(0)
+
+    @property
+    def version(self):
+        return self.state()[0]
+
+    def read(self):
+        """Return ``(version, epoch, columns)``, columns being views of the live rows.
+
+        The views stay valid until a clear: check ``changed(epoch)`` after using them.
+        """
+        while True:
+            version, count, epoch, generation = self.state()
+            if generation == self.generation:
+                break
+            try:
+                self._attach(generation)
+            except FileNotFoundError:
+                continue  # Outgrown again before we got to it
+        return version, epoch, {name: column[:count] for name, column in self.columns.items()}
+
+    def changed(self, epoch):
+        return self.state()[2] != epoch
+
+    def flowers(self):
+        """``(version, records)``: the live flowers copied out as FLOWER records."""
+        while True:
+            version, epoch, columns = self.read()
+            records = flower_records(columns)
+            if not self.changed(epoch):
+                return version, records
+
+    def _sync(self):
+        generation = int(self.control['generation'])
+        if generation != self.generation:
+            self._attach(generation)
+
+    def apply(self, records, version):
+        """Writer side: apply a batch of EVENT records that brought the garden to ``version``."""
+        self._sync()
+        count = int(self.control['count'])
+        epoch = int(self.control['epoch'])
+        clears = np.flatnonzero(records['kind'] == CLEAR)
+        if len(clears):
+            # Rows below count are about to be overwritten, so readers must see the new epoch first
+            count = 0
+            epoch += 1
+            self._publish(count=count, epoch=epoch)
+            records = records[clears[-1] + 1:]
+        self._write(records[records['kind'] == FLOWER], count, version, epoch)
+
+    def recover(self, version, flowers):
+        """Writer side: rebuild from the FLOWER records live at ``version`` after a writer died mid-update."""
+        if int(self.control['sequence']) % 2:
+            self.control['sequence'] += 1
+        self.reset(version, flowers)
+
+    def reset(self, version, flowers):
+        """Writer side: replace everything with the FLOWER records live at ``version``."""
+        self._sync()
+        epoch = int(self.control['epoch']) + 1
+        self._publish(count=0, epoch=epoch)
+        self._write(flowers, 0, version, epoch)
+
+    def _write(self, flowers, count, version, epoch):
+        needed = count + len(flowers)
+        capacity = int(self.control['capacity'])
+        if needed > capacity:
+            while capacity < needed:
+                capacity *= 2
+            self._resize(capacity, self.generation + 1)
+        # Rows past count are invisible to readers until the count below is published
+        rows = slice(count, needed)
+        seeds = flowers['seed']
+        self.columns['x'][rows] = flowers['x']
+        self.columns['y'][rows] = flowers['y']
+        self.columns['color'][rows] = flowers['color']
+        self.columns['seed'][rows] = seeds
+        self.columns['size'][rows] = flower_sizes(seeds)
+        self.columns['petals'][rows] = petal_counts(seeds)
+        self._publish(version=version, count=needed, epoch=epoch)
+
+
+class SharedGardens:
+    """SharedGardens by garden id, kept consistent with each garden's GardenLog."""
+
+    def __init__(self, namespace):
+        # Segment names are global to the machine, so they are derived from the data directory
+        self.prefix = 'pfg' + hashlib.sha1(namespace.encode()).hexdigest()[:12]
+        self.gardens = {}
+
+    def get(self, garden_id, log):
+        garden = self.gardens.get(garden_id)
+        if garden is None:
+            name = f'{self.prefix}{hashlib.sha1(garden_id.encode()).hexdigest()[:16]}'
+            with log.exclusive():
+                garden = SharedGarden(name, repair=lambda garden: self._repair(garden, log))
+                # A block left over from an earlier run may not match the log any more
+                if garden.version != log.version:
+                    garden.reset(*log.load())
+            garden = self.gardens.setdefault(garden_id, garden)
+        return garden
+
+    def _repair(self, garden, log):
+        with log.exclusive():
+            # Live writers hold this lock, so a sequence still odd now belongs to a dead one
+            if int(garden.control['sequence']) % 2:
+                garden.recover(*log.load())
@@ -0,0 +1,218 @@
+import numpy as np
+
+from garden.prng import mulberry32
+
+# Constants shared with the ParticlePool and Flower classes in static/js/engine.js
+PETALS_MIN = 8
+PETALS_MAX = 12
+SIZE_MIN = 20.0
+SIZE_RANGE = 15.0
+CENTER_PARTICLES = 6
+CENTER_LIGHTEN = 50
+VARIANCE_RANGE = 30
+VARIANCE_OFFSET = 15
+PETAL_SPEED = 0.2
+GROW_SPEED = 0.1
+DECAY = 0.01
+BLOOM_SPEED = 0.02
+
+
+def parse_color(color):
+    # '#ff7eb9' -> (255, 126, 185)
+    return int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16)
+
+
+def format_color(rgb):
+    return '#' + ''.join(f'{int(c):02x}' for c in rgb)
+
+
+def lighten(rgb, amount):
+    # Vectorized lightenColor: rgb is (..., 3), amount broadcasts against rgb[..., 0]
+    rgb = np.asarray(rgb, dtype=np.int16)
+    amount = np.asarray(amount, dtype=np.int16)[..., None]
+    return np.clip(rgb + amount, 0, 255).astype(np.uint8)
+
+
+def _grown(array, capacity):
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class Garden:
+    """Every particle of every flower held in flat, contiguous NumPy arrays.
+
+    Flower ``f`` owns the particle slice ``start[f]:start[f] + petal_count[f] + CENTER_PARTICLES``,
+    petals first and center particles after, in the same order the JS ``Flower`` creates them.
+    """
+
+    PARTICLE_FIELDS = {
+        'position': ((2,), np.float64),
+        'velocity': ((2,), np.float64),
+        'size': ((), np.float64),
+        'base_size': ((), np.float64),
+        'life': ((), np.float64),
+        'decay': ((), np.float64),
+        'growing': ((), np.bool_),
+        'color': ((3,), np.uint8),
+        'flower': ((), np.int32),
+    }
+
+    FLOWER_FIELDS = {
+        'flower_position': ((2,), np.float64),
+        'flower_color': ((3,), np.uint8),
+        'flower_size': ((), np.float64),
+        'petal_count': ((), np.uint8),
+        'seed': ((), np.uint32),
+        'bloom': ((), np.float64),
+        'start': ((), np.int64),
+    }
+
+    def __init__(self, particle_capacity=1024, flower_capacity=64):
+        self.particle_count = 0
+        self.flower_count = 0
+        for name, (shape, dtype) in self.PARTICLE_FIELDS.items():
+            setattr(self, name, np.zeros((particle_capacity,) + shape, dtype=dtype))
+        for name, (shape, dtype) in self.FLOWER_FIELDS.items():
+            setattr(self, name, np.zeros((flower_capacity,) + shape, dtype=dtype))
+
+    def __len__(self):
+        return self.flower_count
+
+    def _reserve(self, fields, count, needed):
+        capacity = len(getattr(self, next(iter(fields))))
+        if count + needed <= capacity:
+            return
+        capacity = max(count + needed, capacity * 2)
+        for name in fields:
+            setattr(self, name, _grown(getattr(self, name)[:count], capacity))
+
+    def clear(self):
+        self.particle_count = 0
+        self.flower_count = 0
+
+    def add_flowers(self, positions, colors, petal_counts, sizes, variances, jitters):
+        """Append flowers built from explicit parameters.
+
+        ``positions`` is (F, 2), ``colors`` is (F, 3) RGB, ``petal_counts`` and ``sizes`` are (F,).
+        ``variances`` and ``jitters`` hold one value per petal for all flowers, concatenated in
+        flower order: the colour shift passed to lightenColor and the ``Math.random()`` used
+        for the petal size.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        colors = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+        petal_counts = np.asarray(petal_counts, dtype=np.int64)
+        sizes = np.asarray(sizes, dtype=np.float64)
+        variances = np.asarray(variances, dtype=np.int16)
+        jitters = np.asarray(jitters, dtype=np.float64)
+
+        added = len(positions)
+        if added == 0:
+            return np.arange(0)
+        per_flower = petal_counts + CENTER_PARTICLES
+        total = int(per_flower.sum())
+
+        self._reserve(self.FLOWER_FIELDS, self.flower_count, added)
+        self._reserve(self.PARTICLE_FIELDS, self.particle_count, total)
+
+        f0, f1 = self.flower_count, self.flower_count + added
+        p0, p1 = self.particle_count, self.particle_count + total
+        offsets = np.zeros(added, dtype=np.int64)
+        np.cumsum(per_flower[:-1], out=offsets[1:])
+
+        self.flower_position[f0:f1] = positions
+        self.flower_color[f0:f1] = colors
+        self.flower_size[f0:f1] = sizes
+        self.petal_count[f0:f1] = petal_counts
+        self.bloom[f0:f1] = 0.0
+        self.start[f0:f1] = p0 + offsets
+
+        # Index of every new particle within its flower, and whether it is a petal
+        owner = np.repeat(np.arange(added), per_flower)
+        local = np.arange(total) - offsets[owner]
+        count = petal_counts[owner]
+        petal = local < count
+
+        # Petals are spread evenly around the flower, center particles over six slots
+        slots = np.where(petal, count, CENTER_PARTICLES)
+        index = np.where(petal, local, local - count)
+        angle = index / slots * np.pi * 2
+        direction = np.stack([np.cos(angle), np.sin(angle)], axis=1)
+
+        size = sizes[owner]
+        radius = np.where(petal, size * 0.2, size * 0.1)
+        center_color = lighten(colors, CENTER_LIGHTEN)
+
+        petal_jitter = np.zeros(total)
+        petal_jitter[petal] = jitters
+        petal_variance = np.zeros(total, dtype=np.int16)
+        petal_variance[petal] = variances
+
+        sl = slice(p0, p1)
+        self.position[sl] = positions[owner] + direction * radius[:, None]
+        self.velocity[sl] = np.where(petal[:, None], direction * PETAL_SPEED, 0.0)
+        self.base_size[sl] = np.where(petal, size * (0.8 + petal_jitter * 0.4), size * 0.5)
+        self.size[sl] = 0.0
+        self.life[sl] = 1.0
+        self.decay[sl] = DECAY
+        self.growing[sl] = True
+        self.color[sl] = np.where(petal[:, None], lighten(colors[owner], petal_variance), center_color[owner])
+        self.flower[sl] = f0 + owner
+
+        self.flower_count = f1
+        self.particle_count = p1
+        return np.arange(f0, f1)
+
+    def plant_seeded(self, positions, colors, seeds):
+        """Add flowers fully described by ``(x, y, color, seed)``.
+
+        Parameters are drawn from mulberry32 in the order the JS ``Flower`` consumes
+        them: petal count, size, then a colour variance and a size jitter per petal.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        colors = np.broadcast_to(np.asarray(colors, dtype=np.uint8), (len(positions), 3))
+        seeds = np.broadcast_to(np.asarray(seeds, dtype=np.uint32), (len(positions),))
+
+        petal_counts = np.floor(mulberry32(seeds, 0) * (PETALS_MAX - PETALS_MIN + 1)).astype(np.int64) + PETALS_MIN
+        sizes = mulberry32(seeds, 1) * SIZE_RANGE + SIZE_MIN
+
+        owner = np.repeat(np.arange(len(positions)), petal_counts)
+        offsets = np.cumsum(petal_counts) - petal_counts
+        petal = np.arange(len(owner)) - offsets[owner]
+        variances = np.floor(mulberry32(seeds[owner], 2 + 2 * petal) * VARIANCE_RANGE) - VARIANCE_OFFSET
+        jitters = mulberry32(seeds[owner], 3 + 2 * petal)
+
+        added = self.add_flowers(positions, colors, petal_counts, sizes, variances, jitters)
+        self.seed[added] = seeds
+        return added
+
+    def plant(self, positions, colors, rng=None):
+        """Add flowers at ``positions`` with random seeds drawn from a NumPy ``rng``."""
+        rng = np.random.default_rng() if rng is None else rng
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        seeds = rng.integers(0, 2 ** 32, size=len(positions), dtype=np.uint32)
+        return self.plant_seeded(positions, colors, seeds)
+
+    def step(self, steps=1):
+        """Advance every particle and flower, matching ``Particle.update`` and ``Flower.update``."""
+        n = self.particle_count
+        position = self.position[:n]
+        velocity = self.velocity[:n]
+        size = self.size[:n]
+        base_size = self.base_size[:n]
+        life = self.life[:n]
+        decay = self.decay[:n]
+        growing = self.growing[:n]
+        bloom = self.bloom[:self.flower_count]
+        done = np.empty(n, dtype=np.bool_)
+
+        for _ in range(steps):
+            position += velocity
+            np.add(size, GROW_SPEED, out=size, where=growing)
+            np.greater_equal(size, base_size, out=done)
+            done &= growing
+            np.copyto(size, base_size, where=done)
+            growing &= ~done
+            life -= decay
+            np.add(bloom, BLOOM_SPEED, out=bloom)
+            np.minimum(bloom, 1.0, out=bloom)
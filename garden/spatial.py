@@ -0,0 +1,150 @@
+import math
+
+import numpy as np
+
+from garden.simulation import PETAL_SPEED, SIZE_MIN, SIZE_RANGE
+from garden.prng import mulberry32
+from garden.storage import CLEAR, EVENT, FLOWER
+
+CELL_SIZE = 256.0
+# Frames until a petal's alpha reaches zero (life + 0.2 <= 0), bounding how far it drifts
+VISIBLE_FRAMES = 120
+
+
+def flower_sizes(seeds):
+    # Flower.size is the second draw of the flower's seed
+    return mulberry32(seeds, 1) * SIZE_RANGE + SIZE_MIN
+
+
+def flower_radius(sizes):
+    """Distance from a flower's center that bounds everything its particles ever draw.
+
+    A petal starts 0.2 * size out, is at most 1.2 * size long and bulges 0.375 of its
+    length sideways (the bezier control points sit 0.5 out), then drifts while visible.
+    """
+    return sizes * (0.2 + 1.2 * np.hypot(1.0, 0.375)) + PETAL_SPEED * VISIBLE_FRAMES
+
+
+class SpatialIndex:
+    """Uniform grid over the live flowers of one garden, kept current as events arrive.
+
+    ``flowers`` holds the live FLOWER records in planting order; queries return row
+    numbers into it, sorted, so results keep the drawing order. The grid is one entry
+    per (cell, flower) pair, kept sorted by cell code, so the flowers of a run of cells
+    in one column are one slice.
+    """
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.clear()
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+        self._flowers = np.zeros(64, dtype=EVENT)
+        self._radius = np.zeros(64)
+        self.codes = np.zeros(0, dtype=np.int64)
+        self.rows = np.zeros(0, dtype=np.int64)
+
+    @property
+    def flowers(self):
+        return self._flowers[:self.count]
+
+    @property
+    def radius(self):
+        return self._radius[:self.count]
+
+    def apply(self, records):
+        """Apply a batch of EVENT records (flowers and clears) in order."""
+        clears = np.flatnonzero(records['kind'] == CLEAR)
+        if len(clears):
+            self.clear()
+            records = records[clears[-1] + 1:]
+        self.add(records[records['kind'] == FLOWER])
+
+    def add(self, flowers):
+        added = len(flowers)
+        if added == 0:
+            return
+        if self.count + added > len(self._flowers):
+            capacity = max(self.count + added, len(self._flowers) * 2)
+            self._flowers = _grown(self._flowers, self.count, capacity)
+            self._radius = _grown(self._radius, self.count, capacity)
+
+        rows = np.arange(self.count, self.count + added)
+        radius = flower_radius(flower_sizes(flowers['seed']))
+        self._flowers[rows] = flowers
+        self._radius[rows] = radius
+        self.count += added
+
+        # Every cell each flower's circle overlaps, in row order
+        x = flowers['x'].astype(np.float64)
+        y = flowers['y'].astype(np.float64)
+        lo_x, lo_y = self._cells(x - radius), self._cells(y - radius)
+        width = self._cells(x + radius) - lo_x + 1
+        height = self._cells(y + radius) - lo_y + 1
+        spans = width * height
+        first = np.repeat(np.cumsum(spans) - spans, spans)
+        k = np.arange(len(first)) - first
+        height = np.repeat(height, spans)
+        codes = _cell_codes(np.repeat(lo_x, spans) + k // height, np.repeat(lo_y, spans) + k % height)
+        rows = np.repeat(rows, spans)
+
+        order = np.argsort(codes)
+        codes, rows = codes[order], rows[order]
+        at = np.searchsorted(self.codes, codes)
+        self.codes = np.insert(self.codes, at, codes)
+        self.rows = np.insert(self.rows, at, rows)
+
+    def _cells(self, values):
+        return np.floor(np.asarray(values) / self.cell_size).astype(np.int64)
+
+    def query(self, x0, y0, x1, y1):
+        """Rows of the flowers whose bounding circle intersects the rectangle, in planting order."""
+        if len(self.codes) == 0:
+            return np.zeros(0, dtype=np.int64)
+        # Clamped to the occupied columns and the code's row range first, in Python ints,
+        # so a huge rectangle can't overflow or walk empty columns
+        cx0 = max(math.floor(x0 / self.cell_size), int(self.codes[0] >> 32))
+        cx1 = min(math.floor(x1 / self.cell_size), int(self.codes[-1] >> 32))
+        cy0 = max(math.floor(y0 / self.cell_size), -2 ** 31)
+        cy1 = min(math.floor(y1 / self.cell_size), 2 ** 31 - 1)
+        if cx0 > cx1 or cy0 > cy1:
+            return np.zeros(0, dtype=np.int64)
+
+        columns = np.arange(cx0, cx1 + 1, dtype=np.int64)
+        starts = np.searchsorted(self.codes, _cell_codes(columns, cy0))
+        ends = np.searchsorted(self.codes, _cell_codes(columns, cy1), side='right')
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.zeros(0, dtype=np.int64)
+        entries = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(total)
+        candidates = self.rows[entries]
+        # A flower is in every cell it overlaps; past a few per flower a mask beats sorting
+        if total * 8 > self.count:
+            mask = np.zeros(self.count, dtype=np.bool_)
+            mask[candidates] = True
+            rows = np.flatnonzero(mask)
+        else:
+            rows = np.unique(candidates)
+
+        x = self._flowers['x'][rows].astype(np.float64)
+        y = self._flowers['y'][rows].astype(np.float64)
+        # Exact circle / rectangle test on the candidates
+        dx = x - np.clip(x, x0, x1)
+        dy = y - np.clip(y, y0, y1)
+        return rows[dx * dx + dy * dy <= self._radius[rows] ** 2]
+
+
+def _grown(array, count, capacity):
+    grown = np.zeros(capacity, dtype=array.dtype)
+    grown[:count] = array[:count]
+    return grown
+
+
+def _cell_codes(cx, cy):
+    # One sortable int64 per cell: column in the high half, row offset into the low half
+    return (np.asarray(cx, dtype=np.int64) << 32) + (np.asarray(cy, dtype=np.int64) + 2 ** 31)
@@ -0,0 +1,271 @@
+import contextlib
+import fcntl
+import os
+import re
+import struct
+import threading
+
+import numpy as np
+
+from garden.simulation import Garden
+
+FLOWER = 1
+CLEAR = 2
+# One point of a drawn stroke's simplified line, with its flower's colour and seed; a
+# stroke's points come right before the FLOWER planted at its last one (garden/strokes.py)
+STROKE = 3
+
+# One fixed-width 16 byte record per event
+EVENT = np.dtype([
+    ('kind', 'u1'),
+    ('color', 'u1', (3,)),
+    ('seed', '<u4'),
+    ('x', '<f4'),
+    ('y', '<f4'),
+])
+
+LOG_MAGIC = b'PFGLOG01'
+SNAPSHOT_MAGIC = b'PFGSNP01'
+# magic, version of the event just before the first record
+LOG_HEADER = struct.Struct('<8sQ')
+# magic, version covered, flower count, reserved (keeps records 16 byte aligned)
+SNAPSHOT_HEADER = struct.Struct('<8sQQQ')
+
+# Flower positions are stored in 1/16 px steps, exact in float32 and in fixed point as
+# long as they are at most POSITION_LIMIT px from the origin (2 ** 24 steps)
+POSITION_SCALE = 16
+POSITION_LIMIT = 2 ** 20
+
+GARDEN_ID = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+
+class StorageError(Exception):
+    pass
+
+
+def quantize(value):
+    return round(value * POSITION_SCALE) / POSITION_SCALE
+
+
+def flower_event(x, y, color, seed):
+    record = np.zeros(1, dtype=EVENT)
+    record['kind'] = FLOWER
+    record['color'] = color
+    record['seed'] = seed
+    record['x'] = x
+    record['y'] = y
+    return record
+
+
+def clear_event():
+    record = np.zeros(1, dtype=EVENT)
+    record['kind'] = CLEAR
+    return record
+
+
+def _map(path, offset, count):
+    if count == 0:
+        return np.zeros(0, dtype=EVENT)
+    return np.memmap(path, dtype=EVENT, mode='r', offset=offset, shape=(count,))
+
+
+def _replace(path, header, records):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(header)
+        f.write(np.ascontiguousarray(records, dtype=EVENT).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def replay(flowers, events):
+    """Apply ``events`` on top of the live ``flowers`` records, vectorized."""
+    clears = np.flatnonzero(events['kind'] == CLEAR)
+    if len(clears):
+        flowers = flowers[:0]
+        events = events[clears[-1] + 1:]
+    added = events[events['kind'] == FLOWER]
+    if len(added) == 0:
+        return flowers
+    if len(flowers) == 0:
+        return added
+    return np.concatenate([flowers, added])
+
+
+class GardenLog:
+    """Append-only event log of one garden, compacted into a snapshot plus a short tail.
+
+    Every event gets the next version number. ``snapshot.bin`` holds the live flowers
+    as of some version and ``events.log`` holds the events after it, so loading costs
+    one snapshot read plus at most ``compact_every`` records.
+
+    With ``shared`` several processes may open the same garden: every write and every
+    read of the version happens under an exclusive ``flock`` on the garden directory,
+    after picking up whatever the other processes appended or compacted.
+    """
+
+    def __init__(self, directory, compact_every=65536, durable=False, shared=False):
+        self.directory = directory
+        self.compact_every = compact_every
+        self.durable = durable
+        self.shared = shared
+        self.log_path = os.path.join(directory, 'events.log')
+        self.snapshot_path = os.path.join(directory, 'snapshot.bin')
+        self.lock = threading.RLock()
+        self.depth = 0
+        os.makedirs(directory, exist_ok=True)
+        self.lock_file = open(os.path.join(directory, 'lock'), 'ab') if shared else None
+        self.log = None
+        with self.exclusive():
+            self.refresh()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        """Hold the garden against other threads and, if shared, other processes.
+
+        Reentrant. On the outermost entry a shared log first catches up with the files.
+        """
+        with self.lock:
+            if self.lock_file is None or self.depth:
+                self.depth += 1
+                try:
+                    yield
+                finally:
+                    self.depth -= 1
+                return
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+            self.depth += 1
+            try:
+                self.refresh()
+                yield
+            finally:
+                self.depth -= 1
+                fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def refresh(self):
+        # Re-read the files: another process may have appended, or compacted and replaced the log
+        self.snapshot_version = self._read_snapshot_header()[0]
+        self.base_version, tail = self._open_log()
+        self.version = self.base_version + tail
+        if self.log is None or os.fstat(self.log.fileno()).st_ino != os.stat(self.log_path).st_ino:
+            if self.log is not None:
+                self.log.close()
+            self.log = open(self.log_path, 'ab')
+
+    def _read_snapshot_header(self):
+        if not os.path.exists(self.snapshot_path):
+            return 0, 0
+        with open(self.snapshot_path, 'rb') as f:
+            magic, version, count, _ = SNAPSHOT_HEADER.unpack(f.read(SNAPSHOT_HEADER.size))
+        if magic != SNAPSHOT_MAGIC:
+            raise StorageError(f'{self.snapshot_path} is not a garden snapshot')
+        return version, count
+
+    def _open_log(self):
+        if not os.path.exists(self.log_path):
+            _replace(self.log_path, LOG_HEADER.pack(LOG_MAGIC, self.snapshot_version), [])
+        size = os.path.getsize(self.log_path)
+        with open(self.log_path, 'rb') as f:
+            magic, base = LOG_HEADER.unpack(f.read(LOG_HEADER.size))
+        if magic != LOG_MAGIC:
+            raise StorageError(f'{self.log_path} is not a garden event log')
+
+        count, torn = divmod(size - LOG_HEADER.size, EVENT.itemsize)
+        if torn:
+            # Drop a record left half-written by a crash
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(LOG_HEADER.size + count * EVENT.itemsize)
+        return base, count
+
+    def close(self):
+        with self.lock:
+            self.log.close()
+            if self.lock_file is not None:
+                self.lock_file.close()
+
+    def append(self, records):
+        """Append a batch of EVENT records in one write, returning the new version."""
+        records = np.ascontiguousarray(records, dtype=EVENT)
+        with self.exclusive():
+            self.log.write(records.tobytes())
+            self.log.flush()
+            if self.durable:
+                os.fsync(self.log.fileno())
+            self.version += len(records)
+            if self.version - self.snapshot_version >= self.compact_every:
+                self.compact()
+            return self.version
+
+    def events(self):
+        """Memory-mapped records of the log and the version of the event before the first one."""
+        count = self.version - self.base_version
+        return self.base_version, _map(self.log_path, LOG_HEADER.size, count)
+
+    def events_since(self, version):
+        """``(version, records)`` of the events after ``version``, or None once they are compacted away."""
+        with self.exclusive():
+            base, events = self.events()
+            if not base <= version <= self.version:
+                return None
+            return self.version, events[version - base:]
+
+    def snapshot(self):
+        version, count = self._read_snapshot_header()
+        return version, _map(self.snapshot_path, SNAPSHOT_HEADER.size, count)
+
+    def load(self):
+        """Return ``(version, flowers)`` with the live FLOWER records in planting order."""
+        with self.exclusive():
+            version, flowers = self.snapshot()
+            base, events = self.events()
+            return self.version, replay(flowers, events[max(0, version - base):])
+
+    def compact(self):
+        with self.exclusive():
+            version, flowers = self.load()
+            _replace(self.snapshot_path,
+                     SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, version, len(flowers), 0), flowers)
+            self.snapshot_version = version
+
+            # Start a fresh log after the snapshot; a crash before this point only leaves
+            # already-snapshotted records in the old log, which load() skips
+            self.log.close()
+            _replace(self.log_path, LOG_HEADER.pack(LOG_MAGIC, version), [])
+            self.base_version = version
+            self.log = open(self.log_path, 'ab')
+
+
+class GardenStore:
+    """Open GardenLogs by garden id under a root directory."""
+
+    def __init__(self, root, **options):
+        self.root = root
+        self.options = options
+        self.logs = {}
+        self.lock = threading.Lock()
+
+    def get(self, garden_id, create=False):
+        """The GardenLog of ``garden_id``, or None if nothing was written to it and not ``create``.
+
+        Raises KeyError for ids that can't name a garden.
+        """
+        if not GARDEN_ID.fullmatch(garden_id):
+            raise KeyError(garden_id)
+        with self.lock:
+            log = self.logs.get(garden_id)
+            if log is None:
+                directory = os.path.join(self.root, garden_id)
+                # Another process may have created it since
+                if not create and not os.path.isdir(directory):
+                    return None
+                log = self.logs[garden_id] = GardenLog(directory, **self.options)
+            return log
+
+
+def build_garden(flowers, garden=None):
+    """Rebuild a simulation Garden from FLOWER records."""
+    garden = Garden() if garden is None else garden
+    positions = np.stack([flowers['x'], flowers['y']], axis=1)
+    garden.plant_seeded(positions, flowers['color'], flowers['seed'])
+    return garden
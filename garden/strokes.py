@@ -0,0 +1,111 @@
+import numpy as np
+
+from garden.storage import EVENT, FLOWER, POSITION_LIMIT, POSITION_SCALE, STROKE
+
+# A stroke is a header followed by count - 1 int16 (dx, dy) steps from (x, y). All
+# coordinates are in 1/16 px, the stored position resolution, and little endian.
+STROKE_HEADER = np.dtype([
+    ('color', 'u1', (3,)),
+    ('seed', '<u4'),
+    ('count', '<u2'),
+    ('x', '<i4'),
+    ('y', '<i4'),
+])
+STEP = np.dtype('<i2')
+
+# A request holds at most about MAX_BYTES / 4 points, which bounds simplify(): its worst
+# case is quadratic in the points of a stroke
+MAX_BYTES = 1 << 13
+
+# Points closer than this to the simplified line are dropped, in world pixels
+TOLERANCE = 1.0
+
+
+class StrokeError(ValueError):
+    pass
+
+
+def decode_strokes(data):
+    """Split a request body into ``(header, points)`` pairs.
+
+    ``points`` is an ``(n, 2)`` int64 array in 1/16 px built straight from the
+    body's bytes; only the headers are looked at one by one.
+    """
+    view = memoryview(data)
+    strokes = []
+    offset = 0
+    while offset < len(view):
+        if len(view) - offset < STROKE_HEADER.itemsize:
+            raise StrokeError('truncated stroke header')
+        header = np.frombuffer(view, dtype=STROKE_HEADER, count=1, offset=offset)[0]
+        offset += STROKE_HEADER.itemsize
+        count = int(header['count'])
+        if count == 0:
+            raise StrokeError('empty stroke')
+        size = (count - 1) * 2 * STEP.itemsize
+        if len(view) - offset < size:
+            raise StrokeError('truncated stroke')
+        steps = np.frombuffer(view, dtype=STEP, count=(count - 1) * 2, offset=offset).reshape(-1, 2)
+        offset += size
+
+        points = np.empty((count, 2), dtype=np.int64)
+        points[0] = header['x'], header['y']
+        np.cumsum(steps, axis=0, dtype=np.int64, out=points[1:])
+        points[1:] += points[0]
+        if np.abs(points).max() > POSITION_LIMIT * POSITION_SCALE:
+            raise StrokeError('stroke point out of range')
+        strokes.append((header, points))
+    return strokes
+
+
+def simplify(points, tolerance):
+    """Ramer-Douglas-Peucker: indices of the ``points`` that keep the line within ``tolerance``.
+
+    Each split measures a whole span in one vectorized pass. Both end points are always kept.
+    """
+    if len(points) < 3:
+        return np.arange(len(points))
+    points = points.astype(np.float64)
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    spans = [(0, len(points) - 1)]
+    while spans:
+        start, end = spans.pop()
+        if end - start < 2:
+            continue
+        a, b = points[start], points[end]
+        offset = points[start + 1:end] - a
+        direction = b - a
+        length = np.hypot(*direction)
+        if length == 0:
+            distances = np.hypot(*offset.T)
+        else:
+            distances = np.abs(direction[0] * offset[:, 1] - direction[1] * offset[:, 0]) / length
+        split = int(np.argmax(distances))
+        if distances[split] > tolerance:
+            split += start + 1
+            keep[split] = True
+            spans.append((start, split))
+            spans.append((split, end))
+    return np.flatnonzero(keep)
+
+
+def stroke_records(strokes, tolerance=TOLERANCE):
+    """EVENT records of decoded strokes: each one's simplified line, then its flower.
+
+    Every stroke becomes a STROKE record per point kept by ``simplify`` and the FLOWER
+    planted at its last point, all with the stroke's colour and seed.
+    """
+    parts = []
+    for header, points in strokes:
+        kept = points[simplify(points, tolerance * POSITION_SCALE)]
+        records = np.zeros(len(kept) + 1, dtype=EVENT)
+        records['kind'][:-1] = STROKE
+        records['kind'][-1] = FLOWER
+        records['color'] = header['color']
+        records['seed'] = header['seed']
+        records['x'][:-1] = kept[:, 0] / POSITION_SCALE
+        records['y'][:-1] = kept[:, 1] / POSITION_SCALE
+        records['x'][-1], records['y'][-1] = records['x'][-2], records['y'][-2]
+        parts.append(records)
+    return np.concatenate(parts)
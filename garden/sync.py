@@ -0,0 +1,240 @@
+import base64
+import collections
+import logging
+import threading
+import time
+
+import numpy as np
+
+from garden.storage import FLOWER, POSITION_SCALE, STROKE
+
+TICK_RATE = 20  # frames per second
+RETAINED_FRAMES = 256
+# Ticks with more events than this send a reload instead of a frame
+MAX_FRAME_EVENTS = 16384
+KEEPALIVE = 15.0  # seconds between SSE comments on an idle channel
+
+logger = logging.getLogger(__name__)
+
+
+def _varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _varint_lengths(values):
+    # Bytes of each uint64 varint: one per started 7 bits
+    lengths = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        lengths += values >= np.uint64(1 << shift)
+    return lengths
+
+
+def _put_varints(out, positions, values, lengths):
+    # Byte j of every varint at once, for each j up to the longest
+    for j in range(int(lengths.max(initial=0))):
+        rows = lengths > j
+        byte = (values[rows] >> np.uint64(7 * j)) & np.uint64(0x7f)
+        byte |= np.where(lengths[rows] > j + 1, np.uint64(0x80), np.uint64(0))
+        out[positions[rows] + j] = byte
+
+
+def _zigzag(values):
+    return ((values << 1) ^ (values >> 63)).astype(np.uint64)
+
+
+def encode_frame(first_version, records):
+    """Pack one tick of EVENT records into a compact binary delta frame.
+
+    Layout: varint version before the first event, varint event count, then per event
+    one kind byte; flowers and stroke points add zigzag varint x and y deltas from the
+    previous one in the frame (in 1/POSITION_SCALE px), and flowers then three colour
+    bytes and a little-endian u32 seed. Stroke points take those from the flower after them.
+    Decoded by decodeFrame() in static/js/engine.js. Every field is laid out for all
+    records at once, so the cost is a few array passes rather than a loop per record.
+    """
+    head = bytearray()
+    _varint(first_version, head)
+    _varint(len(records), head)
+
+    kinds = records['kind']
+    placed = np.flatnonzero((kinds == FLOWER) | (kinds == STROKE))
+    fixed = np.rint(np.stack([records['x'][placed], records['y'][placed]]) * POSITION_SCALE).astype(np.int64)
+    dx, dy = _zigzag(np.diff(fixed, axis=1, prepend=0))
+    x_lengths, y_lengths = _varint_lengths(dx), _varint_lengths(dy)
+    flowers = kinds == FLOWER
+
+    sizes = np.ones(len(records), dtype=np.int64)
+    sizes[placed] += x_lengths + y_lengths
+    sizes[flowers] += 7
+    starts = np.cumsum(sizes) - sizes + len(head)
+    out = np.empty(len(head) + int(sizes.sum()), dtype=np.uint8)
+    out[:len(head)] = np.frombuffer(head, dtype=np.uint8)
+    out[starts] = kinds
+    at = starts[placed] + 1
+    _put_varints(out, at, dx, x_lengths)
+    at += x_lengths
+    _put_varints(out, at, dy, y_lengths)
+    at += y_lengths
+    at = at[flowers[placed]]
+    tail = np.concatenate([records['color'][flowers],
+                           records['seed'][flowers].astype('<u4').view(np.uint8).reshape(-1, 4)], axis=1)
+    out[at[:, None] + np.arange(7)] = tail
+    return out.tobytes()
+
+
+def sse_message(event, data, event_id=None):
+    lines = [] if event_id is None else [f'id: {event_id}']
+    lines += [f'event: {event}', f'data: {data}', '', '']
+    return '\n'.join(lines).encode('ascii')
+
+
+class Channel:
+    """Fan-out of one garden's events, coalesced into one frame per tick.
+
+    Each frame is encoded and wrapped as an SSE message once, then the same bytes are
+    handed to every subscriber, so the cost per tick does not grow with the audience.
+    A tick of more than ``max_frame_events`` (a big import, say) becomes a ``reload``
+    message instead, telling clients to load their view again.
+    Subscribers block on a condition between frames, so streams should be served by
+    green threads (gunicorn -k gevent), not one OS thread or process each.
+    """
+
+    def __init__(self, version, retained=RETAINED_FRAMES, max_frame_events=MAX_FRAME_EVENTS):
+        self.condition = threading.Condition()
+        self.max_frame_events = max_frame_events
+        self.pending = []
+        self.published = version
+        # Garden version covered by the frames sent so far
+        self.flushed = version
+        # (version before, version after, sse bytes) of recent frames
+        self.frames = collections.deque(maxlen=retained)
+        # Bumped by reset(), which sends every subscriber back to a full load
+        self.epoch = 0
+
+    def publish(self, records, version):
+        """Queue EVENT ``records`` ending at ``version``; callers publish in version order."""
+        with self.condition:
+            self.pending.append(records)
+            self.published = version
+
+    def reset(self, version):
+        """Drop everything queued and retained and continue from ``version``."""
+        with self.condition:
+            self.pending = []
+            self.frames.clear()
+            self.published = self.flushed = version
+            self.epoch += 1
+            self.condition.notify_all()
+
+    def flush(self):
+        # Only the ticker flushes, so the frame can be encoded without holding up publishers
+        with self.condition:
+            if not self.pending:
+                return False
+            pending, self.pending = self.pending, []
+            before, after, epoch = self.flushed, self.published, self.epoch
+        records = np.concatenate(pending)
+        if len(records) > self.max_frame_events:
+            message = sse_message('reload', '', after)
+        else:
+            frame = encode_frame(before, records)
+            message = sse_message('frame', base64.b64encode(frame).decode('ascii'), after)
+        with self.condition:
+            if self.epoch != epoch:
+                return False
+            self.frames.append((before, after, message))
+            self.flushed = after
+            self.condition.notify_all()
+            return True
+
+    def backlog(self, since):
+        """Retained frames after version ``since``, or None if some were already dropped."""
+        if since >= self.flushed:
+            return []
+        newer = [(before, message) for before, after, message in self.frames if after > since]
+        if not newer or newer[0][0] > since:
+            return None
+        return [message for _, message in newer]
+
+    def subscribe(self, since):
+        """Yield SSE messages for every frame after version ``since``.
+
+        Frames may start before ``since``; clients skip events they already have. A
+        subscriber that falls behind the retained frames is sent a resync instead.
+        """
+        with self.condition:
+            backlog = self.backlog(since)
+            last = max(since, self.flushed)
+            epoch = self.epoch
+        if backlog is None:
+            yield sse_message('resync', '')
+            return
+        yield from backlog
+
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.flushed > last or self.epoch != epoch, KEEPALIVE)
+                if self.epoch != epoch:
+                    break
+                messages = self.backlog(last)
+                last = max(last, self.flushed)
+            if messages is None:
+                break
+            if messages:
+                yield from messages
+            else:
+                yield b': keepalive\n\n'
+        yield sse_message('resync', '')
+
+
+class Hub:
+    """Channels by garden id, flushed together by one ticker thread.
+
+    ``poll``, if given, is called with the garden ids before every flush, so events
+    written by other processes can be published.
+    """
+
+    def __init__(self, tick_rate=TICK_RATE, poll=None):
+        self.interval = 1.0 / tick_rate
+        self.poll = poll
+        self.channels = {}
+        self.lock = threading.Lock()
+        self.ticker = None
+
+    def channel(self, garden_id, version):
+        # ``version`` is the garden's current version, used if the channel is new
+        with self.lock:
+            channel = self.channels.get(garden_id)
+            if channel is None:
+                channel = self.channels[garden_id] = Channel(version)
+            if self.ticker is None:
+                self.ticker = threading.Thread(target=self._run, name='garden-sync', daemon=True)
+                self.ticker.start()
+            return channel
+
+    def flush(self):
+        with self.lock:
+            channels = list(self.channels.values())
+        for channel in channels:
+            channel.flush()
+
+    def _run(self):
+        deadline = time.monotonic()
+        while True:
+            deadline += self.interval
+            time.sleep(max(0.0, deadline - time.monotonic()))
+            # A failing tick (say a storage error while polling) must not end live sync for good
+            if self.poll is not None:
+                with self.lock:
+                    garden_ids = list(self.channels)
+                try:
+                    self.poll(garden_ids)
+                except Exception:
+                    logger.exception('polling gardens failed')
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('flushing channels failed')
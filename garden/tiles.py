@@ -0,0 +1,180 @@
+import collections
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from garden.png import encode_png
+from garden.render import Canvas, draw_garden
+from garden.spatial import flower_radius, flower_sizes
+from garden.storage import CLEAR, FLOWER, build_garden
+
+TILE_SIZE = 256
+# Zoom z shrinks the garden by 2 ** z, so a tile covers TILE_SIZE * 2 ** z world pixels
+MAX_ZOOM = 6
+MEMORY_BYTES = 64 << 20
+
+
+def tile_span(z):
+    return TILE_SIZE * 2 ** z
+
+
+def tile_bounds(z, x, y):
+    span = tile_span(z)
+    return x * span, y * span, (x + 1) * span, (y + 1) * span
+
+
+def tile_codes(x, y):
+    # One int64 per tile, x in the high half and y offset into the low half
+    return (np.asarray(x, dtype=np.int64) << 32) + (np.asarray(y, dtype=np.int64) + (1 << 31))
+
+
+def _member(codes, values):
+    # Which of ``values`` are in the sorted ``codes``
+    values = np.asarray(values, dtype=np.int64)
+    found = np.minimum(np.searchsorted(codes, values), len(codes) - 1)
+    return codes[found] == values
+
+
+def touched_tiles(x, y, radius, z):
+    """Sorted tile_codes of the tiles at zoom ``z`` that circles overlap."""
+    span = tile_span(z)
+    lo_x = np.floor((x - radius) / span).astype(np.int64)
+    lo_y = np.floor((y - radius) / span).astype(np.int64)
+    width = np.floor((x + radius) / span).astype(np.int64) - lo_x + 1
+    height = np.floor((y + radius) / span).astype(np.int64) - lo_y + 1
+    # Circles are smaller than tiles, so this is a few passes over all of them
+    codes = []
+    for dx in range(int(width.max())):
+        for dy in range(int(height.max())):
+            inside = (dx < width) & (dy < height)
+            codes.append(tile_codes(lo_x[inside] + dx, lo_y[inside] + dy))
+    return np.unique(np.concatenate(codes))
+
+
+def render_tile(flowers, z, x, y):
+    """PNG of the FLOWER records drawn in their bloomed pose over one tile, transparent elsewhere."""
+    x0, y0, _, _ = tile_bounds(z, x, y)
+    canvas = Canvas(TILE_SIZE, TILE_SIZE, x0, y0, 2.0 ** -z)
+    if len(flowers):
+        draw_garden(canvas, build_garden(flowers), bloomed=True)
+    return encode_png(canvas.to_image(background=None))
+
+
+class TileCache:
+    """Rendered tiles kept in a byte-bounded in-memory LRU backed by files on disk.
+
+    Tiles live at ``<root>/<garden>/<z>/<x>/<y>.png``. Each new flower invalidates only
+    the tiles its bounding circle overlaps at every zoom level; a clear drops the garden.
+    Callers serve empty tiles without caching them, so the cache only grows with flowers.
+    """
+
+    def __init__(self, root, max_bytes=MEMORY_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.memory = collections.OrderedDict()
+        # Bumped by every invalidation, so renders that raced one are not cached
+        self.generations = collections.Counter()
+        self.lock = threading.Lock()
+
+    def path(self, garden_id, z, x, y):
+        return os.path.join(self.root, garden_id, str(z), str(x), f'{y}.png')
+
+    def _remember(self, key, data):
+        old = self.memory.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self.memory[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes and self.memory:
+            _, evicted = self.memory.popitem(last=False)
+            self.size -= len(evicted)
+
+    def get(self, garden_id, z, x, y, render):
+        """Tile bytes from memory, disk, or ``render()``, caching whatever was missing."""
+        key = (garden_id, z, x, y)
+        with self.lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                return data
+            generation = self.generations[garden_id]
+
+        path = self.path(garden_id, z, x, y)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            from_disk = True
+        except FileNotFoundError:
+            data = render()
+            from_disk = False
+
+        with self.lock:
+            if self.generations[garden_id] != generation:
+                return data
+            if not from_disk:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f'{path}.{threading.get_ident()}.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            self._remember(key, data)
+        return data
+
+    def invalidate(self, garden_id, records):
+        """Drop the tiles touched by a batch of EVENT records.
+
+        Renders that started before this are not cached, so stale tiles only need
+        removing where they are already cached.
+        """
+        clears = np.flatnonzero(records['kind'] == CLEAR)
+        with self.lock:
+            self.generations[garden_id] += 1
+            if len(clears):
+                self._drop_garden(garden_id)
+                records = records[clears[-1] + 1:]
+        flowers = records[records['kind'] == FLOWER]
+        if len(flowers) == 0:
+            return
+
+        radius = flower_radius(flower_sizes(flowers['seed']))
+        x = flowers['x'].astype(np.float64)
+        y = flowers['y'].astype(np.float64)
+        for z in range(MAX_ZOOM + 1):
+            self._drop_tiles(garden_id, z, touched_tiles(x, y, radius, z))
+
+    def _drop_tiles(self, garden_id, z, codes):
+        with self.lock:
+            # Look up whichever is smaller: the touched tiles, or the cached ones
+            if len(codes) <= len(self.memory):
+                xs, ys = (codes >> 32).tolist(), ((codes & 0xffffffff) - (1 << 31)).tolist()
+                keys = [key for key in zip([garden_id] * len(xs), [z] * len(xs), xs, ys) if key in self.memory]
+            else:
+                cached = [key for key in self.memory if key[0] == garden_id and key[1] == z]
+                touched = _member(codes, tile_codes([key[2] for key in cached], [key[3] for key in cached]))
+                keys = [key for key, hit in zip(cached, touched.tolist()) if hit]
+            for key in keys:
+                self.size -= len(self.memory.pop(key))
+
+        # On disk only the columns with a touched tile are listed, not every tile
+        directory = os.path.join(self.root, garden_id, str(z))
+        for tx in np.unique(codes >> 32).tolist():
+            try:
+                names = os.listdir(os.path.join(directory, str(tx)))
+            except FileNotFoundError:
+                continue
+            names = [name for name in names if name.endswith('.png') and name[:-4].lstrip('-').isdigit()]
+            touched = _member(codes, tile_codes(tx, [int(name[:-4]) for name in names]))
+            for name, hit in zip(names, touched.tolist()):
+                if hit:
+                    try:
+                        os.remove(os.path.join(directory, str(tx), name))
+                    except FileNotFoundError:
+                        pass
+
+    def _drop_garden(self, garden_id):
+        for key in [key for key in self.memory if key[0] == garden_id]:
+            self.size -= len(self.memory.pop(key))
+        shutil.rmtree(os.path.join(self.root, garden_id), ignore_errors=True)
@@ -0,0 +1,146 @@
+"""Time-lapse animations of a garden growing, as an APNG or a numbered PNG sequence.
+
+    python -m garden.timelapse demo.garden bloom.png --width 512 --height 512
+    python -m garden.timelapse demo.garden frames/ --sequence
+
+The simulation steps in order in the calling process and yields the visible particles
+of every frame; frames are rasterized and compressed on a process pool, a bounded
+window at a time, and come back in order. Nothing holds more than ``window`` frames.
+"""
+import argparse
+import collections
+import concurrent.futures
+import functools
+import os
+import sys
+
+import numpy as np
+
+from garden.archive import flower_records, open_archive
+from garden.png import assemble_png, compress_rows, stream_apng
+from garden.render import BACKGROUND, Canvas, alpha_for
+from garden.simulation import Garden
+from garden.spatial import flower_radius, flower_sizes
+from garden.storage import build_garden
+
+FRAME_STEPS = 2  # Simulation steps per frame
+FPS = 30
+MAX_FRAMES = 900
+# Frames in flight: enough to keep every worker busy while the next state is simulated
+WINDOW = 2 * (os.cpu_count() or 1)
+
+
+def simulate(flowers, frames, steps=FRAME_STEPS, planted_per_frame=0):
+    """Yield ``(position, velocity, size, life, color)`` of the visible particles of each frame.
+
+    ``flowers`` are FLOWER records. With ``planted_per_frame`` they are planted that many
+    at a time in planting order, so the garden grows; otherwise all bloom together.
+    """
+    garden = Garden()
+    planted = 0
+    for _ in range(frames):
+        if planted < len(flowers):
+            stop = len(flowers) if planted_per_frame <= 0 else planted + planted_per_frame
+            build_garden(flowers[planted:stop], garden)
+            planted = min(stop, len(flowers))
+        n = garden.particle_count
+        visible = np.flatnonzero(alpha_for(garden.life[:n]) > 0)
+        yield (garden.position[visible], garden.velocity[visible], garden.size[visible],
+               garden.life[visible], garden.color[visible])
+        garden.step(steps)
+
+
+def render_frame(particles, width, height, x, y, scale, background):
+    """``compress_rows`` output of one frame, so the compression also runs in parallel."""
+    canvas = Canvas(width, height, x, y, scale)
+    canvas.draw_particles(*particles)
+    return compress_rows(canvas.to_image(background))
+
+
+def ordered_map(executor, fn, items, window):
+    """Like ``executor.map``, but only ``window`` items are taken from ``items`` ahead of the results."""
+    pending = collections.deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class Timelapse:
+    """Frames of ``flowers`` seen through a ``width`` x ``height`` view at (x, y) and ``scale``."""
+
+    def __init__(self, flowers, frames, width, height, x=0.0, y=0.0, scale=1.0,
+                 steps=FRAME_STEPS, planted_per_frame=0, background=BACKGROUND):
+        # Flowers that never reach the view are not simulated
+        radius = flower_radius(flower_sizes(flowers['seed']))
+        x1, y1 = x + width / scale, y + height / scale
+        dx = flowers['x'] - np.clip(flowers['x'], x, x1)
+        dy = flowers['y'] - np.clip(flowers['y'], y, y1)
+        self.flowers = flowers[dx * dx + dy * dy <= radius ** 2]
+        self.frames = frames
+        self.width = width
+        self.height = height
+        self.view = (x, y, scale)
+        self.steps = steps
+        self.planted_per_frame = planted_per_frame
+        self.background = background
+
+    @property
+    def channels(self):
+        return 4 if self.background is None else 3
+
+    def compressed_frames(self, executor, window=WINDOW):
+        x, y, scale = self.view
+        render = functools.partial(render_frame, width=self.width, height=self.height,
+                                   x=x, y=y, scale=scale, background=self.background)
+        states = simulate(self.flowers, self.frames, self.steps, self.planted_per_frame)
+        return ordered_map(executor, render, states, window)
+
+    def apng(self, executor, fps=FPS):
+        """Yield the animation as APNG bytes, ready to stream."""
+        frames = self.compressed_frames(executor)
+        return stream_apng(self.width, self.height, self.channels, frames, self.frames, (1, fps))
+
+    def write_sequence(self, executor, directory):
+        """Write ``frame-00000.png`` and onwards into ``directory``."""
+        os.makedirs(directory, exist_ok=True)
+        for index, data in enumerate(self.compressed_frames(executor)):
+            with open(os.path.join(directory, f'frame-{index:05d}.png'), 'wb') as f:
+                f.write(assemble_png(self.width, self.height, self.channels, data))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('archive', help='garden archive to animate (see garden/archive.py)')
+    parser.add_argument('output', help='APNG file, or directory with --sequence')
+    parser.add_argument('--sequence', action='store_true', help='write numbered PNG frames instead')
+    parser.add_argument('--frames', type=int, default=120)
+    parser.add_argument('--fps', type=int, default=FPS)
+    parser.add_argument('--steps', type=int, default=FRAME_STEPS, help='simulation steps per frame')
+    parser.add_argument('--grow', type=int, default=0, metavar='N', help='plant N flowers per frame')
+    parser.add_argument('--width', type=int, default=512)
+    parser.add_argument('--height', type=int, default=512)
+    parser.add_argument('-x', type=float, default=0.0, help='world x of the left edge')
+    parser.add_argument('-y', type=float, default=0.0, help='world y of the top edge')
+    parser.add_argument('--scale', type=float, default=1.0, help='pixels per world pixel')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    with open(args.archive, 'rb') as f:
+        _, columns = open_archive(f)
+    timelapse = Timelapse(flower_records(columns), args.frames, args.width, args.height,
+                          args.x, args.y, args.scale, args.steps, args.grow)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers) as executor:
+        if args.sequence:
+            timelapse.write_sequence(executor, args.output)
+        else:
+            with open(args.output, 'wb') as f:
+                for data in timelapse.apng(executor, args.fps):
+                    f.write(data)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,870 @@
+// Flower simulation and canvas drawing. Loaded by the page (static/js/garden.js) and,
+// in worker mode, by static/js/worker.js, which runs it against an OffscreenCanvas.
+// The page drives a GardenEngine only through handle(message), so the same commands
+// work whether the engine lives on the main thread or behind postMessage.
+
+class Vector2 {
+    constructor(x, y) {
+        this.x = x;
+        this.y = y;
+    }
+
+    add(v) {
+        return new Vector2(this.x + v.x, this.y + v.y);
+    }
+
+    subtract(v) {
+        return new Vector2(this.x - v.x, this.y - v.y);
+    }
+
+    multiply(scalar) {
+        return new Vector2(this.x * scalar, this.y * scalar);
+    }
+
+    length() {
+        return Math.sqrt(this.x * this.x + this.y * this.y);
+    }
+
+    normalize() {
+        const len = this.length();
+        if (len === 0) return new Vector2(0, 0);
+        return new Vector2(this.x / len, this.y / len);
+    }
+
+    rotate(angle) {
+        const cos = Math.cos(angle);
+        const sin = Math.sin(angle);
+        return new Vector2(
+            this.x * cos - this.y * sin,
+            this.x * sin + this.y * cos
+        );
+    }
+}
+
+// Particle constants, shared with garden/simulation.py
+const GROW_SPEED = 0.1;
+const DECAY = 0.01;
+const POSITION_SCALE = 16; // Positions are stored in 1/16 px steps
+
+// Command buffers: pointer events are [kind, x, y, color], flowers [x, y, color, seed]
+// and trails [x0, y0, x1, y1, ...], positions in world coordinates and colors packed as 0xRRGGBB
+const POINTER_DOWN = 0;
+const POINTER_MOVE = 1;
+const POINTER_UP = 2;
+const POINTER_STRIDE = 4;
+const FLOWER_STRIDE = 4;
+
+function packColor(color) {
+    return parseInt(color.slice(1, 7), 16);
+}
+
+function unpackColor(rgb) {
+    return `#${rgb.toString(16).padStart(6, '0')}`;
+}
+
+// Particles keep their color packed as 0xRRGGBB. Fill style strings are built once per
+// color and cached; the cache starts over once full, so any number of colors is fine.
+const STYLE_CACHE_SIZE = 4096;
+const styleCache = new Map();
+
+function colorStyle(rgb) {
+    let style = styleCache.get(rgb);
+    if (style === undefined) {
+        if (styleCache.size >= STYLE_CACHE_SIZE) styleCache.clear();
+        style = `rgb(${rgb >> 16}, ${(rgb >> 8) & 0xff}, ${rgb & 0xff})`;
+        styleCache.set(rgb, style);
+    }
+    return style;
+}
+
+// Particle state as a struct of preallocated typed arrays that double when full.
+// Doubles keep positions identical to the server engine (garden/simulation.py).
+const PARTICLE_FIELDS = [
+    ['x', Float64Array],
+    ['y', Float64Array],
+    ['vx', Float64Array],
+    ['vy', Float64Array],
+    ['size', Float64Array],
+    ['baseSize', Float64Array],
+    ['life', Float64Array],
+    ['decay', Float64Array],
+    ['growing', Uint8Array],
+    ['rgb', Uint32Array],
+    ['hidden', Uint8Array] // Set by CoverageGrid.cull for the current frame
+];
+
+class ParticlePool {
+    constructor(capacity = 1024) {
+        this.count = 0;
+        this.capacity = 0;
+        this.allocate(capacity);
+    }
+
+    allocate(capacity) {
+        for (const [name, Type] of PARTICLE_FIELDS) {
+            const array = new Type(capacity);
+            if (this.capacity > 0) array.set(this[name].subarray(0, this.count));
+            this[name] = array;
+        }
+        this.capacity = capacity;
+    }
+
+    add(x, y, vx, vy, color, size, life = 1.0) {
+        if (this.count === this.capacity) this.allocate(this.capacity * 2);
+        const i = this.count++;
+        this.x[i] = x;
+        this.y[i] = y;
+        this.vx[i] = vx;
+        this.vy[i] = vy;
+        this.baseSize[i] = size;
+        this.size[i] = 0; // Start small and grow
+        this.life[i] = life;
+        this.decay[i] = DECAY; // How fast life decreases
+        this.growing[i] = 1;
+        this.rgb[i] = packColor(color);
+        return i;
+    }
+
+    clear() {
+        this.count = 0;
+    }
+
+    update(start, end) {
+        const { x, y, vx, vy, size, baseSize, life, decay, growing } = this;
+        for (let i = start; i < end; i++) {
+            // Update position based on velocity
+            x[i] += vx[i];
+            y[i] += vy[i];
+
+            // Handle growth animation
+            if (growing[i]) {
+                size[i] += GROW_SPEED;
+                if (size[i] >= baseSize[i]) {
+                    size[i] = baseSize[i];
+                    growing[i] = 0;
+                }
+            }
+
+            // Decrease life
+            life[i] -= decay[i];
+        }
+    }
+
+    // True once no particle in [start, end) will change how it looks
+    settled(start, end) {
+        const { vx, vy, life, decay, growing } = this;
+        for (let i = start; i < end; i++) {
+            // Life only goes down, so a faded particle stays invisible
+            if (life[i] + 0.2 <= 0) continue;
+            const still = decay[i] === 0 && vx[i] === 0 && vy[i] === 0;
+            if (growing[i] || !still) return false;
+        }
+        return true;
+    }
+
+    // Grow box (world coordinates) to cover every visible petal in [start, end)
+    extendBounds(box, start, end) {
+        const { x, y, size, life } = this;
+        for (let i = start; i < end; i++) {
+            if (life[i] + 0.2 <= 0) continue;
+            const reach = size[i] * 1.1 + 1; // Petal length plus its sideways bulge
+            box.minX = Math.min(box.minX, x[i] - reach);
+            box.minY = Math.min(box.minY, y[i] - reach);
+            box.maxX = Math.max(box.maxX, x[i] + reach);
+            box.maxY = Math.max(box.maxY, y[i] + reach);
+        }
+    }
+
+    // With skipHidden, petals culled by the last CoverageGrid pass are not drawn
+    draw(ctx, start, end, skipHidden = false) {
+        const { x, y, vx, vy, size, life, rgb, hidden } = this;
+        for (let i = start; i < end; i++) {
+            // Set opacity based on life; fully faded petals would draw nothing
+            const alpha = life[i] > 0.8 ? 1.0 : life[i] + 0.2;
+            if (alpha <= 0 || (skipHidden && hidden[i])) continue;
+            ctx.globalAlpha = alpha;
+            ctx.fillStyle = colorStyle(rgb[i]);
+
+            // Petal shape from two bezier curves, controls perpendicular to the velocity
+            const px = x[i];
+            const py = y[i];
+            const angle = Math.atan2(vy[i], vx[i]);
+            const length = size[i];
+            const endX = px + length * Math.cos(angle);
+            const endY = py + length * Math.sin(angle);
+            const perpAngle = angle + Math.PI / 2;
+            const controlDist = length * 0.5;
+            const cx = controlDist * Math.cos(perpAngle);
+            const cy = controlDist * Math.sin(perpAngle);
+
+            ctx.beginPath();
+            ctx.moveTo(px, py);
+            ctx.bezierCurveTo(px + cx, py + cy, endX + cx, endY + cy, endX, endY);
+            ctx.bezierCurveTo(endX - cx, endY - cy, px - cx, py - cy, px, py);
+            ctx.closePath();
+            ctx.fill();
+        }
+        ctx.globalAlpha = 1;
+    }
+}
+
+// Seeded PRNG (mulberry32), mirrored by garden/prng.py so the server can
+// regenerate a flower from (x, y, color, seed) alone
+function mulberry32(seed) {
+    let a = seed >>> 0;
+    return function () {
+        a = (a + 0x6D2B79F5) | 0;
+        let t = Math.imul(a ^ (a >>> 15), 1 | a);
+        t = (t + Math.imul(t ^ (t >>> 7), 61 | t)) ^ t;
+        return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+    };
+}
+
+function randomSeed() {
+    return Math.floor(Math.random() * 0x100000000);
+}
+
+// Helper to lighten or darken colors
+function lightenColor(color, amount) {
+    // Convert hex to RGB
+    let r = parseInt(color.slice(1, 3), 16);
+    let g = parseInt(color.slice(3, 5), 16);
+    let b = parseInt(color.slice(5, 7), 16);
+
+    // Adjust RGB values
+    r = Math.min(255, Math.max(0, r + amount));
+    g = Math.min(255, Math.max(0, g + amount));
+    b = Math.min(255, Math.max(0, b + amount));
+
+    // Convert back to hex
+    return `#${r.toString(16).padStart(2, '0')}${g.toString(16).padStart(2, '0')}${b.toString(16).padStart(2, '0')}`;
+}
+
+// Stem sway delay of a flower: the draw after its petal count, size and two per petal
+function swayDelay(seed) {
+    const random = mulberry32(seed);
+    const petals = Math.floor(random() * 5) + 8;
+    for (let i = 0; i < 1 + petals * 2; i++) random();
+    return random() * 2;
+}
+
+class Flower {
+    constructor(pool, position, color, seed = randomSeed()) {
+        this.pool = pool;
+        this.position = position;
+        this.color = color;
+        this.seed = seed;
+        this.random = mulberry32(seed);
+        this.settled = false; // Baked into the engine's bakedLayer and no longer updated
+        this.start = pool.count; // This flower's particles in pool
+        this.count = 0;
+        this.bloomState = 0;
+        this.bloomSpeed = 0.02;
+        this.maxPetals = Math.floor(this.random() * 5) + 8; // 8-12 petals
+        this.size = this.random() * 15 + 20; // Random size between 20-35
+        this.createFlower();
+    }
+
+    createFlower() {
+        // Create center of the flower
+        const centerColor = lightenColor(this.color, 50);
+
+        // Create petals around the center
+        for (let i = 0; i < this.maxPetals; i++) {
+            const angle = (i / this.maxPetals) * Math.PI * 2;
+
+            // Small variance in petal colors
+            const variance = Math.floor(this.random() * 30) - 15;
+            const petalColor = lightenColor(this.color, variance);
+
+            this.pool.add(
+                this.position.x + Math.cos(angle) * (this.size * 0.2),
+                this.position.y + Math.sin(angle) * (this.size * 0.2),
+                Math.cos(angle) * 0.2,
+                Math.sin(angle) * 0.2,
+                petalColor,
+                this.size * (0.8 + this.random() * 0.4), // Vary petal sizes
+                1.0
+            );
+        }
+
+        // Add center particles
+        for (let i = 0; i < 6; i++) {
+            const angle = (i / 6) * Math.PI * 2;
+            this.pool.add(
+                this.position.x + Math.cos(angle) * (this.size * 0.1),
+                this.position.y + Math.sin(angle) * (this.size * 0.1),
+                0,
+                0,
+                centerColor,
+                this.size * 0.5,
+                1.0
+            );
+        }
+        this.count = this.pool.count - this.start;
+    }
+
+    update() {
+        // Update bloom state
+        this.bloomState = Math.min(1.0, this.bloomState + this.bloomSpeed);
+
+        // Update all particles
+        this.pool.update(this.start, this.start + this.count);
+
+        // Flowers don't die in this garden, but stop animating once settled
+        return this.bloomState < 1.0 || !this.pool.settled(this.start, this.start + this.count);
+    }
+
+    extendBounds(box) {
+        this.pool.extendBounds(box, this.start, this.start + this.count);
+    }
+
+    draw(ctx, skipHidden = false) {
+        // Draw all particles
+        this.pool.draw(ctx, this.start, this.start + this.count, skipHidden);
+    }
+}
+
+// Zoomed out, aggregated cells from /lod/<level> are drawn instead of flowers (garden/lod.py)
+const FLOWER_AREA = Math.PI * 30 * 30; // Rough area covered by one flower
+
+function emptyLod(cellSize) {
+    return { cellSize: cellSize, count: [], color: [], cx: [], cy: [], density: [] };
+}
+
+// Frame telemetry, handed to the page in batches for POST /metrics/client
+const TELEMETRY_BATCH = 600; // Frames per batch, about 10 s at 60 fps
+const STALL_MS = 50; // Frames longer than this are stalls: GC pauses, long tasks, ...
+const MAX_FRAME_MS = 1000; // Longer gaps are a hidden tab, not a slow frame
+
+class FrameStats {
+    constructor() {
+        this.last = null;
+        this.reset();
+    }
+
+    reset() {
+        this.frameMs = [];
+        this.stallMs = [];
+        this.particles = [];
+    }
+
+    // Record a frame starting at time now (ms) with this many live particles; returns a
+    // telemetry message once a batch is full, otherwise null
+    record(now, particles) {
+        const last = this.last;
+        this.last = now;
+        if (last === null || now - last > MAX_FRAME_MS) return null;
+        const ms = Math.round((now - last) * 100) / 100;
+        this.frameMs.push(ms);
+        this.particles.push(particles);
+        if (ms > STALL_MS) this.stallMs.push(ms);
+        if (this.frameMs.length < TELEMETRY_BATCH) return null;
+
+        const message = {
+            type: 'telemetry',
+            frame_ms: this.frameMs,
+            stall_ms: this.stallMs,
+            particles: this.particles
+        };
+        this.reset();
+        return message;
+    }
+}
+
+// Occlusion culling, as in garden/render.py: screen cells of OCCLUSION_CELL px remember
+// whether a later opaque petal covers them whole, and petals whose cells are all covered
+// are skipped. A petal always covers the square of PETAL_CORE * size around its middle.
+const OCCLUSION_CELL = 8;
+const PETAL_CORE = 0.25;
+
+class CoverageGrid {
+    constructor() {
+        this.columns = 0;
+        this.rows = 0;
+        this.covered = new Uint8Array(0);
+    }
+
+    // Set pool.hidden for the particles of flowers, drawn in order, through the view
+    // (x, y, scale) onto a width x height canvas. Returns false, without culling, when no
+    // opaque petal is large enough to cover a cell: petals only grow to that size on
+    // screen after they start to fade, unless the view is zoomed far in.
+    cull(flowers, x, y, scale, width, height) {
+        if (!this.canCover(flowers, scale)) return false;
+
+        const columns = Math.ceil(width / OCCLUSION_CELL);
+        const rows = Math.ceil(height / OCCLUSION_CELL);
+        if (columns * rows > this.covered.length) this.covered = new Uint8Array(columns * rows);
+        this.columns = columns;
+        this.rows = rows;
+        this.covered.fill(0, 0, columns * rows);
+
+        // Back to front, so every cell marked so far belongs to a petal drawn later
+        for (let f = flowers.length - 1; f >= 0; f--) {
+            const flower = flowers[f];
+            const pool = flower.pool;
+            for (let i = flower.start + flower.count - 1; i >= flower.start; i--) {
+                const length = Math.hypot(pool.vx[i], pool.vy[i]);
+                const half = pool.size[i] * 0.5;
+                // Screen position of the middle of the petal, which reaches half its size around it
+                const cx = (pool.x[i] + (length > 0 ? pool.vx[i] / length : 1) * half - x) * scale;
+                const cy = (pool.y[i] + (length > 0 ? pool.vy[i] / length : 0) * half - y) * scale;
+                const reach = half * scale + 1; // Plus antialiasing
+                pool.hidden[i] = this.isCovered(cx - reach, cy - reach, cx + reach, cy + reach) ? 1 : 0;
+                if (!pool.hidden[i] && pool.life[i] > 0.8) {
+                    const core = PETAL_CORE * pool.size[i] * scale;
+                    this.cover(cx - core, cy - core, cx + core, cy + core);
+                }
+            }
+        }
+        return true;
+    }
+
+    canCover(flowers, scale) {
+        const minSize = OCCLUSION_CELL / (2 * PETAL_CORE * scale);
+        for (let f = 0; f < flowers.length; f++) {
+            const { pool, start, count } = flowers[f];
+            for (let i = start; i < start + count; i++) {
+                if (pool.life[i] > 0.8 && pool.size[i] >= minSize) return true;
+            }
+        }
+        return false;
+    }
+
+    // True if every cell touched by the screen rectangle is covered; off screen counts as covered
+    isCovered(x0, y0, x1, y1) {
+        const c0 = Math.max(0, Math.floor(x0 / OCCLUSION_CELL));
+        const r0 = Math.max(0, Math.floor(y0 / OCCLUSION_CELL));
+        const c1 = Math.min(this.columns - 1, Math.floor(x1 / OCCLUSION_CELL));
+        const r1 = Math.min(this.rows - 1, Math.floor(y1 / OCCLUSION_CELL));
+        for (let r = r0; r <= r1; r++) {
+            for (let c = c0; c <= c1; c++) {
+                if (!this.covered[r * this.columns + c]) return false;
+            }
+        }
+        return true;
+    }
+
+    // Mark the cells lying completely inside the screen rectangle
+    cover(x0, y0, x1, y1) {
+        const c0 = Math.max(0, Math.ceil(x0 / OCCLUSION_CELL));
+        const r0 = Math.max(0, Math.ceil(y0 / OCCLUSION_CELL));
+        const c1 = Math.min(this.columns, Math.floor(x1 / OCCLUSION_CELL));
+        const r1 = Math.min(this.rows, Math.floor(y1 / OCCLUSION_CELL));
+        // fill() would count a negative end back from the end of the grid
+        if (c1 <= c0) return;
+        for (let r = r0; r < r1; r++) {
+            this.covered.fill(1, r * this.columns + c0, r * this.columns + c1);
+        }
+    }
+}
+
+function createLayer() {
+    return typeof document !== 'undefined' ? document.createElement('canvas') : new OffscreenCanvas(1, 1);
+}
+
+class GardenEngine {
+    // emit(message) reports flowers planted from a stroke, and frame telemetry, back to the page
+    constructor(canvas, emit) {
+        this.canvas = canvas;
+        this.ctx = canvas.getContext('2d');
+        this.emit = emit;
+
+        // Particles of all loaded flowers, of the stroke being drawn, and of the fading
+        // trails of strokes drawn by others
+        this.flowerPool = new ParticlePool(4096);
+        this.pathPool = new ParticlePool(256);
+        this.trailPool = new ParticlePool(256);
+        this.flowers = [];
+        this.activeFlowers = []; // Flowers still animating, the rest are baked
+        this.isDrawing = false;
+        this.color = '#ff7eb9';
+
+        this.viewX = 0;
+        this.viewY = 0;
+        this.viewScale = 1;
+        this.lodCells = null;
+
+        // Flowers that finished blooming are drawn once into this layer, which is copied
+        // back into the dirty parts of the canvas instead of redrawing every flower
+        this.bakedLayer = createLayer();
+        this.bakedCtx = this.bakedLayer.getContext('2d');
+        this.needsRebake = true;
+        this.lastDirty = null; // Screen rectangle redrawn in the previous frame
+
+        // World-space bounds of everything animating this frame, reused between frames
+        this.activeBounds = { minX: 0, minY: 0, maxX: 0, maxY: 0 };
+        this.stats = new FrameStats();
+        this.coverage = new CoverageGrid();
+    }
+
+    handle(message) {
+        switch (message.type) {
+            case 'resize': return this.resize(message.width, message.height);
+            case 'view': return this.setView(message.x, message.y, message.scale);
+            case 'pointer': return this.pointer(message.data);
+            case 'flowers': return this.addFlowers(message.data);
+            case 'trail': return this.addTrail(message.data, unpackColor(message.color));
+            case 'clear': return this.clear();
+            case 'lod': return this.setLod(message.cells);
+        }
+    }
+
+    resize(width, height) {
+        this.canvas.width = width;
+        this.canvas.height = height;
+        this.bakedLayer.width = width;
+        this.bakedLayer.height = height;
+        this.needsRebake = true;
+    }
+
+    setView(x, y, scale) {
+        this.viewX = x;
+        this.viewY = y;
+        this.viewScale = scale;
+        this.needsRebake = true;
+    }
+
+    setLod(cells) {
+        this.lodCells = cells;
+        this.needsRebake = true;
+    }
+
+    clear() {
+        this.flowers = [];
+        this.activeFlowers = [];
+        this.flowerPool.clear();
+        this.trailPool.clear();
+        if (this.lodCells !== null) this.lodCells = emptyLod(this.lodCells.cellSize);
+        this.needsRebake = true;
+    }
+
+    addFlowers(data) {
+        for (let i = 0; i < data.length; i += FLOWER_STRIDE) {
+            this.addFlower(new Vector2(data[i], data[i + 1]), unpackColor(data[i + 2]), data[i + 3]);
+        }
+    }
+
+    // Trail particles along a stroke's [x0, y0, x1, y1, ...] points, fading as they drift
+    addTrail(points, color) {
+        for (let i = 2; i < points.length; i += 2) {
+            this.generatePathParticles(this.trailPool, color, points[i - 2], points[i - 1], points[i], points[i + 1]);
+        }
+    }
+
+    addFlower(position, color, seed) {
+        const flower = new Flower(this.flowerPool, position, color, seed);
+        this.flowers.push(flower);
+        this.activeFlowers.push(flower);
+        return flower;
+    }
+
+    pointer(data) {
+        for (let i = 0; i < data.length; i += POINTER_STRIDE) {
+            const kind = data[i];
+            if (kind === POINTER_DOWN) {
+                this.isDrawing = true;
+                this.color = unpackColor(data[i + 3]);
+                this.startPath(data[i + 1], data[i + 2]);
+            } else if (kind === POINTER_MOVE) {
+                if (this.isDrawing) this.extendPath(data[i + 1], data[i + 2]);
+            } else if (kind === POINTER_UP) {
+                if (!this.isDrawing) continue;
+                this.isDrawing = false;
+                // Create a flower at the end of the path
+                if (this.pathPool.count > 0) this.plantAtPathEnd();
+            }
+        }
+    }
+
+    // Path drawing and particle generation
+    generatePathParticles(pool, color, startX, startY, endX, endY) {
+        const dx = endX - startX;
+        const dy = endY - startY;
+        const distance = Math.sqrt(dx * dx + dy * dy);
+
+        if (distance < 5) return; // Skip if points are too close
+
+        // Trail particles move perpendicular to the path direction
+        const perpAngle = Math.atan2(dy / distance, dx / distance) + (Math.PI / 2);
+        const perpX = Math.cos(perpAngle);
+        const perpY = Math.sin(perpAngle);
+        const particleCount = Math.ceil(distance / 10); // One particle every 10px
+
+        for (let i = 0; i < particleCount; i++) {
+            const t = i / particleCount;
+            const speed = Math.random() * 2 - 1; // Random direction
+
+            // Add some randomness to position
+            pool.add(
+                startX + dx * t + (Math.random() - 0.5) * 10,
+                startY + dy * t + (Math.random() - 0.5) * 10,
+                perpX * speed,
+                perpY * speed,
+                color,
+                8,
+                0.8
+            );
+        }
+    }
+
+    startPath(x, y) {
+        this.pathPool.clear();
+        this.pathPool.add(x, y, 0, 0, this.color, 8, 0.8);
+    }
+
+    extendPath(x, y) {
+        const last = this.pathPool.count - 1;
+        this.generatePathParticles(this.pathPool, this.color, this.pathPool.x[last], this.pathPool.y[last], x, y);
+    }
+
+    plantAtPathEnd() {
+        const last = this.pathPool.count - 1;
+        // Round to the positions the server stores, so replays match exactly
+        const x = Math.round(this.pathPool.x[last] * POSITION_SCALE) / POSITION_SCALE;
+        const y = Math.round(this.pathPool.y[last] * POSITION_SCALE) / POSITION_SCALE;
+        const seed = randomSeed();
+        this.addFlower(new Vector2(x, y), this.color, seed);
+        this.emit({ type: 'planted', x: x, y: y, color: this.color, seed: seed });
+    }
+
+    drawLod(ctx) {
+        const lodCells = this.lodCells;
+        const cellSize = lodCells.cellSize;
+        for (let i = 0; i < lodCells.count.length; i++) {
+            const coverage = Math.min(1, lodCells.density[i] * FLOWER_AREA);
+            const radius = Math.min(cellSize * 0.75, Math.sqrt(lodCells.count[i] * FLOWER_AREA / Math.PI));
+            ctx.globalAlpha = 0.3 + 0.7 * coverage;
+            ctx.fillStyle = lodCells.color[i];
+            ctx.beginPath();
+            ctx.arc(lodCells.cx[i], lodCells.cy[i], Math.max(radius, 1 / this.viewScale), 0, Math.PI * 2);
+            ctx.fill();
+        }
+        ctx.globalAlpha = 1;
+    }
+
+    setWorldTransform(target) {
+        const scale = this.viewScale;
+        target.setTransform(scale, 0, 0, scale, -this.viewX * scale, -this.viewY * scale);
+    }
+
+    // Redraw the baked layer from scratch: LOD cells and every settled flower
+    rebake() {
+        const bakedCtx = this.bakedCtx;
+        bakedCtx.setTransform(1, 0, 0, 1, 0, 0);
+        bakedCtx.clearRect(0, 0, this.bakedLayer.width, this.bakedLayer.height);
+        this.setWorldTransform(bakedCtx);
+        if (this.lodCells !== null) this.drawLod(bakedCtx);
+        for (let i = 0; i < this.flowers.length; i++) {
+            if (this.flowers[i].settled) this.flowers[i].draw(bakedCtx);
+        }
+        this.needsRebake = false;
+    }
+
+    // Screen rectangle covering activeBounds, or null when nothing is animating
+    activeRect() {
+        const box = this.activeBounds;
+        if (box.minX > box.maxX) return null;
+        const x0 = Math.max(0, Math.floor((box.minX - this.viewX) * this.viewScale) - 1);
+        const y0 = Math.max(0, Math.floor((box.minY - this.viewY) * this.viewScale) - 1);
+        const x1 = Math.min(this.canvas.width, Math.ceil((box.maxX - this.viewX) * this.viewScale) + 1);
+        const y1 = Math.min(this.canvas.height, Math.ceil((box.maxY - this.viewY) * this.viewScale) + 1);
+        if (x1 <= x0 || y1 <= y0) return null;
+        return { x: x0, y: y0, width: x1 - x0, height: y1 - y0 };
+    }
+
+    // Call frame() once per requestFrame callback
+    start(requestFrame) {
+        const loop = () => {
+            const particles = this.flowerPool.count + this.pathPool.count + this.trailPool.count;
+            const telemetry = this.stats.record(performance.now(), particles);
+            if (telemetry !== null) this.emit(telemetry);
+            this.frame();
+            requestFrame(loop);
+        };
+        loop();
+    }
+
+    // One animation step: only flowers that are still blooming are updated, and only the
+    // screen area they (and the stroke) cover now or covered last frame is redrawn
+    frame() {
+        const ctx = this.ctx;
+        const pathPool = this.pathPool;
+        let fullRedraw = false;
+        if (this.needsRebake) {
+            this.rebake();
+            fullRedraw = true;
+        }
+
+        // Update flowers, baking the ones that just settled
+        const box = this.activeBounds;
+        box.minX = box.minY = Infinity;
+        box.maxX = box.maxY = -Infinity;
+        const activeFlowers = this.activeFlowers;
+        let kept = 0;
+        for (let i = 0; i < activeFlowers.length; i++) {
+            const flower = activeFlowers[i];
+            if (flower.update()) {
+                activeFlowers[kept++] = flower;
+                flower.extendBounds(box);
+            } else {
+                flower.settled = true;
+                this.setWorldTransform(this.bakedCtx);
+                flower.draw(this.bakedCtx);
+            }
+        }
+        activeFlowers.length = kept;
+
+        // Trails all fade at the same rate, so once the newest is gone so are the rest
+        const trailPool = this.trailPool;
+        if (trailPool.count > 0) {
+            trailPool.update(0, trailPool.count);
+            if (trailPool.life[trailPool.count - 1] + 0.2 <= 0) {
+                trailPool.clear();
+            } else {
+                trailPool.extendBounds(box, 0, trailPool.count);
+            }
+        }
+
+        const drawPath = this.isDrawing && pathPool.count > 0;
+        if (drawPath) {
+            for (let i = 0; i < pathPool.count; i++) {
+                pathPool.size[i] = 8 + Math.random() * 4; // Show full size immediately
+            }
+            pathPool.extendBounds(box, 0, pathPool.count);
+        }
+
+        // Last frame's area is always redrawn, which also picks up flowers baked this frame
+        const current = this.activeRect();
+        const dirty = fullRedraw
+            ? { x: 0, y: 0, width: this.canvas.width, height: this.canvas.height }
+            : unionRect(current, this.lastDirty);
+
+        if (dirty !== null) {
+            ctx.save();
+            ctx.setTransform(1, 0, 0, 1, 0, 0);
+            ctx.beginPath();
+            ctx.rect(dirty.x, dirty.y, dirty.width, dirty.height);
+            ctx.clip();
+            ctx.clearRect(dirty.x, dirty.y, dirty.width, dirty.height);
+            ctx.drawImage(this.bakedLayer, dirty.x, dirty.y, dirty.width, dirty.height,
+                dirty.x, dirty.y, dirty.width, dirty.height);
+
+            // Draw in world coordinates
+            this.setWorldTransform(ctx);
+
+            // Draw path and trail particles
+            if (drawPath) pathPool.draw(ctx, 0, pathPool.count);
+            if (trailPool.count > 0) trailPool.draw(ctx, 0, trailPool.count);
+
+            // Draw flowers, minus petals that newer opaque ones cover completely
+            const culled = this.coverage.cull(activeFlowers, this.viewX, this.viewY, this.viewScale,
+                this.canvas.width, this.canvas.height);
+            for (let i = 0; i < activeFlowers.length; i++) {
+                activeFlowers[i].draw(ctx, culled);
+            }
+            ctx.restore();
+        }
+        this.lastDirty = current;
+    }
+}
+
+function unionRect(a, b) {
+    if (a === null) return b;
+    if (b === null) return a;
+    const x = Math.min(a.x, b.x);
+    const y = Math.min(a.y, b.y);
+    return {
+        x: x,
+        y: y,
+        width: Math.max(a.x + a.width, b.x + b.width) - x,
+        height: Math.max(a.y + a.height, b.y + b.height) - y
+    };
+}
+
+// Garden archive (garden/archive.py): a 32 byte header, then one column per field, each
+// starting on an 8 byte boundary so it is read as a typed array view without copying
+const ARCHIVE_MAGIC = 'PFGARDEN';
+const ARCHIVE_FORMAT = 1;
+const ARCHIVE_HEADER_SIZE = 32;
+const ARCHIVE_COLUMNS = [
+    ['x', Float32Array, 1],
+    ['y', Float32Array, 1],
+    ['color', Uint8Array, 3],
+    ['size', Float32Array, 1],
+    ['petals', Uint8Array, 1],
+    ['seed', Uint32Array, 1]
+];
+
+function readArchive(buffer) {
+    const header = new DataView(buffer, 0, ARCHIVE_HEADER_SIZE);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, ARCHIVE_MAGIC.length));
+    if (magic !== ARCHIVE_MAGIC || header.getUint32(8, true) !== ARCHIVE_FORMAT) {
+        throw new Error('not a garden archive');
+    }
+    const count = Number(header.getBigUint64(24, true));
+    const archive = { version: Number(header.getBigUint64(16, true)), count: count };
+    let offset = ARCHIVE_HEADER_SIZE;
+    for (const [name, Type, width] of ARCHIVE_COLUMNS) {
+        archive[name] = new Type(buffer, offset, count * width);
+        offset += Math.ceil(count * width * Type.BYTES_PER_ELEMENT / 8) * 8;
+    }
+    return archive;
+}
+
+// Binary delta frame (garden/sync.py encode_frame): the version before its first event
+// and the events in order, flowers as { kind, x, y, color, seed } and stroke points as
+// { kind, x, y } with positions in px. A stroke's points come right before its flower.
+const FLOWER_EVENT = 1;
+const CLEAR_EVENT = 2;
+const STROKE_EVENT = 3;
+
+function decodeFrame(bytes) {
+    let offset = 0;
+
+    function varint() {
+        let value = 0;
+        let scale = 1;
+        let byte;
+        do {
+            byte = bytes[offset++];
+            value += (byte & 0x7f) * scale;
+            scale *= 128;
+        } while (byte & 0x80);
+        return value;
+    }
+
+    function zigzag() {
+        const n = varint();
+        return n % 2 ? -(n + 1) / 2 : n / 2;
+    }
+
+    function hex(byte) {
+        return byte.toString(16).padStart(2, '0');
+    }
+
+    const version = varint();
+    const count = varint();
+    const events = [];
+    let x = 0;
+    let y = 0;
+    for (let i = 0; i < count; i++) {
+        const kind = bytes[offset++];
+        if (kind !== FLOWER_EVENT && kind !== STROKE_EVENT) {
+            events.push({ kind: kind });
+            continue;
+        }
+        x += zigzag();
+        y += zigzag();
+        if (kind === STROKE_EVENT) {
+            events.push({ kind: kind, x: x / POSITION_SCALE, y: y / POSITION_SCALE });
+            continue;
+        }
+        const color = `#${hex(bytes[offset])}${hex(bytes[offset + 1])}${hex(bytes[offset + 2])}`;
+        const seed = (bytes[offset + 3] | (bytes[offset + 4] << 8) |
+            (bytes[offset + 5] << 16) | (bytes[offset + 6] << 24)) >>> 0;
+        offset += 7;
+        events.push({ kind: kind, x: x / POSITION_SCALE, y: y / POSITION_SCALE, color: color, seed: seed });
+    }
+    return { version: version, events: events };
+}
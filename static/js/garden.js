@@ -0,0 +1,594 @@
+document.addEventListener('DOMContentLoaded', () => {
+    // Canvas setup
+    const canvas = document.getElementById('garden-canvas');
+    const gardenContainer = document.getElementById('garden-container');
+
+    // Stems live in their own layer so they can be panned together with the canvas
+    const stemLayer = document.createElement('div');
+    stemLayer.id = 'stem-layer';
+    gardenContainer.appendChild(stemLayer);
+
+    // A fixed pool of stem nodes is handed to the newest flowers in view, so the number
+    // of animated DOM nodes stays the same however large the garden gets. Flowers past the
+    // first STEM_POOL_SIZE in view get no node. Nothing shows for that: a stem node is an
+    // empty, unsized .flower-container, as the one each flower used to append was, so
+    // it has no box to paint and the cap only limits style and animation work.
+    const STEM_POOL_SIZE = 64;
+    const stemNodes = [];
+    for (let i = 0; i < STEM_POOL_SIZE; i++) {
+        const node = document.createElement('div');
+        node.className = 'flower-container';
+        node.style.display = 'none';
+        stemLayer.appendChild(node);
+        stemNodes.push(node);
+    }
+    let stemsScheduled = false;
+
+    // Simulation and drawing live in a GardenEngine (static/js/engine.js). With ?worker=1
+    // it runs in a Web Worker drawing into an OffscreenCanvas, so a busy garden does not
+    // hold up input; otherwise it runs here on the main thread.
+    const params = new URLSearchParams(window.location.search);
+    const useWorker = params.get('worker') === '1' && 'transferControlToOffscreen' in canvas;
+    let send;
+
+    if (useWorker) {
+        const worker = new Worker(document.body.dataset.workerUrl);
+        const offscreen = canvas.transferControlToOffscreen();
+        worker.postMessage({
+            type: 'init',
+            engineUrl: document.body.dataset.engineUrl,
+            canvas: offscreen,
+            width: window.innerWidth,
+            height: window.innerHeight
+        }, [offscreen]);
+        worker.onmessage = (e) => engineMessage(e.data);
+        send = (message, transfer) => worker.postMessage(message, transfer);
+    } else {
+        const engine = new GardenEngine(canvas, (message) => engineMessage(message));
+        send = (message) => engine.handle(message);
+        engine.resize(window.innerWidth, window.innerHeight);
+        engine.start((callback) => requestAnimationFrame(callback));
+    }
+
+    // Canvas size in screen pixels; the canvas itself may belong to the worker
+    let viewWidth = window.innerWidth;
+    let viewHeight = window.innerHeight;
+
+    // Set canvas dimensions
+    function resizeCanvas() {
+        viewWidth = window.innerWidth;
+        viewHeight = window.innerHeight;
+        send({ type: 'resize', width: viewWidth, height: viewHeight });
+        updateStems();
+    }
+
+    window.addEventListener('resize', resizeCanvas);
+
+    let isDrawing = false;
+    let strokePoints = []; // Input positions of the stroke being drawn
+    const finishedStrokes = []; // Strokes waiting for the engine to plant their flower
+    const STROKE_HEADER_SIZE = 17;
+    const MAX_STEP = 32000;
+    const MAX_STROKE_BYTES = 1 << 13; // garden/strokes.py MAX_BYTES
+    const MAX_STROKE_POINTS = (MAX_STROKE_BYTES - STROKE_HEADER_SIZE) / 4 + 1;
+    let flowers = []; // { x, y, delay } of every loaded flower, for the stems
+    let currentColor = '#ff7eb9'; // Default color
+
+    // Gardens are stored on the server, pick one with ?garden=<id>
+    const gardenId = params.get('garden') || 'default';
+    const gardenUrl = `/garden/${encodeURIComponent(gardenId)}`;
+
+    // Shared garden sync state, see garden/sync.py
+    let knownVersion = 0;
+    let ownClears = 0;
+    const ownSeeds = new Set();
+    let events = null;
+
+    // The garden is larger than the screen: the view is panned and zoomed over world
+    // coordinates, and only flowers near the view are loaded and simulated
+    const VIEW_MARGIN = 512;
+    const PAN_STEP = 100;
+    const MIN_SCALE = 1 / 256;
+    const MAX_SCALE = 4;
+    let viewX = 0;
+    let viewY = 0;
+    let viewScale = 1;
+    let loadedRegion = null;
+    let loadedLevel = null; // LOD level of the loaded region, null when flowers are loaded
+
+    // Zoomed out, aggregated cells from /lod/<level> are drawn instead of flowers (garden/lod.py)
+    const LOD_SCALE = 0.5;
+    const LOD_BASE_CELL = 32;
+    const LOD_LEVELS = 10;
+    const LOD_CELL_PX = 8; // Target on-screen size of a cell
+    let lodRefresh = null;
+    let isPanning = false;
+    let panStart = null;
+
+    // Posts turned away with a 429 while the server's ingest queue is full are sent again
+    // once its Retry-After has passed
+    function postWithRetry(url, options) {
+        return fetch(url, options).then(response => {
+            if (response.status !== 429) return response;
+            const delay = (Number(response.headers.get('Retry-After')) || 1) * 1000;
+            return new Promise(resolve => setTimeout(resolve, delay)).then(() => postWithRetry(url, options));
+        });
+    }
+
+    function postGardenEvent(path, body) {
+        return postWithRetry(gardenUrl + path, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        }).catch(() => {}); // The local garden keeps working offline
+    }
+
+    // Color selection handling
+    const colorOptions = document.querySelectorAll('.color-option');
+    colorOptions.forEach(option => {
+        option.addEventListener('click', () => {
+            // Remove selected class from all options
+            colorOptions.forEach(o => o.classList.remove('selected'));
+            // Add selected class to clicked option
+            option.classList.add('selected');
+            // Update current color
+            currentColor = option.getAttribute('data-color');
+        });
+    });
+
+    function clearLocalGarden() {
+        flowers = [];
+        // Clear the canvas
+        send({ type: 'clear' });
+        // Release all stems
+        updateStems();
+    }
+
+    // Clear button
+    const clearBtn = document.getElementById('clear-btn');
+    clearBtn.addEventListener('click', () => {
+        clearLocalGarden();
+        ownClears++;
+        postGardenEvent('/clear', {});
+    });
+
+    // Hand flowers to the engine as one transferred [x, y, color, seed] buffer. Takes the
+    // columns of a garden archive (readArchive), or anything shaped like them.
+    function addFlowerColumns(columns) {
+        const { count, x, y, color, seed } = columns;
+        const data = new Float64Array(count * FLOWER_STRIDE);
+        for (let i = 0; i < count; i++) {
+            const j = i * FLOWER_STRIDE;
+            data[j] = x[i];
+            data[j + 1] = y[i];
+            data[j + 2] = (color[i * 3] << 16) | (color[i * 3 + 1] << 8) | color[i * 3 + 2];
+            data[j + 3] = seed[i];
+            flowers.push({ x: x[i], y: y[i], delay: swayDelay(seed[i]) });
+        }
+        send({ type: 'flowers', data: data }, [data.buffer]);
+        updateStems();
+    }
+
+    function addFlowers(list) {
+        const color = new Uint8Array(list.length * 3);
+        list.forEach((f, i) => {
+            const rgb = packColor(f.color);
+            color.set([rgb >> 16, (rgb >> 8) & 0xff, rgb & 0xff], i * 3);
+        });
+        addFlowerColumns({
+            count: list.length,
+            x: list.map(f => f.x),
+            y: list.map(f => f.y),
+            color: color,
+            seed: list.map(f => f.seed)
+        });
+    }
+
+    // Pointer positions go to the engine in world coordinates, which draws the stroke
+    function sendPointer(kind, position) {
+        if (kind === POINTER_UP) {
+            finishedStrokes.push(strokePoints);
+            strokePoints = [];
+        } else {
+            strokePoints.push(position);
+        }
+        const data = new Float64Array([kind, position.x, position.y, packColor(currentColor)]);
+        send({ type: 'pointer', data: data }, [data.buffer]);
+    }
+
+    // The engine planted a flower at the end of a stroke: keep its stem and store it.
+    // Frame telemetry goes on to the server's metrics (garden/metrics.py).
+    function engineMessage(message) {
+        if (message.type === 'telemetry') {
+            fetch('/metrics/client', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    frame_ms: message.frame_ms,
+                    stall_ms: message.stall_ms,
+                    particles: message.particles
+                }),
+                keepalive: true
+            }).catch(() => {});
+            return;
+        }
+        if (message.type !== 'planted') return;
+        flowers.push({ x: message.x, y: message.y, delay: swayDelay(message.seed) });
+        updateStems();
+        ownSeeds.add(message.seed);
+
+        // The server simplifies the stroke, stores and broadcasts it, and plants the flower
+        // at its last point. Should it turn the stroke down, the flower alone is stored.
+        const points = finishedStrokes.shift();
+        points.push(new Vector2(message.x, message.y));
+        postWithRetry(`${gardenUrl}/strokes`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/octet-stream' },
+            body: encodeStroke(points, message.color, message.seed)
+        }).then(response => {
+            if (response.status === 400 || response.status === 413) {
+                postGardenEvent('/flowers', { x: message.x, y: message.y, color: message.color, seed: message.seed });
+            }
+        }).catch(() => {}); // The local garden keeps working offline
+    }
+
+    // Binary stroke (garden/strokes.py): color, seed, point count and the first point,
+    // then int16 steps, all in 1/16 px. Long steps are split to fit in an int16.
+    function encodeStroke(points, color, seed) {
+        let xs = [Math.round(points[0].x * POSITION_SCALE)];
+        let ys = [Math.round(points[0].y * POSITION_SCALE)];
+        for (let i = 1; i < points.length; i++) {
+            const fromX = xs[xs.length - 1];
+            const fromY = ys[ys.length - 1];
+            const toX = Math.round(points[i].x * POSITION_SCALE);
+            const toY = Math.round(points[i].y * POSITION_SCALE);
+            const parts = Math.ceil(Math.max(Math.abs(toX - fromX), Math.abs(toY - fromY), 1) / MAX_STEP);
+            for (let j = 1; j <= parts; j++) {
+                xs.push(fromX + Math.round((toX - fromX) * j / parts));
+                ys.push(fromY + Math.round((toY - fromY) * j / parts));
+            }
+        }
+        // Keep the tail (and so the flower) of strokes too long for one request
+        xs = xs.slice(-MAX_STROKE_POINTS);
+        ys = ys.slice(-MAX_STROKE_POINTS);
+
+        const view = new DataView(new ArrayBuffer(STROKE_HEADER_SIZE + (xs.length - 1) * 4));
+        const rgb = packColor(color);
+        view.setUint8(0, rgb >> 16);
+        view.setUint8(1, (rgb >> 8) & 0xff);
+        view.setUint8(2, rgb & 0xff);
+        view.setUint32(3, seed, true);
+        view.setUint16(7, xs.length, true);
+        view.setInt32(9, xs[0], true);
+        view.setInt32(13, ys[0], true);
+        for (let i = 1; i < xs.length; i++) {
+            view.setInt16(STROKE_HEADER_SIZE + (i - 1) * 4, xs[i] - xs[i - 1], true);
+            view.setInt16(STROKE_HEADER_SIZE + (i - 1) * 4 + 2, ys[i] - ys[i - 1], true);
+        }
+        return view.buffer;
+    }
+
+    function updateStems() {
+        if (stemsScheduled) return;
+        stemsScheduled = true;
+        requestAnimationFrame(() => {
+            stemsScheduled = false;
+            assignStems();
+        });
+    }
+
+    // Give the stem nodes to the newest flowers inside the view and hide the rest (see STEM_POOL_SIZE)
+    function assignStems() {
+        const x0 = viewX;
+        const y0 = viewY;
+        const x1 = viewX + viewWidth / viewScale;
+        const y1 = viewY + viewHeight / viewScale;
+        let used = 0;
+        for (let i = flowers.length - 1; i >= 0 && used < STEM_POOL_SIZE; i--) {
+            const f = flowers[i];
+            if (f.x >= x0 && f.x <= x1 && f.y >= y0 && f.y <= y1) {
+                const node = stemNodes[used++];
+                node.style.left = `${f.x}px`;
+                node.style.top = `${f.y}px`;
+                // Random animation delay for varied stem movement
+                node.style.animationDelay = `${f.delay}s`;
+                node.style.display = '';
+            }
+        }
+        for (let i = used; i < STEM_POOL_SIZE; i++) {
+            stemNodes[i].style.display = 'none';
+        }
+    }
+
+    // Apply the events of a binary delta frame (decodeFrame) we have not seen
+    function applyFrame(bytes) {
+        const frame = decodeFrame(bytes);
+        let version = frame.version;
+        let added = [];
+        let trails = []; // { data, color } of strokes drawn by others, for the engine
+        let points = []; // Of the stroke the next flower ends
+        if (version > knownVersion) {
+            // Frames in between never arrived, so fetch what changed instead
+            resync();
+            return;
+        }
+
+        for (const event of frame.events) {
+            version++;
+
+            if (event.kind === STROKE_EVENT) {
+                if (version > knownVersion) points.push(event.x, event.y);
+            } else if (event.kind === FLOWER_EVENT) {
+                const stroke = points;
+                points = [];
+                // Skip events already loaded, flowers this tab planted itself and flowers out of range
+                if (version <= knownVersion || ownSeeds.delete(event.seed) || !inLoadedRegion(event.x, event.y)) continue;
+                if (loadedLevel !== null) {
+                    scheduleLodRefresh();
+                    continue;
+                }
+                if (stroke.length > 0) trails.push({ data: new Float64Array(stroke), color: packColor(event.color) });
+                added.push({ x: event.x, y: event.y, color: event.color, seed: event.seed });
+            } else if (event.kind === CLEAR_EVENT) {
+                if (version <= knownVersion) continue;
+                if (ownClears > 0) {
+                    ownClears--;
+                    continue;
+                }
+                added = [];
+                trails = [];
+                clearLocalGarden();
+            }
+        }
+
+        for (const trail of trails) {
+            send({ type: 'trail', data: trail.data, color: trail.color }, [trail.data.buffer]);
+        }
+        if (added.length > 0) addFlowers(added);
+        knownVersion = Math.max(knownVersion, version);
+    }
+
+    function subscribe() {
+        events = new EventSource(`${gardenUrl}/events?since=${knownVersion}`);
+        events.addEventListener('frame', (e) => {
+            applyFrame(Uint8Array.from(atob(e.data), c => c.charCodeAt(0)));
+        });
+        // The server no longer has the frames we missed: ask for what changed instead
+        events.addEventListener('resync', resync);
+        // Too much changed at once for a frame: load the view again, then follow from there
+        events.addEventListener('reload', () => {
+            events.close();
+            events = null;
+            loadGarden();
+        });
+    }
+
+    function resync() {
+        if (events === null) return;
+        events.close();
+        events = null;
+        catchUp();
+    }
+
+    // Apply the changes since knownVersion from GET /garden/<id>?since=. Once they are no
+    // longer in the server's log (410) the view is loaded again instead.
+    function catchUp() {
+        fetch(`${gardenUrl}?since=${knownVersion}`)
+            .then(response => {
+                if (response.status === 410) return null;
+                if (!response.ok) throw new Error(response.statusText);
+                return response.json();
+            })
+            .then(delta => {
+                if (delta === null) {
+                    loadGarden(); // Subscribes again once loaded
+                    return;
+                }
+                if (loadedLevel !== null) {
+                    if (delta.full || delta.flowers.length > 0) scheduleLodRefresh();
+                } else {
+                    if (delta.full) {
+                        clearLocalGarden();
+                        ownClears = 0;
+                    }
+                    const added = delta.flowers.filter(f => {
+                        // Flowers this tab planted itself are already here, unless all were replaced
+                        const own = ownSeeds.delete(f.seed);
+                        return (delta.full || !own) && inLoadedRegion(f.x, f.y);
+                    });
+                    if (added.length > 0) addFlowers(added);
+                }
+                knownVersion = Math.max(knownVersion, delta.version);
+                subscribe();
+            })
+            .catch(() => setTimeout(catchUp, 5000));
+    }
+
+    function inLoadedRegion(x, y) {
+        return loadedRegion !== null &&
+            x >= loadedRegion.x && x <= loadedRegion.x + loadedRegion.width &&
+            y >= loadedRegion.y && y <= loadedRegion.y + loadedRegion.height;
+    }
+
+    function lodLevel() {
+        if (viewScale >= LOD_SCALE) return null;
+        const level = Math.ceil(Math.log2(LOD_CELL_PX / (LOD_BASE_CELL * viewScale)));
+        return Math.min(LOD_LEVELS - 1, Math.max(0, level));
+    }
+
+    function viewRegion() {
+        const margin = VIEW_MARGIN / viewScale;
+        return {
+            x: viewX - margin,
+            y: viewY - margin,
+            width: viewWidth / viewScale + margin * 2,
+            height: viewHeight / viewScale + margin * 2
+        };
+    }
+
+    // Load the flowers (or LOD cells) around the current view, then follow changes made by everyone else
+    function loadGarden() {
+        const region = viewRegion();
+        const level = lodLevel();
+        const query = new URLSearchParams(region);
+        loadedRegion = region;
+        loadedLevel = level;
+
+        // Flowers arrive as a binary garden archive, LOD cells as JSON
+        const request = level === null
+            ? fetch(`${gardenUrl}/viewport?${query}&format=archive`)
+                .then(response => response.arrayBuffer())
+                .then(readArchive)
+            : fetch(`${gardenUrl}/lod/${level}?${query}`).then(response => response.json());
+
+        request
+            .then(garden => {
+                if (loadedRegion !== region) return; // A newer load has started
+                clearLocalGarden();
+                if (level === null) {
+                    send({ type: 'lod', cells: null });
+                    stemLayer.style.display = '';
+                    addFlowerColumns(garden);
+                } else {
+                    const cells = garden.cells;
+                    cells.cellSize = garden.cellSize;
+                    send({ type: 'lod', cells: cells });
+                    stemLayer.style.display = 'none';
+                }
+                knownVersion = Math.max(knownVersion, garden.version);
+                if (events === null) subscribe();
+            })
+            .catch(() => {});
+    }
+
+    function scheduleLodRefresh() {
+        if (lodRefresh !== null) return;
+        lodRefresh = setTimeout(() => {
+            lodRefresh = null;
+            loadGarden();
+        }, 1000);
+    }
+
+    // Reload once the view gets close to the edge of what was loaded, or the detail level changes
+    function ensureLoaded() {
+        const slack = VIEW_MARGIN / 2 / viewScale;
+        const right = viewX + viewWidth / viewScale;
+        const bottom = viewY + viewHeight / viewScale;
+        if (loadedRegion === null || lodLevel() !== loadedLevel ||
+            viewX - slack < loadedRegion.x || viewY - slack < loadedRegion.y ||
+            right + slack > loadedRegion.x + loadedRegion.width ||
+            bottom + slack > loadedRegion.y + loadedRegion.height) {
+            loadGarden();
+        }
+    }
+
+    function panTo(x, y) {
+        viewX = x;
+        viewY = y;
+        stemLayer.style.transform = `scale(${viewScale}) translate(${-viewX}px, ${-viewY}px)`;
+        send({ type: 'view', x: viewX, y: viewY, scale: viewScale });
+        updateStems();
+    }
+
+    // Zoom by factor while keeping the world point under (clientX, clientY) in place
+    function zoomAt(clientX, clientY, factor) {
+        const anchor = toWorld(clientX, clientY);
+        viewScale = Math.min(MAX_SCALE, Math.max(MIN_SCALE, viewScale * factor));
+        panTo(anchor.x - clientX / viewScale, anchor.y - clientY / viewScale);
+        ensureLoaded();
+    }
+
+    function toWorld(clientX, clientY) {
+        return new Vector2(clientX / viewScale + viewX, clientY / viewScale + viewY);
+    }
+
+    loadGarden();
+
+    // Shift+drag or the right mouse button pans, as do the arrow keys; the wheel zooms
+    canvas.addEventListener('contextmenu', (e) => e.preventDefault());
+
+    canvas.addEventListener('wheel', (e) => {
+        e.preventDefault();
+        zoomAt(e.clientX, e.clientY, Math.exp(-e.deltaY * 0.002));
+    }, { passive: false });
+
+    window.addEventListener('keydown', (e) => {
+        const steps = {
+            ArrowLeft: [-PAN_STEP, 0],
+            ArrowRight: [PAN_STEP, 0],
+            ArrowUp: [0, -PAN_STEP],
+            ArrowDown: [0, PAN_STEP]
+        };
+        if (!(e.key in steps)) return;
+        e.preventDefault();
+        panTo(viewX + steps[e.key][0] / viewScale, viewY + steps[e.key][1] / viewScale);
+        ensureLoaded();
+    });
+
+    // Mouse event handlers
+    canvas.addEventListener('mousedown', (e) => {
+        if (e.shiftKey || e.button === 2) {
+            isPanning = true;
+            panStart = toWorld(e.clientX, e.clientY);
+            return;
+        }
+
+        isDrawing = true;
+        sendPointer(POINTER_DOWN, toWorld(e.clientX, e.clientY));
+    });
+
+    canvas.addEventListener('mousemove', (e) => {
+        if (isPanning) {
+            panTo(panStart.x - e.clientX / viewScale, panStart.y - e.clientY / viewScale);
+            return;
+        }
+        if (!isDrawing) return;
+
+        sendPointer(POINTER_MOVE, toWorld(e.clientX, e.clientY));
+    });
+
+    function endDrawing(e) {
+        if (isPanning) {
+            isPanning = false;
+            ensureLoaded();
+            return;
+        }
+        if (!isDrawing) return;
+        isDrawing = false;
+
+        // The engine creates a flower at the end of the path
+        sendPointer(POINTER_UP, toWorld(e.clientX, e.clientY));
+    }
+
+    canvas.addEventListener('mouseup', endDrawing);
+    canvas.addEventListener('mouseleave', endDrawing);
+
+    // Touch event handlers for mobile support
+    canvas.addEventListener('touchstart', (e) => {
+        e.preventDefault();
+        const touch = e.touches[0];
+        isDrawing = true;
+        sendPointer(POINTER_DOWN, toWorld(touch.clientX, touch.clientY));
+    });
+
+    canvas.addEventListener('touchmove', (e) => {
+        e.preventDefault();
+        if (!isDrawing) return;
+
+        const touch = e.touches[0];
+        sendPointer(POINTER_MOVE, toWorld(touch.clientX, touch.clientY));
+    });
+
+    function endTouchDrawing(e) {
+        e.preventDefault();
+        if (!isDrawing) return;
+        isDrawing = false;
+
+        // The engine creates a flower at the end of the path
+        const touch = e.changedTouches[0];
+        sendPointer(POINTER_UP, toWorld(touch.clientX, touch.clientY));
+    }
+
+    canvas.addEventListener('touchend', endTouchDrawing);
+    canvas.addEventListener('touchcancel', endTouchDrawing);
+});
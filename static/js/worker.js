@@ -0,0 +1,18 @@
+// Worker mode (?worker=1): runs the garden engine (static/js/engine.js) off the main
+// thread, drawing into the OffscreenCanvas transferred by static/js/garden.js
+let engine = null;
+
+self.onmessage = (e) => {
+    const message = e.data;
+    if (message.type === 'init') {
+        importScripts(message.engineUrl);
+        engine = new GardenEngine(message.canvas, (reply) => self.postMessage(reply));
+        engine.resize(message.width, message.height);
+        const requestFrame = self.requestAnimationFrame
+            ? (callback) => self.requestAnimationFrame(callback)
+            : (callback) => setTimeout(callback, 1000 / 60);
+        engine.start(requestFrame);
+        return;
+    }
+    engine.handle(message);
+};
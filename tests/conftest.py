@@ -0,0 +1,14 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # The app over an empty data directory, with none of the gardens other tests touched
+    monkeypatch.setattr(app, 'gardens', app.GardenStore(str(tmp_path / 'gardens')))
+    monkeypatch.setattr(app, 'tiles', app.TileCache(str(tmp_path / 'tiles')))
+    monkeypatch.setattr(app, 'hub', app.Hub())
+    monkeypatch.setattr(app, 'views', {})
+    monkeypatch.setattr(app, 'applied', {})
+    return app.app.test_client()
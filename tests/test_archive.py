@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from garden.archive import (ArchiveError, check_positions, export_chunks, flower_records, petal_counts,
+                            read_archive)
+from garden.spatial import flower_sizes
+from garden.storage import EVENT, FLOWER, POSITION_LIMIT
+
+
+def flowers(count):
+    rng = np.random.default_rng(1)
+    records = np.zeros(count, dtype=EVENT)
+    records['kind'] = FLOWER
+    records['color'] = rng.integers(0, 256, (count, 3))
+    records['seed'] = rng.integers(0, 2 ** 32, count, dtype=np.uint32)
+    records['x'] = np.round(rng.uniform(-5000, 5000, count) * 16) / 16
+    records['y'] = np.round(rng.uniform(-5000, 5000, count) * 16) / 16
+    return records
+
+
+@pytest.mark.parametrize('count', [0, 1, 5, 1000])
+def test_export_round_trip(count):
+    records = flowers(count)
+    # Small chunks so columns span several of them
+    data = b''.join(export_chunks(42, records, chunk_rows=7))
+    version, columns = read_archive(data)
+    assert version == 42
+    assert len(data) % 8 == 0
+    assert np.array_equal(columns['size'], flower_sizes(records['seed']).astype(np.float32))
+    assert np.array_equal(columns['petals'], petal_counts(records['seed']))
+    assert np.array_equal(flower_records(columns, 0, count), records)
+    assert np.array_equal(np.concatenate([flower_records(columns, 0, 3), flower_records(columns, 3)]), records)
+
+
+def test_truncated_or_foreign_archives_are_rejected():
+    data = b''.join(export_chunks(1, flowers(10)))
+    with pytest.raises(ArchiveError, match='truncated archive'):
+        read_archive(data[:-8])
+    with pytest.raises(ArchiveError, match='truncated archive header'):
+        read_archive(data[:10])
+    with pytest.raises(ArchiveError, match='not a garden archive'):
+        read_archive(b'X' + data[1:])
+
+
+@pytest.mark.parametrize('value', [POSITION_LIMIT * 2, -POSITION_LIMIT * 2, np.nan, np.inf])
+def test_out_of_range_positions_are_rejected(value):
+    records = flowers(20)
+    records['y'][13] = value
+    columns = read_archive(b''.join(export_chunks(1, records)))[1]
+    with pytest.raises(ArchiveError):
+        check_positions(columns, chunk_rows=4)
+    records['y'][13] = POSITION_LIMIT
+    check_positions(read_archive(b''.join(export_chunks(1, records)))[1], chunk_rows=4)
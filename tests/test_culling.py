@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+from garden import render
+from garden.render import Canvas, draw_garden
+from garden.storage import EVENT, FLOWER, build_garden
+
+ENGINE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'js', 'engine.js')
+# Loads the particles in the JSON on stdin into one ParticlePool, culls them through the
+# view and reports which ones CoverageGrid hid
+CULL = '''
+const fs = require('fs');
+const vm = require('vm');
+const context = vm.createContext({ Math, Float64Array, Uint8Array, Uint16Array, Uint32Array, Map });
+vm.runInContext(fs.readFileSync(process.argv[1], 'utf8') +
+    '\\nthis.ParticlePool = ParticlePool; this.CoverageGrid = CoverageGrid;', context);
+const { particles, view } = JSON.parse(fs.readFileSync(0, 'utf8'));
+const pool = new context.ParticlePool(16);
+for (const p of particles) {
+    const i = pool.add(p.x, p.y, p.vx, p.vy, p.color, p.size, p.life);
+    pool.size[i] = p.size;
+}
+const culled = new context.CoverageGrid().cull([{ pool, start: 0, count: pool.count }], ...view);
+process.stdout.write(JSON.stringify({ culled, hidden: Array.from(pool.hidden.subarray(0, pool.count)) }));
+'''
+
+
+def flowers(count, extent, seed=1):
+    rng = np.random.default_rng(seed)
+    records = np.zeros(count, dtype=EVENT)
+    records['kind'] = FLOWER
+    records['x'] = rng.uniform(0, extent, count)
+    records['y'] = rng.uniform(0, extent, count)
+    records['color'] = rng.integers(0, 256, (count, 3))
+    records['seed'] = rng.integers(0, 2 ** 32, count, dtype=np.uint32)
+    return records
+
+
+def image(draw, monkeypatch, cull):
+    if not cull:
+        monkeypatch.setattr(render, 'occluded', lambda lo, *args: np.zeros(len(lo), dtype=np.bool_))
+    canvas = Canvas(96, 96, 10, 10, 1.5)
+    draw(canvas)
+    monkeypatch.undo()
+    return canvas.to_image()
+
+
+def test_server_culling_keeps_pixels(monkeypatch):
+    garden = build_garden(flowers(120, 80))
+    hidden = []
+    occluded = render.occluded
+
+    def counting(*args):
+        result = occluded(*args)
+        hidden.append(int(result.sum()))
+        return result
+
+    monkeypatch.setattr(render, 'occluded', counting)
+    culled = image(lambda canvas: draw_garden(canvas, garden, bloomed=True), monkeypatch, cull=True)
+    assert sum(hidden) > 0
+    assert np.array_equal(culled, image(lambda canvas: draw_garden(canvas, garden, bloomed=True),
+                                        monkeypatch, cull=False))
+
+
+def engine_hidden(particles, view):
+    node = shutil.which('node')
+    if node is None:
+        pytest.skip('the engine runs under Node.js')
+    result = subprocess.run([node, '-e', CULL, ENGINE], input=json.dumps({'particles': particles, 'view': view}).encode(),
+                            capture_output=True, check=True)
+    return json.loads(result.stdout)
+
+
+def test_engine_culling_keeps_pixels(monkeypatch):
+    rng = np.random.default_rng(2)
+    n = 400
+    position = rng.uniform(0, 80, (n, 2))
+    angle = rng.uniform(0, 2 * np.pi, n)
+    velocity = np.stack([np.cos(angle), np.sin(angle)], axis=1) * rng.uniform(0, 2, n)[:, None]
+    size = rng.uniform(8, 30, n)
+    # Some petals fading, which must not hide anything
+    life = np.where(rng.random(n) < 0.5, rng.uniform(0.1, 0.8, n), 1.0)
+    color = rng.integers(0, 256, (n, 3))
+    particles = [{'x': x, 'y': y, 'vx': vx, 'vy': vy, 'size': s, 'life': l,
+                  'color': '#%02x%02x%02x' % tuple(c)}
+                 for (x, y), (vx, vy), s, l, c in zip(position.tolist(), velocity.tolist(), size.tolist(),
+                                                      life.tolist(), color.tolist())]
+    result = engine_hidden(particles, [10, 10, 1.5, 96, 96])
+    assert result['culled']
+    shown = np.flatnonzero(np.array(result['hidden']) == 0)
+    assert len(shown) < n
+
+    def draw(rows):
+        return lambda canvas: canvas.draw_particles(position[rows], velocity[rows], size[rows], life[rows], color[rows])
+
+    # Drawn by the server's rasterizer, without its own culling
+    assert np.array_equal(image(draw(shown), monkeypatch, cull=False),
+                          image(draw(np.arange(n)), monkeypatch, cull=False))
+
+
+def test_petals_off_screen_hide_nothing_on_it():
+    # An opaque petal reaching into the view with its core left of it, drawn after one
+    # in the middle of the view
+    petal = {'vx': 1, 'vy': 0, 'size': 40, 'life': 1, 'color': '#ff0000'}
+    result = engine_hidden([dict(petal, x=40, y=40), dict(petal, x=-35, y=10)], [0, 0, 1, 96, 96])
+    assert result['hidden'] == [0, 0]
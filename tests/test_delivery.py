@@ -0,0 +1,55 @@
+import gzip
+import re
+
+import pytest
+
+import app
+from garden.delivery import Precompressed, brotli
+
+BODY = '<p>' + 'flowers ' * 200 + '</p>'
+
+
+@pytest.fixture
+def page():
+    return app.app.test_client()
+
+
+def test_encodings_are_negotiated(page):
+    identity = page.get('/', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in identity.headers
+    assert identity.headers['Vary'] == 'Accept-Encoding'
+    assert identity.headers['Cache-Control'] == 'no-cache'
+
+    zipped = page.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(zipped.data) == identity.data
+    # Each content-coding is its own representation, with its own validator
+    assert zipped.headers['ETag'] != identity.headers['ETag']
+
+    best = page.get('/', headers={'Accept-Encoding': 'gzip, br'})
+    assert best.headers['Content-Encoding'] == ('br' if brotli is not None else 'gzip')
+    assert page.get('/', headers={'Accept-Encoding': 'br;q=0, gzip;q=0.5'}).headers['Content-Encoding'] == 'gzip'
+
+
+def test_matching_etag_is_not_modified(page):
+    first = page.get('/', headers={'Accept-Encoding': 'gzip'})
+    again = page.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.data == b''
+    # A validator of another encoding doesn't match
+    other = page.get('/', headers={'Accept-Encoding': 'identity', 'If-None-Match': first.headers['ETag']})
+    assert other.status_code == 200
+
+
+def test_assets_are_fingerprinted_and_immutable(page):
+    url = re.search(r'src="(/static/js/engine\.[0-9a-f]{12}\.js)"', page.get('/').get_data(as_text=True)).group(1)
+    asset = page.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert asset.status_code == 200
+    assert asset.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert page.get(url, headers={'If-None-Match': asset.headers['ETag'], 'Accept-Encoding': 'gzip'}).status_code == 304
+    assert page.get('/static/js/engine.js').status_code == 404
+
+
+def test_encodings_that_do_not_save_bytes_are_dropped():
+    assert Precompressed(b'x', 'text/plain').encodings == ['identity']
+    assert 'gzip' in Precompressed(BODY, 'text/html').encodings
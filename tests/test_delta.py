@@ -0,0 +1,62 @@
+import app
+
+
+def plant(client, x, seed=1):
+    response = client.post('/garden/g/flowers', json={'x': x, 'y': 0, 'color': '#00ff00', 'seed': seed})
+    assert response.status_code == 201
+    return response.get_json()['version']
+
+
+def test_since_returns_only_later_flowers(client):
+    plant(client, 1)
+    version = plant(client, 2)
+    plant(client, 3)
+    delta = client.get(f'/garden/g?since={version}').get_json()
+    assert delta['version'] == 3
+    assert delta['full'] is False
+    assert [flower['x'] for flower in delta['flowers']] == [3.0]
+    assert client.get('/garden/g?since=3').get_json()['flowers'] == []
+    everything = client.get('/garden/g').get_json()
+    assert everything['full'] is True
+    assert [flower['x'] for flower in everything['flowers']] == [1.0, 2.0, 3.0]
+
+
+def test_clear_makes_the_delta_full(client):
+    plant(client, 1)
+    assert client.post('/garden/g/clear').get_json() == {'version': 2}
+    plant(client, 5)
+    delta = client.get('/garden/g?since=1').get_json()
+    assert delta['full'] is True
+    assert [flower['x'] for flower in delta['flowers']] == [5.0]
+
+
+def test_compacted_changes_are_gone(client):
+    for x in range(3):
+        plant(client, x)
+    app.gardens.get('g').compact()
+    plant(client, 9)
+    assert client.get('/garden/g?since=1').status_code == 410
+    assert [flower['x'] for flower in client.get('/garden/g?since=3').get_json()['flowers']] == [9.0]
+    # A version from the future is no more use to the client
+    assert client.get('/garden/g?since=99').status_code == 410
+
+
+def test_version_is_a_weak_etag(client):
+    plant(client, 1)
+    first = client.get('/garden/g?since=0')
+    assert first.headers['ETag'] == 'W/"1"'
+    assert first.headers['Cache-Control'] == 'no-cache'
+    unchanged = client.get('/garden/g?since=1', headers={'If-None-Match': first.headers['ETag']})
+    assert unchanged.status_code == 304
+    assert unchanged.headers['ETag'] == 'W/"1"'
+    plant(client, 2)
+    changed = client.get('/garden/g?since=1', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert [flower['x'] for flower in changed.get_json()['flowers']] == [2.0]
+
+
+def test_unknown_garden_and_bad_versions(client):
+    empty = client.get('/garden/nothing?since=0')
+    assert empty.get_json() == {'version': 0, 'full': True, 'flowers': []}
+    for since in ('-1', 'x', '1.5', '²'):
+        assert client.get(f'/garden/g?since={since}').status_code == 400
@@ -0,0 +1,42 @@
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+ENGINE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'js', 'engine.js')
+# Adds one petal per color in the JSON list on stdin to a ParticlePool and reports the fill
+# style each one is drawn with
+DRAW = '''
+const fs = require('fs');
+const vm = require('vm');
+const context = vm.createContext({ Math, Float64Array, Uint8Array, Uint16Array, Uint32Array, Map });
+vm.runInContext(fs.readFileSync(process.argv[1], 'utf8') + '\\nthis.ParticlePool = ParticlePool;', context);
+const colors = JSON.parse(fs.readFileSync(0, 'utf8'));
+const pool = new context.ParticlePool(16);
+for (const color of colors) pool.add(0, 0, 1, 0, color, 10);
+const styles = [];
+const ctx = {
+    beginPath() {}, moveTo() {}, bezierCurveTo() {}, closePath() {},
+    fill() { styles.push(this.fillStyle); }
+};
+pool.draw(ctx, 0, pool.count);
+process.stdout.write(JSON.stringify(styles));
+'''
+
+
+def draw_styles(colors):
+    node = shutil.which('node')
+    if node is None:
+        pytest.skip('the engine runs under Node.js')
+    result = subprocess.run([node, '-e', DRAW, ENGINE], input=json.dumps(colors).encode(),
+                            capture_output=True, check=True)
+    return json.loads(result.stdout)
+
+
+def test_every_color_keeps_its_fill_style():
+    # More distinct colors than a 16 bit palette index can tell apart
+    rgbs = list(range(0, 0x1000000, 97))[:70000] + [0x123456, 0xffffff]
+    styles = draw_styles([f'#{rgb:06x}' for rgb in rgbs])
+    assert styles == [f'rgb({rgb >> 16}, {(rgb >> 8) & 0xff}, {rgb & 0xff})' for rgb in rgbs]
@@ -0,0 +1,127 @@
+import collections
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import app
+from garden.ingest import Ingest, QueueFull
+from garden.storage import EVENT, FLOWER
+
+
+def events(count, seed=0):
+    records = np.zeros(count, dtype=EVENT)
+    records['kind'] = FLOWER
+    records['seed'] = seed
+    return records
+
+
+class Store:
+    """A write() that counts versions per key and can be held until released."""
+
+    def __init__(self):
+        self.versions = collections.Counter()
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+        self.writing = threading.Event()
+
+    def write(self, key, records):
+        self.writing.set()
+        self.release.wait()
+        self.batches.append((key, records['seed'].tolist()))
+        self.versions[key] += len(records)
+        return self.versions[key]
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_submissions_waiting_on_a_write_share_the_next_one():
+    store = Store()
+    ingest = Ingest(store.write)
+    store.release.clear()
+    with ThreadPoolExecutor(8) as pool:
+        first = pool.submit(ingest.submit, 'g', events(1, seed=0))
+        store.writing.wait(5)
+        later = [pool.submit(ingest.submit, 'g', events(seed, seed=seed)) for seed in range(1, 6)]
+        wait_for(lambda: ingest.depth == 5)
+        store.release.set()
+        versions = [first.result(5)] + [future.result(5) for future in later]
+    assert len(store.batches) == 2
+    assert sorted(store.batches[1][1]) == [seed for seed in range(1, 6) for _ in range(seed)]
+    # Every submission gets the version right after its own records; the second
+    # batch starts after version 1
+    written = store.batches[1][1]
+    assert versions[0] == 1
+    for seed, version in zip(range(1, 6), versions[1:]):
+        assert written[version - 1 - seed:version - 1] == [seed] * seed
+    assert ingest.depth == 0
+
+
+def test_keys_are_written_separately():
+    store = Store()
+    ingest = Ingest(store.write, batch_delay=0.05)
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(ingest.submit, key, events(2)) for key in ('a', 'b', 'a', 'b')]
+        versions = sorted(future.result(5) for future in futures)
+    assert versions == [2, 2, 4, 4]
+    assert store.versions == {'a': 4, 'b': 4}
+
+
+def test_full_queue_turns_submissions_away():
+    store = Store()
+    ingest = Ingest(store.write, max_queue=1, batch_delay=0)
+    store.release.clear()
+    with ThreadPoolExecutor(4) as pool:
+        try:
+            # With one being written, one waiting for the writer and one queued behind
+            # it, a queue of one is full
+            writing = pool.submit(ingest.submit, 'g', events(1))
+            store.writing.wait(5)
+            waiting = []
+            for depth in (1, 2):
+                waiting.append(pool.submit(ingest.submit, 'g', events(1)))
+                wait_for(lambda: ingest.depth == depth)
+            with pytest.raises(QueueFull):
+                ingest.submit('g', events(1))
+            assert ingest.rejected == 1
+            blocked = pool.submit(ingest.submit, 'g', events(1), block=True)
+            time.sleep(0.02)
+            assert not blocked.done()
+        finally:
+            store.release.set()
+        versions = [future.result(5) for future in [writing, *waiting, blocked]]
+    assert sorted(versions) == [1, 2, 3, 4]
+
+
+def test_failed_write_fails_its_submissions():
+    calls = []
+
+    def write(key, records):
+        calls.append(len(records))
+        if len(calls) == 1:
+            raise OSError('disk full')
+        return sum(calls[1:])
+
+    ingest = Ingest(write)
+    with pytest.raises(OSError):
+        ingest.submit('g', events(3))
+    assert ingest.submit('g', events(2)) == 2
+
+
+def test_full_queue_is_a_429(client, monkeypatch):
+    class Full:
+        def submit(self, key, records):
+            raise QueueFull()
+
+    monkeypatch.setattr(app, 'ingest', Full())
+    response = client.post('/garden/g/flowers', json={'x': 1, 'y': 2, 'color': '#00ff00', 'seed': 1})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == str(app.RETRY_AFTER)
@@ -0,0 +1,105 @@
+import numpy as np
+
+from garden.lod import LodPyramid
+from garden.storage import EVENT, FLOWER, STROKE, clear_event
+
+
+def flowers(count, extent=3000, seed=1):
+    rng = np.random.default_rng(seed)
+    records = np.zeros(count, dtype=EVENT)
+    records['kind'] = FLOWER
+    records['x'] = np.round(rng.uniform(-extent, extent, count) * 16) / 16
+    records['y'] = np.round(rng.uniform(-extent, extent, count) * 16) / 16
+    records['color'] = rng.integers(0, 256, (count, 3))
+    records['seed'] = rng.integers(0, 2 ** 32, count, dtype=np.uint32)
+    return records
+
+
+def expected_cells(records, cell_size):
+    # Per-cell count, colour sum and position sum, one flower at a time
+    cells = {}
+    for record in records[records['kind'] == FLOWER]:
+        x, y = float(record['x']), float(record['y'])
+        key = (int(np.floor(x / cell_size)), int(np.floor(y / cell_size)))
+        count, color, position = cells.get(key, (0, np.zeros(3), np.zeros(2)))
+        cells[key] = (count + 1, color + record['color'], position + (x, y))
+    return cells
+
+
+def level_cells(pyramid, z, rect=(-1e9, -1e9, 1e9, 1e9)):
+    keys, counts, colors, centroids, densities = pyramid.cells(z, *rect)
+    return {tuple(key): (count, color, centroid) for key, count, color, centroid
+            in zip(keys.tolist(), counts.tolist(), colors, centroids)}
+
+
+def assert_levels_match(pyramid, records):
+    for z, level in enumerate(pyramid.levels):
+        cells = level_cells(pyramid, z)
+        expected = expected_cells(records, level.cell_size)
+        assert cells.keys() == expected.keys()
+        for key, (count, color, position) in expected.items():
+            assert cells[key][0] == count
+            assert np.array_equal(cells[key][1], np.rint(color / count).astype(np.uint8))
+            assert np.allclose(cells[key][2], position / count)
+
+
+def test_incremental_apply_matches_fresh_build():
+    records = flowers(4000)
+    incremental = LodPyramid()
+    for start in range(0, len(records), 900):
+        incremental.apply(records[start:start + 900])
+    assert_levels_match(incremental, records)
+
+    fresh = LodPyramid()
+    fresh.apply(records)
+    for z in range(len(fresh.levels)):
+        # Rows are allocated in a different order; the cells themselves are the same
+        built, updated = level_cells(fresh, z), level_cells(incremental, z)
+        assert built.keys() == updated.keys()
+        for key, (count, color, centroid) in built.items():
+            assert updated[key][0] == count
+            assert np.array_equal(updated[key][1], color)
+            assert np.allclose(updated[key][2], centroid)
+
+
+def test_clear_restarts_every_level():
+    before, after = flowers(500, seed=2), flowers(300, seed=3)
+    pyramid = LodPyramid()
+    pyramid.apply(before)
+    # A batch with a clear in the middle keeps only what follows it
+    pyramid.apply(np.concatenate([before[:50], clear_event(), after]))
+    assert_levels_match(pyramid, after)
+    pyramid.apply(clear_event())
+    assert all(level.count == 0 for level in pyramid.levels)
+
+
+def test_only_flowers_are_counted():
+    records = flowers(200, seed=4)
+    records['kind'][::3] = STROKE
+    pyramid = LodPyramid()
+    pyramid.apply(records)
+    assert_levels_match(pyramid, records)
+    assert int(pyramid.levels[-1].flowers.sum()) == int((records['kind'] == FLOWER).sum())
+
+
+def test_rectangle_selects_overlapping_cells():
+    records = flowers(2000, extent=200, seed=5)
+    pyramid = LodPyramid()
+    pyramid.apply(records)
+    keys, counts, colors, centroids, densities = pyramid.cells(0, 0, 0, 100, 50)
+    assert len(keys)
+    assert keys[:, 0].min() >= 0 and keys[:, 0].max() <= 3
+    assert keys[:, 1].min() >= 0 and keys[:, 1].max() <= 1
+    assert np.allclose(densities, counts / 32.0 ** 2)
+
+
+def test_endpoint_follows_new_flowers(client):
+    created = client.post('/garden/lod/flowers', json={'x': 10, 'y': 20, 'color': '#ff0000', 'seed': 1})
+    assert created.status_code == 201
+    cells = client.get('/garden/lod/lod/0?x=0&y=0&width=64&height=64').get_json()['cells']
+    assert cells['count'] == [1]
+    client.post('/garden/lod/flowers', json={'x': 12, 'y': 22, 'color': '#0000ff', 'seed': 2})
+    cells = client.get('/garden/lod/lod/0?x=0&y=0&width=64&height=64').get_json()['cells']
+    assert cells['count'] == [2]
+    assert cells['cx'] == [11.0] and cells['cy'] == [21.0]
+    assert client.get('/garden/lod/lod/99?x=0&y=0&width=1&height=1').status_code == 404
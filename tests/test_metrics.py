@@ -0,0 +1,88 @@
+import math
+import re
+
+import numpy as np
+import pytest
+
+import app
+from garden.metrics import Histogram, QuantileSketch, RateCounter, exposition
+
+
+@pytest.mark.parametrize('accuracy', [0.01, 0.05])
+def test_quantiles_are_within_the_relative_error(accuracy):
+    values = np.random.default_rng(1).lognormal(2, 2, 100000)
+    sketch = QuantileSketch(accuracy=accuracy)
+    # In batches, as clients report them
+    for batch in np.array_split(values, 37):
+        sketch.add(batch)
+    ordered = np.sort(values)
+    for q in (0, 0.1, 0.5, 0.9, 0.99, 0.999, 1):
+        exact = ordered[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= accuracy * exact
+
+
+def test_values_outside_the_range():
+    sketch = QuantileSketch(minimum=1, maximum=100)
+    assert math.isnan(sketch.quantile(0.5))
+    sketch.add([0, 0.5, 50, 1e9])
+    assert sketch.quantile(0) == 0.0
+    assert sketch.quantile(0.4) == 0.0
+    assert sketch.quantile(0.9) == pytest.approx(50, rel=0.01)
+    assert sketch.quantile(1) == pytest.approx(100, rel=0.01)
+    assert sketch.sum == 0.5 + 50 + 1e9
+    assert sketch.samples('m')[-1] == 'm_count 4'
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.5
+
+    def __call__(self):
+        return self.now
+
+
+def test_rate_counts_the_last_window():
+    clock = Clock()
+    rate = RateCounter(window=10, clock=clock)
+    rate.add(30)
+    clock.now += 4
+    rate.add()
+    rate.add(9)
+    assert rate.rate() == 4.0
+    clock.now += 6
+    # The first second has left the window; the total keeps it
+    assert rate.rate() == 1.0
+    assert rate.total == 40
+    clock.now += 10
+    assert rate.rate() == 0.0
+    # A slot reused for a later second starts from zero
+    rate.add(5)
+    assert rate.rate() == 0.5
+
+
+def test_histogram_and_exposition():
+    histogram = Histogram(bounds=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+    text = exposition([('t', 'histogram', 'Test.', histogram.samples('t', {'route': 'r'}))])
+    assert text == ('# HELP t Test.\n# TYPE t histogram\n'
+                    't_bucket{route="r",le="0.1"} 2\n'
+                    't_bucket{route="r",le="1"} 3\n'
+                    't_bucket{route="r",le="+Inf"} 4\n'
+                    't_sum{route="r"} 3.65\n'
+                    't_count{route="r"} 4\n')
+
+
+def test_client_reports_feed_the_sketches(client, monkeypatch):
+    monkeypatch.setattr(app, 'client_sketches', {
+        'frame_ms': QuantileSketch(),
+        'stall_ms': QuantileSketch(),
+        'particles': QuantileSketch(minimum=1, maximum=1e9),
+    })
+    assert client.post('/metrics/client', json={'frame_ms': [16.7] * 9 + [50], 'stall_ms': []}).status_code == 204
+    assert client.post('/metrics/client', json={'frame_ms': [-1]}).status_code == 400
+    assert client.post('/metrics/client', json={'frame_ms': ['x']}).status_code == 400
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'garden_client_frame_ms_count 10' in text
+    median = re.search(r'^garden_client_frame_ms\{quantile="0.5"\} (\S+)$', text, re.M).group(1)
+    assert float(median) == pytest.approx(16.7, rel=0.01)
@@ -0,0 +1,118 @@
+import gc
+import threading
+import uuid
+
+import numpy as np
+import pytest
+
+from garden.shared import INITIAL_CAPACITY, SharedGarden, SharedGardens, _unlink
+from garden.storage import EVENT, FLOWER, GardenLog, clear_event
+
+# Attachments are never closed while NumPy views into them exist, so collecting them
+# warns; the fixture collects them before the test ends
+pytestmark = pytest.mark.filterwarnings('ignore::pytest.PytestUnraisableExceptionWarning')
+
+
+def flowers(count, start=0):
+    records = np.zeros(count, dtype=EVENT)
+    records['kind'] = FLOWER
+    records['seed'] = np.arange(start, start + count)
+    records['x'] = np.arange(start, start + count) / 16
+    records['color'] = (0, 128, 255)
+    return records
+
+
+@pytest.fixture
+def name():
+    # A fresh segment name, unlinked afterwards whichever blocks the test grew
+    name = f'pfgtest{uuid.uuid4().hex[:12]}'
+    yield name
+    owner = SharedGarden(name)
+    owner.read()
+    _unlink(owner.data_segment)
+    _unlink(owner.control_segment)
+    del owner
+    gc.collect()
+
+
+def test_writer_is_seen_by_another_attachment(name):
+    writer, reader = SharedGarden(name), SharedGarden(name)
+    assert reader.flowers()[0] == 0
+    writer.apply(flowers(5), 5)
+    version, records = reader.flowers()
+    assert version == 5
+    assert np.array_equal(records, flowers(5))
+
+
+def test_resize_moves_readers_to_the_new_block(name):
+    writer, reader = SharedGarden(name), SharedGarden(name)
+    writer.apply(flowers(10), 10)
+    version, epoch, columns = reader.read()
+    old_generation = reader.generation
+    writer.apply(flowers(INITIAL_CAPACITY * 2, start=10), 10 + INITIAL_CAPACITY * 2)
+    assert int(writer.control['capacity']) == INITIAL_CAPACITY * 4
+    # Views taken before the resize still read the rows they saw
+    assert columns['seed'].tolist() == list(range(10))
+    assert not reader.changed(epoch)
+    version, records = reader.flowers()
+    assert reader.generation == old_generation + 1
+    assert version == 10 + INITIAL_CAPACITY * 2
+    assert records['seed'].tolist() == list(range(10 + INITIAL_CAPACITY * 2))
+
+
+def test_clear_bumps_the_epoch(name):
+    writer, reader = SharedGarden(name), SharedGarden(name)
+    writer.apply(flowers(3), 3)
+    _, epoch, _ = reader.read()
+    writer.apply(np.concatenate([clear_event(), flowers(2, start=7)]), 6)
+    assert reader.changed(epoch)
+    assert reader.flowers()[1]['seed'].tolist() == [7, 8]
+
+
+def batch(version):
+    # The flowers planted at ``version``: a few, all seeded with it
+    records = flowers(version % 7 + 1)
+    records['seed'] = version
+    return records
+
+
+def test_readers_never_see_a_torn_state(name):
+    writer, reader = SharedGarden(name), SharedGarden(name)
+    done = threading.Event()
+
+    def write():
+        # Enough to outgrow the first block, with a clear on the way
+        for version in range(1, 801):
+            writer.apply(clear_event() if version == 400 else batch(version), version)
+        done.set()
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    reads = 0
+    while not done.is_set() or not reads:
+        version, records = reader.flowers()
+        seeds = records['seed'].astype(np.int64)
+        first = 401 if version >= 400 else 1
+        expected = np.concatenate([np.full(v % 7 + 1, v) for v in range(first, version + 1)] or [[]])
+        assert np.array_equal(seeds, expected)
+        reads += 1
+    thread.join()
+    assert reader.flowers()[0] == 800
+
+
+def test_stuck_sequence_is_recovered_from_the_log(tmp_path, name):
+    log = GardenLog(str(tmp_path))
+    log.append(flowers(4))
+    gardens = SharedGardens(str(tmp_path))
+    gardens.prefix = name
+    garden = gardens.get('g', log)
+    assert garden.flowers()[0] == 4
+    # A writer that died half way through a publish leaves the sequence odd
+    garden.control['sequence'] += 1
+    garden.control['count'] = 99
+    version, records = garden.flowers()
+    assert int(garden.control['sequence']) % 2 == 0
+    assert version == 4
+    assert records['seed'].tolist() == [0, 1, 2, 3]
+    _unlink(garden.data_segment)
+    _unlink(garden.control_segment)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from garden.spatial import SpatialIndex, flower_radius, flower_sizes
+from garden.storage import CLEAR, EVENT, FLOWER, clear_event
+
+
+def flowers(count, extent=5000, seed=1):
+    rng = np.random.default_rng(seed)
+    records = np.zeros(count, dtype=EVENT)
+    records['kind'] = FLOWER
+    records['x'] = np.round(rng.uniform(-extent, extent, count) * 16) / 16
+    records['y'] = np.round(rng.uniform(-extent, extent, count) * 16) / 16
+    records['seed'] = rng.integers(0, 2 ** 32, count, dtype=np.uint32)
+    return records
+
+
+def brute_force(records, x0, y0, x1, y1):
+    x, y = records['x'].astype(np.float64), records['y'].astype(np.float64)
+    radius = flower_radius(flower_sizes(records['seed']))
+    dx, dy = x - np.clip(x, x0, x1), y - np.clip(y, y0, y1)
+    return np.flatnonzero(dx * dx + dy * dy <= radius ** 2)
+
+
+RECTS = [(-100, -100, 100, 100), (0, 0, 1000, 300), (-5000, -5000, 5000, 5000), (4900, 4900, 9000, 9000),
+         (-1e300, -1e300, 1e300, 1e300), (1e6, 1e6, 1e6 + 10, 1e6 + 10), (17.5, -300.25, 17.5, 300)]
+
+
+@pytest.mark.parametrize('rect', RECTS)
+def test_query_matches_brute_force_in_planting_order(rect):
+    records = flowers(3000)
+    index = SpatialIndex()
+    # In several batches, as events arrive
+    for start in range(0, len(records), 700):
+        index.apply(records[start:start + 700])
+    rows = index.query(*rect)
+    assert np.array_equal(rows, brute_force(records, *rect))
+    assert np.array_equal(index.flowers, records)
+
+
+def test_clear_restarts_the_index():
+    index = SpatialIndex()
+    index.apply(flowers(100))
+    later = flowers(50, seed=2)
+    index.apply(np.concatenate([flowers(10, seed=3), clear_event(), later]))
+    assert len(index) == 50
+    assert np.array_equal(index.flowers, later)
+    assert np.array_equal(index.query(-1e9, -1e9, 1e9, 1e9), np.arange(50))
+    index.apply(clear_event())
+    assert len(index.query(-1e9, -1e9, 1e9, 1e9)) == 0
+
+
+def test_other_events_are_ignored():
+    records = flowers(20)
+    records['kind'][5] = CLEAR + 1
+    index = SpatialIndex()
+    index.apply(records)
+    assert len(index) == 19
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+
+from garden.storage import CLEAR, EVENT, FLOWER, LOG_HEADER, GardenLog, clear_event, flower_event
+
+
+def flowers(count, start=0):
+    records = np.zeros(count, dtype=EVENT)
+    records['kind'] = FLOWER
+    records['seed'] = np.arange(start, start + count)
+    records['x'] = np.arange(count) / 16
+    records['color'] = (255, 0, 0)
+    return records
+
+
+def test_append_and_replay(tmp_path):
+    log = GardenLog(str(tmp_path))
+    assert log.append(flowers(3)) == 3
+    assert log.append(flower_event(1.5, -2.0, (1, 2, 3), 99)) == 4
+    version, live = log.load()
+    assert version == 4
+    assert live['seed'].tolist() == [0, 1, 2, 99]
+    assert live['y'][-1] == -2.0
+    log.close()
+
+    # Reopened, the garden replays from the files
+    log = GardenLog(str(tmp_path))
+    assert log.load()[0] == 4
+    assert log.load()[1]['seed'].tolist() == [0, 1, 2, 99]
+
+
+def test_clear_drops_earlier_flowers(tmp_path):
+    log = GardenLog(str(tmp_path))
+    log.append(flowers(3))
+    log.append(np.concatenate([clear_event(), flowers(2, start=10)]))
+    version, live = log.load()
+    assert version == 6
+    assert live['seed'].tolist() == [10, 11]
+    assert log.events_since(3)[1]['kind'].tolist() == [CLEAR, FLOWER, FLOWER]
+
+
+def test_compaction_keeps_garden_and_versions(tmp_path):
+    log = GardenLog(str(tmp_path), compact_every=4)
+    log.append(flowers(3))
+    log.append(clear_event())
+    log.append(flowers(2, start=10))
+    # The log was compacted after the clear: earlier events are gone, later ones remain
+    assert log.snapshot_version == 4
+    assert log.events_since(2) is None
+    assert log.events_since(4)[1]['seed'].tolist() == [10, 11]
+    assert log.load()[0] == 6
+    assert log.load()[1]['seed'].tolist() == [10, 11]
+    log.close()
+
+    log = GardenLog(str(tmp_path), compact_every=4)
+    assert log.version == 6
+    assert log.load()[1]['seed'].tolist() == [10, 11]
+
+
+def test_torn_record_is_truncated(tmp_path):
+    log = GardenLog(str(tmp_path))
+    log.append(flowers(2))
+    log.close()
+    with open(log.log_path, 'ab') as f:
+        f.write(flowers(1, start=7).tobytes()[:5])
+
+    log = GardenLog(str(tmp_path))
+    assert log.version == 2
+    assert os.path.getsize(log.log_path) == LOG_HEADER.size + 2 * EVENT.itemsize
+    assert log.append(flowers(1, start=7)) == 3
+    assert log.load()[1]['seed'].tolist() == [0, 1, 7]
@@ -0,0 +1,93 @@
+import base64
+
+import numpy as np
+import pytest
+
+import app
+from garden.storage import FLOWER, POSITION_LIMIT, POSITION_SCALE, STROKE
+from garden.strokes import MAX_BYTES, STEP, STROKE_HEADER, StrokeError, decode_strokes, simplify, stroke_records
+from garden.sync import encode_frame, sse_message
+
+
+def stroke(x, y, steps, color=(1, 2, 3), seed=7):
+    header = np.zeros(1, dtype=STROKE_HEADER)
+    header['color'] = color
+    header['seed'] = seed
+    header['count'] = len(steps) + 1
+    header['x'] = x
+    header['y'] = y
+    return header.tobytes() + np.asarray(steps, dtype=STEP).reshape(-1, 2).tobytes()
+
+
+def test_decode_accumulates_steps():
+    data = stroke(160, -32, [(16, 0), (-8, 4)]) + stroke(0, 0, [], seed=9)
+    (first, points), (second, single) = decode_strokes(data)
+    assert points.tolist() == [[160, -32], [176, -32], [168, -28]]
+    assert int(first['seed']) == 7
+    assert single.tolist() == [[0, 0]]
+    assert int(second['seed']) == 9
+
+
+def test_simplified_line_then_flower_where_it_ends():
+    # A straight run, two corners and a wobble under the tolerance (1 px = 16 steps)
+    steps = [(16, 0)] * 10 + [(0, 16)] * 10 + [(16, 3), (16, -3)]
+    data = stroke(160, -32, steps, color=(9, 8, 7)) + stroke(0, 0, [], seed=9)
+    records = stroke_records(decode_strokes(data))
+    assert records['kind'].tolist() == [STROKE, STROKE, STROKE, STROKE, FLOWER, STROKE, FLOWER]
+    assert (records['x'] * POSITION_SCALE).tolist() == [160, 320, 320, 352, 352, 0, 0]
+    assert (records['y'] * POSITION_SCALE).tolist() == [-32, -32, 128, 128, 128, 0, 0]
+    assert records['color'][:5].tolist() == [[9, 8, 7]] * 5
+    assert records['seed'].tolist() == [7, 7, 7, 7, 7, 9, 9]
+
+
+def test_simplify_keeps_the_line_within_tolerance():
+    rng = np.random.default_rng(1)
+    points = np.cumsum(rng.integers(-40, 40, (500, 2)), axis=0)
+    kept = simplify(points, 16.0)
+    assert kept[0] == 0 and kept[-1] == len(points) - 1
+    assert len(kept) < len(points)
+    for start, end in zip(kept[:-1], kept[1:]):
+        a, b = points[start].astype(float), points[end].astype(float)
+        inner = points[start + 1:end] - a
+        cross = np.abs((b - a)[0] * inner[:, 1] - (b - a)[1] * inner[:, 0])
+        assert (cross <= 16.0 * np.hypot(*(b - a)) + 1e-9).all()
+
+
+def test_zigzag_at_the_size_limit_keeps_every_point():
+    # The quadratic worst case: every split peels off one point
+    count = (MAX_BYTES - STROKE_HEADER.itemsize) // (2 * STEP.itemsize) + 1
+    steps = [(16, 32000 if i % 2 == 0 else -32000) for i in range(count - 1)]
+    data = stroke(0, 0, steps)
+    assert len(data) <= MAX_BYTES
+    assert len(simplify(decode_strokes(data)[0][1], 16.0)) == count
+
+
+@pytest.mark.parametrize('data, message', [
+    (stroke(0, 0, [(1, 1)])[:-1], 'truncated stroke'),
+    (stroke(0, 0, [])[:5], 'truncated stroke header'),
+    (stroke(0, 0, [])[:7] + b'\0\0' + stroke(0, 0, [])[9:], 'empty stroke'),
+    (stroke(POSITION_LIMIT * POSITION_SCALE, 0, [(1, 0)]), 'stroke point out of range'),
+])
+def test_bad_strokes_are_rejected(data, message):
+    with pytest.raises(StrokeError, match=f'^{message}$'):
+        decode_strokes(data)
+
+
+def test_posted_strokes_are_stored_and_broadcast(client):
+    data = stroke(0, 0, [(16, 0)] * 10 + [(0, 16)] * 10, color=(255, 0, 0), seed=3)
+    response = client.post('/garden/s/strokes', data=data)
+    assert response.status_code == 201
+    assert response.json == {'version': 4, 'flowers': 1, 'points': 3}
+    assert client.get('/garden/s').json['flowers'] == [{'x': 10.0, 'y': 10.0, 'color': '#ff0000', 'seed': 3}]
+
+    records = app.gardens.get('s').events_since(0)[1]
+    assert records['kind'].tolist() == [STROKE, STROKE, STROKE, FLOWER]
+    channel = app.hub.channels['s']
+    channel.flush()
+    assert channel.backlog(0)[0] == sse_message('frame', base64.b64encode(encode_frame(0, records)).decode(), 4)
+
+
+def test_oversized_or_bad_strokes_are_refused(client):
+    assert client.post('/garden/s/strokes', data=bytes(MAX_BYTES + 1)).status_code == 413
+    assert client.post('/garden/s/strokes', data=b'').status_code == 400
+    assert client.post('/garden/s/strokes', data=stroke(0, 0, [(1, 1)])[:-1]).status_code == 400
@@ -0,0 +1,105 @@
+import base64
+import json
+import os
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+from garden.storage import CLEAR, EVENT, FLOWER, POSITION_LIMIT, STROKE
+from garden.sync import Channel, encode_frame, sse_message
+
+ENGINE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'js', 'engine.js')
+# Runs decodeFrame from static/js/engine.js on the frame bytes given as JSON on stdin
+DECODE = '''
+const fs = require('fs');
+const vm = require('vm');
+const context = vm.createContext({ Math, Float64Array, Uint8Array, Uint16Array, Uint32Array, Map });
+vm.runInContext(fs.readFileSync(process.argv[1], 'utf8') + '\\nthis.decodeFrame = decodeFrame;', context);
+const bytes = Uint8Array.from(JSON.parse(fs.readFileSync(0, 'utf8')));
+process.stdout.write(JSON.stringify(context.decodeFrame(bytes)));
+'''
+
+
+def decode_frame(frame):
+    node = shutil.which('node')
+    if node is None:
+        pytest.skip('decodeFrame runs under Node.js')
+    result = subprocess.run([node, '-e', DECODE, ENGINE], input=json.dumps(list(frame)).encode(),
+                            capture_output=True, check=True)
+    return json.loads(result.stdout)
+
+
+def test_frame_round_trip():
+    records = np.zeros(5, dtype=EVENT)
+    records['kind'] = [FLOWER, FLOWER, CLEAR, FLOWER, FLOWER]
+    records['x'] = [0.5, -POSITION_LIMIT, 0, POSITION_LIMIT, 3.0625]
+    records['y'] = [-1.25, POSITION_LIMIT, 0, -POSITION_LIMIT, 3.0625]
+    records['color'] = [(255, 126, 185), (0, 0, 0), (0, 0, 0), (1, 2, 3), (255, 255, 255)]
+    records['seed'] = [0, 2 ** 32 - 1, 0, 2 ** 31, 12345]
+
+    frame = decode_frame(encode_frame(2 ** 40, records))
+    assert frame['version'] == 2 ** 40
+    assert frame['events'][2] == {'kind': CLEAR}
+    flowers = [event for event in frame['events'] if event['kind'] == FLOWER]
+    expected = records[records['kind'] == FLOWER]
+    assert [(e['x'], e['y']) for e in flowers] == list(zip(expected['x'].tolist(), expected['y'].tolist()))
+    assert [e['color'] for e in flowers] == ['#ff7eb9', '#000000', '#010203', '#ffffff']
+    assert [e['seed'] for e in flowers] == expected['seed'].tolist()
+
+
+def test_stroke_points_come_before_their_flower():
+    records = np.zeros(4, dtype=EVENT)
+    records['kind'] = [STROKE, STROKE, FLOWER, FLOWER]
+    records['x'] = [10, -20.5, -20.5, 7]
+    records['y'] = [0, 300, 300, 8]
+    records['color'] = (1, 2, 3)
+    records['seed'] = [5, 5, 5, 6]
+    events = decode_frame(encode_frame(0, records))['events']
+    assert events[:2] == [{'kind': STROKE, 'x': 10, 'y': 0}, {'kind': STROKE, 'x': -20.5, 'y': 300}]
+    assert [(e['x'], e['y'], e['seed']) for e in events[2:]] == [(-20.5, 300, 5), (7, 8, 6)]
+
+
+def test_empty_frame():
+    assert decode_frame(encode_frame(7, np.zeros(0, dtype=EVENT))) == {'version': 7, 'events': []}
+
+
+def flower_records(count):
+    records = np.zeros(count, dtype=EVENT)
+    records['kind'] = FLOWER
+    records['x'] = np.arange(count) * 1000.5
+    return records
+
+
+def test_channel_frames_and_backlog():
+    channel = Channel(10)
+    channel.publish(flower_records(2), 12)
+    channel.publish(flower_records(1), 13)
+    assert channel.flush()
+    assert not channel.flush()
+    [message] = channel.backlog(10)
+    assert message.startswith(b'id: 13\nevent: frame\n')
+    data = message.split(b'data: ')[1].strip()
+    assert base64.b64decode(data) == encode_frame(10, np.concatenate([flower_records(2), flower_records(1)]))
+    assert channel.backlog(13) == []
+
+
+def test_large_tick_sends_reload():
+    channel = Channel(0, max_frame_events=4)
+    channel.publish(flower_records(5), 5)
+    channel.flush()
+    assert channel.backlog(0) == [sse_message('reload', '', 5)]
+    channel.publish(flower_records(1), 6)
+    channel.flush()
+    assert channel.backlog(5)[0].startswith(b'id: 6\nevent: frame\n')
+
+
+def test_dropped_frames_resync():
+    channel = Channel(0, retained=2)
+    for version in range(1, 4):
+        channel.publish(flower_records(1), version)
+        channel.flush()
+    assert channel.backlog(0) is None
+    assert len(channel.backlog(1)) == 2
+    assert list(channel.subscribe(0)) == [sse_message('resync', '')]
@@ -0,0 +1,109 @@
+import math
+import os
+
+import numpy as np
+
+from garden.spatial import flower_radius, flower_sizes
+from garden.storage import EVENT, FLOWER, clear_event, flower_event
+from garden.tiles import MAX_ZOOM, TileCache, tile_span, touched_tiles
+
+GRID = range(-3, 3)
+
+
+def fill(cache, garden_id='g'):
+    # Every tile of a small grid at every zoom, in memory and on disk
+    for z in range(MAX_ZOOM + 1):
+        for x in GRID:
+            for y in GRID:
+                cache.get(garden_id, z, x, y, lambda: b'tile %d %d %d' % (z, x, y))
+
+
+def cached(cache, garden_id='g'):
+    on_disk = set()
+    for z in range(MAX_ZOOM + 1):
+        for x in GRID:
+            for y in GRID:
+                if os.path.exists(cache.path(garden_id, z, x, y)):
+                    on_disk.add((z, x, y))
+    return {key[1:] for key in cache.memory if key[0] == garden_id}, on_disk
+
+
+def overlapped(records):
+    # Tiles a flower's bounding square overlaps, one flower and one zoom at a time
+    tiles = set()
+    for record in records:
+        radius = float(flower_radius(flower_sizes(record['seed'][None]))[0])
+        x, y = float(record['x']), float(record['y'])
+        for z in range(MAX_ZOOM + 1):
+            span = tile_span(z)
+            for tx in range(math.floor((x - radius) / span), math.floor((x + radius) / span) + 1):
+                for ty in range(math.floor((y - radius) / span), math.floor((y + radius) / span) + 1):
+                    tiles.add((z, tx, ty))
+    return tiles
+
+
+def everything():
+    return {(z, x, y) for z in range(MAX_ZOOM + 1) for x in GRID for y in GRID}
+
+
+def test_invalidate_drops_only_overlapped_tiles(tmp_path):
+    cache = TileCache(str(tmp_path))
+    fill(cache)
+    fill(cache, 'other')
+    # On a tile corner, so it touches four tiles at every zoom
+    records = np.concatenate([flower_event(0, 0, (1, 2, 3), 5), flower_event(300, -700, (1, 2, 3), 9)])
+    cache.invalidate('g', records)
+    kept = everything() - overlapped(records)
+    assert (0, -1, -1) not in kept and (0, 0, 0) not in kept
+    assert cached(cache) == (kept, kept)
+    assert cached(cache, 'other') == (everything(), everything())
+
+
+def test_many_touched_tiles_against_few_cached(tmp_path):
+    cache = TileCache(str(tmp_path))
+    cache.get('g', 0, 0, 0, lambda: b'near')
+    cache.get('g', 0, 2, 0, lambda: b'far')
+    rng = np.random.default_rng(3)
+    records = np.zeros(500, dtype=EVENT)
+    records['kind'] = FLOWER
+    records['x'] = rng.uniform(0, 256, 500)
+    records['y'] = rng.uniform(0, 256, 500)
+    records['seed'] = rng.integers(0, 2 ** 32, 500, dtype=np.uint32)
+    assert len(touched_tiles(records['x'].astype(float), records['y'].astype(float),
+                             flower_radius(flower_sizes(records['seed'])), 0)) > len(cache.memory)
+    cache.invalidate('g', records)
+    assert [key[2:] for key in cache.memory] == [(2, 0)]
+    assert not os.path.exists(cache.path('g', 0, 0, 0))
+    assert os.path.exists(cache.path('g', 0, 2, 0))
+
+
+def test_clear_drops_the_garden(tmp_path):
+    cache = TileCache(str(tmp_path))
+    fill(cache)
+    fill(cache, 'other')
+    cache.invalidate('g', clear_event())
+    assert cached(cache) == (set(), set())
+    assert cache.size == sum(len(data) for data in cache.memory.values())
+    assert cached(cache, 'other') == (everything(), everything())
+
+
+def test_render_racing_an_invalidation_is_not_cached(tmp_path):
+    cache = TileCache(str(tmp_path))
+
+    def render():
+        cache.invalidate('g', flower_event(10, 10, (1, 2, 3), 1))
+        return b'stale'
+
+    assert cache.get('g', 0, 0, 0, render) == b'stale'
+    assert not cache.memory
+    assert not os.path.exists(cache.path('g', 0, 0, 0))
+    assert cache.get('g', 0, 0, 0, lambda: b'fresh') == b'fresh'
+
+
+def test_memory_is_bounded_and_falls_back_to_disk(tmp_path):
+    cache = TileCache(str(tmp_path), max_bytes=10)
+    cache.get('g', 0, 0, 0, lambda: b'12345678')
+    cache.get('g', 0, 1, 0, lambda: b'abcdefgh')
+    assert list(cache.memory) == [('g', 0, 1, 0)]
+    assert cache.size == 8
+    assert cache.get('g', 0, 0, 0, lambda: b'rendered again') == b'12345678'
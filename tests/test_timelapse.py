@@ -0,0 +1,21 @@
+def test_pixel_frame_budget(client):
+    url = '/garden/t/timelapse.png?x=0&y=0&width=1024&height=1024&frames={}'
+    assert client.get(url.format(257)).status_code == 400
+    response = client.get(url.format(1), buffered=False)
+    assert response.status_code == 200
+    response.close()
+
+
+def test_streams_at_once_are_limited(client):
+    url = '/garden/t/timelapse.png?x=0&y=0&width=16&height=16&frames=2'
+    streams = [client.get(url, buffered=False) for _ in range(2)]
+    assert [response.status_code for response in streams] == [200, 200]
+    refused = client.get(url)
+    assert refused.status_code == 429
+    assert refused.headers['Retry-After']
+    # Finished or abandoned streams give their slot back
+    assert streams[0].get_data()[:8] == b'\x89PNG\r\n\x1a\n'
+    streams[0].close()
+    streams[1].close()
+    for _ in range(3):
+        client.get(url).close()